@@ -0,0 +1,157 @@
+"""
+Measures how fast the background workers drain a backlog of tasks.
+
+Queues a batch of playlist transfers spread over several users and cancels them right away,
+then times how long the workers take to work through the queue. Cancelled tasks are skipped
+by the workers without doing any real work, so this measures the per-task overhead of the
+scheduling loop itself.
+
+Run it against a Redis instance without real tasks in it, from the root of the repository:
+
+    PYTHONPATH=webui:. python scripts/benchmark_queue_drain.py --tasks 1000 --users 10 --workers 3
+
+The API's configuration (see webui/api/.env.example) has to be present in the environment,
+although the database is never connected to.
+
+With --transfers, the tasks are real transfers between playlists of the fake provider instead,
+so the workers match and insert tracks against simulated latency and rate limits. This needs
+ENABLE_FAKE_PROVIDER=true and the database, since the tasks belong to the existing users given with --user-ids:
+
+    ENABLE_FAKE_PROVIDER=true PYTHONPATH=webui:. python scripts/benchmark_queue_drain.py --transfers --user-ids 1 2 --tasks 20
+"""
+
+from argparse import ArgumentParser
+import asyncio
+import logging
+import time
+
+from api.core.config import config
+from api.core.logging import logger
+from api.core.redis import get_redis_instance
+from api.models.system import Initiator
+from api.models.task import PlaylistTaskCreate, TaskKind
+from api.models.user import User
+from api.services.task_service import TaskService
+from api.workers.dispatcher import worker_dispatcher
+from api.workers.utils.keys import make_task_key, make_user_queue_stats_key
+from api.workers.utils.queue import get_queue_stats
+from api.workers.utils.serialization import delete_task_keys
+
+# Users that don't exist, far above the IDs of real ones.
+FIRST_USER_ID = 900_000
+
+# Playlists every fake driver serves, see tunesynctool.drivers.common.fake.catalog
+FAKE_PLAYLIST_COUNT = 20
+
+async def queue_cancelled_tasks(service: TaskService, task_count: int, user_count: int) -> list[str]:
+    keys = []
+
+    for index in range(task_count):
+        user = User(id=FIRST_USER_ID + index % user_count, username=f"benchmark-{index % user_count}", password_hash="")
+
+        task = await service.dispatch_playlist_transfer(
+            details=PlaylistTaskCreate(
+                from_provider="spotify",
+                to_provider="spotify",
+                kind=TaskKind.USER_INITIATED_PLAYLIST_TRANSFER,
+                is_dry_run=True,
+                from_playlist=f"benchmark-{index}"
+            ),
+            user=user
+        )
+
+        await service.cancel_task(task.task_id, user, Initiator.SYSTEM, reason="Queue drain benchmark.")
+        keys.append(make_task_key(TaskKind.USER_INITIATED_PLAYLIST_TRANSFER, user.id, str(task.task_id)))
+
+    return keys
+
+async def queue_fake_transfers(service: TaskService, task_count: int, user_ids: list[int]) -> list[str]:
+    keys = []
+
+    for index in range(task_count):
+        user = User(id=user_ids[index % len(user_ids)], username=f"benchmark-{index % len(user_ids)}", password_hash="")
+
+        task = await service.dispatch_playlist_transfer(
+            details=PlaylistTaskCreate(
+                from_provider="fake",
+                to_provider="fake",
+                kind=TaskKind.USER_INITIATED_PLAYLIST_TRANSFER,
+                is_dry_run=False,
+                from_playlist=f"playlist-{index % FAKE_PLAYLIST_COUNT:05d}"
+            ),
+            user=user
+        )
+
+        keys.append(make_task_key(TaskKind.USER_INITIATED_PLAYLIST_TRANSFER, user.id, str(task.task_id)))
+
+    return keys
+
+async def wait_until_drained(service: TaskService) -> None:
+    while True:
+        stats = await get_queue_stats(service.redis)
+        if stats.waiting == 0 and stats.length == 0:
+            return
+
+        await asyncio.sleep(0.05)
+
+async def run_benchmark(task_count: int, user_count: int, worker_count: int, transfer_user_ids: list[int] | None = None) -> None:
+    redis = get_redis_instance()
+    service = TaskService(redis)
+
+    try:
+        stats = await get_queue_stats(redis)
+        if stats.waiting > 0 or stats.length > 0:
+            print(f"The queue already holds {stats.waiting + stats.length} tasks. Run the benchmark against an empty Redis instance.")
+            return
+
+        if transfer_user_ids:
+            print(f"Queueing {task_count} transfers of fake playlists for {len(transfer_user_ids)} users...")
+            keys = await queue_fake_transfers(service, task_count, transfer_user_ids)
+        else:
+            print(f"Queueing {task_count} tasks for {user_count} users...")
+            keys = await queue_cancelled_tasks(service, task_count, user_count)
+
+        print(f"Draining the queue with {worker_count} workers...")
+        started_at = time.perf_counter()
+        workers = [asyncio.create_task(worker_dispatcher(i)) for i in range(worker_count)]
+
+        try:
+            await wait_until_drained(service)
+            elapsed = time.perf_counter() - started_at
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        print(f"Drained {task_count} tasks in {elapsed:.2f}s ({task_count / elapsed:.1f} tasks/s, {task_count / elapsed / worker_count:.1f} tasks/s per worker)")
+
+        await delete_task_keys(redis, *keys)
+
+        # The statistics of real users are left alone
+        if not transfer_user_ids:
+            await redis.delete(*[make_user_queue_stats_key(FIRST_USER_ID + index) for index in range(user_count)])
+    finally:
+        await redis.aclose()
+
+def main() -> None:
+    parser = ArgumentParser(description="Measure how fast the background workers drain a backlog of tasks.")
+    parser.add_argument("--tasks", type=int, default=1000, help="Number of tasks to queue (default: 1000)")
+    parser.add_argument("--users", type=int, default=10, help="Number of users the tasks are spread over (default: 10)")
+    parser.add_argument("--workers", type=int, default=3, help="Number of workers draining the queue (default: 3)")
+    parser.add_argument("--transfers", action="store_true", help="Queue real transfers between fake playlists instead of cancelled tasks")
+    parser.add_argument("--user-ids", type=int, nargs="+", default=[], help="Existing users the transfers belong to, required with --transfers")
+    args = parser.parse_args()
+
+    if args.transfers and not args.user_ids:
+        parser.error("--transfers needs the IDs of existing users, see --user-ids")
+
+    if args.transfers and not config.ENABLE_FAKE_PROVIDER:
+        parser.error("--transfers needs the fake provider, set ENABLE_FAKE_PROVIDER=true")
+
+    logger.setLevel(logging.WARNING)
+
+    asyncio.run(run_benchmark(args.tasks, args.users, args.workers, args.user_ids if args.transfers else None))
+
+if __name__ == "__main__":
+    main()
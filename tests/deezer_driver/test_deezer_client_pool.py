@@ -0,0 +1,48 @@
+import asyncio
+import types
+
+from tunesynctool.drivers.common.deezer import client_pool
+from tunesynctool.drivers.common.deezer.client_pool import LOGIN_RETRY_DELAY, SharedDeezerClient
+
+class FlakyLoginClient:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.attempts = 0
+
+    async def login(self):
+        self.attempts += 1
+
+        if self.attempts <= self.failures:
+            raise ConnectionError('Deezer is down')
+
+def test_failed_login_is_retried_after_backing_off(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(client_pool, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+
+    client = FlakyLoginClient(failures=2)
+    shared = SharedDeezerClient(client=client)
+
+    async def run():
+        await shared.ensure_logged_in()
+        await shared.ensure_logged_in()
+        assert client.attempts == 1
+        assert not shared.logged_in
+
+        now[0] += LOGIN_RETRY_DELAY
+        await shared.ensure_logged_in()
+        assert client.attempts == 2
+
+        # The second failure doubles the wait
+        now[0] += LOGIN_RETRY_DELAY
+        await shared.ensure_logged_in()
+        assert client.attempts == 2
+
+        now[0] += LOGIN_RETRY_DELAY
+        await shared.ensure_logged_in()
+        assert client.attempts == 3
+        assert shared.logged_in
+
+        await shared.ensure_logged_in()
+        assert client.attempts == 3
+
+    asyncio.run(run())
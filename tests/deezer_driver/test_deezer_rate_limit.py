@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+import pytest
+from deezer.errors import APIError
+
+from tunesynctool.drivers.common.deezer import AsyncDeezerDriver
+from tunesynctool.drivers.common.deezer.client_pool import SharedDeezerClient
+from tunesynctool.exceptions import RateLimitException, ServiceDriverException
+from tunesynctool.models import Configuration
+
+class FakeDeezerClient:
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+
+    async def get_track(self, item_id):
+        raise self.error
+
+    async def search(self, media_type, query, limit):
+        return [{'data': [{'id': 1}, {'id': 2}]}]
+
+def make_driver(error: Exception) -> AsyncDeezerDriver:
+    driver = AsyncDeezerDriver(Configuration(deezer_arl='arl'))
+    shared = SharedDeezerClient(client=FakeDeezerClient(error))
+
+    async def get_client():
+        return shared
+
+    driver._AsyncDeezerDriver__get_client = get_client
+    return driver
+
+def test_quota_errors_raise_rate_limit_exception():
+    driver = make_driver(APIError(json.dumps({'type': 'Exception', 'message': 'Quota limit exceeded', 'code': 4})))
+
+    with pytest.raises(RateLimitException) as e:
+        asyncio.run(driver.get_track('1'))
+
+    assert e.value.retry_after == 5
+
+    # Raised by the lookups behind a search, and passed on as is
+    with pytest.raises(RateLimitException):
+        asyncio.run(driver.search_tracks('query'))
+
+def test_other_api_errors_are_not_rate_limits():
+    driver = make_driver(APIError(json.dumps({'type': 'Exception', 'message': 'Something else', 'code': 2})))
+
+    with pytest.raises(ServiceDriverException) as e:
+        asyncio.run(driver.get_track('1'))
+
+    assert not isinstance(e.value, RateLimitException)
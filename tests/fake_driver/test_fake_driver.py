@@ -0,0 +1,69 @@
+import pytest
+
+from tunesynctool.drivers.common.fake import FakeDriver, FakeDriverBehavior
+from tunesynctool.exceptions import RateLimitException, ServiceDriverException, TrackNotFoundException, UnsupportedFeatureException
+
+def test_fake_driver_is_deterministic():
+    behavior = FakeDriverBehavior(catalog_size=200, playlist_count=3, playlist_size=10)
+
+    first = FakeDriver(behavior=behavior)
+    second = FakeDriver(behavior=behavior)
+
+    assert first.get_playlist_tracks('playlist-00000') == second.get_playlist_tracks('playlist-00000')
+    assert first.get_track('track-0000042').title == second.get_track('track-0000042').title
+
+def test_fake_driver_isrc_lookup():
+    driver = FakeDriver(behavior=FakeDriverBehavior(catalog_size=200))
+    track = driver.get_track('track-0000007')
+
+    assert driver.get_track_by_isrc(track.isrc) == track
+    assert driver.search_tracks(f'isrc:{track.isrc}') == [track]
+
+    with pytest.raises(TrackNotFoundException):
+        driver.get_track_by_isrc('QZF000000000')
+
+def test_fake_driver_youtube_like_hides_isrc():
+    driver = FakeDriver(behavior=FakeDriverBehavior.youtube_like(catalog_size=50, latency_ms=0))
+    track = driver.get_track('track-0000001')
+
+    assert track.isrc is None
+
+    with pytest.raises(UnsupportedFeatureException):
+        driver.get_track_by_isrc('QZF000000000')
+
+def test_fake_driver_error_injection():
+    driver = FakeDriver(behavior=FakeDriverBehavior(catalog_size=50, error_rate=1.0))
+
+    with pytest.raises(ServiceDriverException):
+        driver.get_track('track-0000001')
+
+def test_fake_driver_rate_limit_injection():
+    driver = FakeDriver(behavior=FakeDriverBehavior(catalog_size=50, rate_limit_rate=1.0, rate_limit_retry_after=3.0))
+
+    with pytest.raises(RateLimitException) as exc_info:
+        driver.get_track('track-0000001')
+
+    assert exc_info.value.retry_after == 3.0
+
+def test_fake_driver_get_tracks_fetches_pages():
+    driver = FakeDriver(behavior=FakeDriverBehavior(catalog_size=200, page_size=50))
+    track_ids = [f'track-{index:07d}' for index in range(120)] + ['track-9999999']
+
+    tracks = driver.get_tracks(track_ids)
+
+    assert [track.service_id for track in tracks] == track_ids[:120]
+    assert driver.simulator.request_count == 3
+
+def test_fake_driver_get_tracks_by_isrcs():
+    driver = FakeDriver(behavior=FakeDriverBehavior(catalog_size=200))
+    first = driver.get_track('track-0000003')
+    second = driver.get_track('track-0000004')
+
+    tracks = driver.get_tracks_by_isrcs([first.isrc, 'QZF000000000', second.isrc, first.isrc])
+
+    assert tracks == {first.isrc: first, second.isrc: second}
+
+def test_fake_driver_youtube_like_resolves_no_isrcs():
+    driver = FakeDriver(behavior=FakeDriverBehavior.youtube_like(catalog_size=50, latency_ms=0))
+
+    assert driver.get_tracks_by_isrcs(['QZF000000000']) == {}
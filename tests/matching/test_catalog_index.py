@@ -0,0 +1,43 @@
+import pytest
+
+from tunesynctool.features import CatalogIndex
+from tunesynctool.models import Track
+
+@pytest.fixture
+def catalog_index():
+    return CatalogIndex([
+        Track(title='Paranoid Android', primary_artist='Radiohead', album_name='OK Computer', duration_seconds=387, service_id='1', service_name='subsonic'),
+        Track(title='Karma Police', primary_artist='Radiohead', album_name='OK Computer', duration_seconds=264, service_id='2', service_name='subsonic', isrc='GBAYE9700142'),
+        Track(title='Paranoid', primary_artist='Black Sabbath', album_name='Paranoid', duration_seconds=168, service_id='3', service_name='subsonic'),
+    ])
+
+def test_find_match_by_isrc(catalog_index: CatalogIndex):
+    track = Track(title='Something else entirely', isrc='GBAYE9700142', service_name='spotify')
+
+    assert catalog_index.find_match(track).service_id == '2'
+
+def test_find_match_by_title_and_artist(catalog_index: CatalogIndex):
+    track = Track(title='Paranoid Android (Remastered)', primary_artist='Radiohead', album_name='OK Computer', duration_seconds=386, service_name='spotify')
+
+    assert catalog_index.find_match(track).service_id == '1'
+
+def test_find_match_ignores_different_durations(catalog_index: CatalogIndex):
+    track = Track(title='Paranoid', primary_artist='Black Sabbath', album_name='Paranoid', duration_seconds=250, service_name='spotify')
+
+    assert catalog_index.find_match(track) is None
+
+def test_find_match_without_candidates(catalog_index: CatalogIndex):
+    track = Track(title='Blackbird', primary_artist='The Beatles', service_name='spotify')
+
+    assert catalog_index.find_match(track) is None
+
+def test_remove_and_replace(catalog_index: CatalogIndex):
+    catalog_index.remove(['2'])
+
+    assert '2' not in catalog_index
+    assert catalog_index.find_match(Track(isrc='GBAYE9700142')) is None
+
+    catalog_index.add([Track(title='Paranoid', primary_artist='Black Sabbath', duration_seconds=250, service_id='3', service_name='subsonic')])
+
+    assert len(catalog_index) == 2
+    assert catalog_index.get('3').duration_seconds == 250
@@ -0,0 +1,97 @@
+from typing import Dict, List
+
+from tunesynctool.features import SubsonicCatalog
+from tunesynctool.models import Track
+
+class FakeLibrary:
+    """Stands in for a SubsonicDriver, serving albums from memory and recording which ones were fetched."""
+
+    def __init__(self) -> None:
+        self.albums: Dict[str, dict] = {}
+        self.songs: Dict[str, List[Track]] = {}
+        self.last_modified = 1000
+        self.fetched: List[List[str]] = []
+
+    def put_album(self, album_id: str, titles: List[str], changed: str = '1') -> None:
+        self.albums[album_id] = {'id': album_id, 'songCount': len(titles), 'changed': changed}
+        self.songs[album_id] = [
+            Track(title=title, primary_artist='Artist', service_id=f'{album_id}-{i}', service_name='subsonic', service_data={'albumId': album_id})
+            for i, title in enumerate(titles)
+        ]
+        self.last_modified += 1
+
+    def delete_album(self, album_id: str) -> None:
+        del self.albums[album_id]
+        del self.songs[album_id]
+        self.last_modified += 1
+
+    def get_library_last_modified(self, if_modified_since: int = 0) -> int:
+        return self.last_modified
+
+    def get_library_albums(self) -> List[dict]:
+        return list(self.albums.values())
+
+    def get_album_tracks(self, album_ids: List[str]) -> List[Track]:
+        self.fetched.append(list(album_ids))
+        return [track for album_id in album_ids for track in self.songs[album_id]]
+
+def make_catalog() -> tuple:
+    library = FakeLibrary()
+    library.put_album('a', ['One', 'Two'])
+    library.put_album('b', ['Three'])
+
+    catalog = SubsonicCatalog(library)
+    assert catalog.refresh()
+
+    return library, catalog
+
+def test_first_refresh_indexes_everything():
+    library, catalog = make_catalog()
+
+    assert len(catalog.index) == 3
+    assert sorted(library.fetched[0]) == ['a', 'b']
+
+def test_refresh_without_changes_fetches_nothing():
+    library, catalog = make_catalog()
+    index = catalog.index
+
+    assert not catalog.refresh()
+    assert catalog.index is index
+    assert len(library.fetched) == 1
+
+def test_refresh_fetches_only_added_albums():
+    library, catalog = make_catalog()
+    library.put_album('c', ['Four'])
+
+    assert catalog.refresh()
+    assert library.fetched[-1] == ['c']
+    assert 'c-0' in catalog.index
+    assert len(catalog.index) == 4
+
+def test_refresh_replaces_the_tracks_of_changed_albums():
+    library, catalog = make_catalog()
+    library.put_album('a', ['One (Remastered)'], changed='2')
+
+    assert catalog.refresh()
+    assert library.fetched[-1] == ['a']
+    assert catalog.index.get('a-0').title == 'One (Remastered)'
+    assert 'a-1' not in catalog.index
+    assert len(catalog.index) == 2
+
+def test_refresh_drops_removed_albums():
+    library, catalog = make_catalog()
+    library.delete_album('b')
+
+    assert catalog.refresh()
+    assert library.fetched[-1] == []
+    assert 'b-0' not in catalog.index
+    assert len(catalog.index) == 2
+
+def test_refresh_leaves_the_previous_index_untouched():
+    library, catalog = make_catalog()
+    previous_index = catalog.index
+    library.delete_album('a')
+
+    assert catalog.refresh()
+    assert len(previous_index) == 3
+    assert len(catalog.index) == 1
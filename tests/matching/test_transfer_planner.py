@@ -0,0 +1,50 @@
+import asyncio
+from dataclasses import replace
+
+from tunesynctool.drivers.common.fake import AsyncFakeDriver, FakeDriver, FakeDriverBehavior
+from tunesynctool.features import AsyncTransferPlanner
+
+def test_plan_resolves_isrcs_before_searching():
+    source = FakeDriver(behavior=FakeDriverBehavior(service_name='fake-source', catalog_size=50))
+    target = AsyncFakeDriver(behavior=FakeDriverBehavior(service_name='fake-target', catalog_size=50))
+
+    tracks = [source.get_track(f'track-{i:07d}') for i in range(1, 11)]
+    # Half of the playlist has no ISRC, so it can only be found by searching
+    tracks = [replace(track, isrc=None) if i % 2 else track for i, track in enumerate(tracks)]
+
+    plan = asyncio.run(AsyncTransferPlanner(target).plan(tracks))
+    identifiers, search = plan.phases
+
+    assert identifiers.tracks == 10 and identifiers.matched == 5
+    assert search.tracks == 5
+    assert [match.isrc for match in plan.matches[::2]] == [track.isrc for track in tracks[::2]]
+
+def test_identifier_phase_makes_no_search_calls():
+    source = FakeDriver(behavior=FakeDriverBehavior(service_name='fake-source', catalog_size=50))
+    target = AsyncFakeDriver(behavior=FakeDriverBehavior(service_name='fake-target', catalog_size=50))
+
+    tracks = [source.get_track(f'track-{i:07d}') for i in range(1, 11)]
+    tracks = [replace(track, isrc=None) if i % 2 else track for i, track in enumerate(tracks)]
+
+    search_calls = []
+    search_tracks = target.search_tracks
+
+    async def counting_search_tracks(*args, **kwargs):
+        search_calls.append(args)
+        return await search_tracks(*args, **kwargs)
+
+    target.search_tracks = counting_search_tracks
+
+    searches_before_match = {}
+
+    async def on_match(track, matched_track):
+        searches_before_match[track.service_id] = len(search_calls)
+
+    plan = asyncio.run(AsyncTransferPlanner(target, on_match=on_match).plan(tracks))
+    identifiers, search = plan.phases
+
+    assert identifiers.matched == 5
+    assert all(searches_before_match[track.service_id] == 0 for track in tracks[::2])
+    assert search_calls
+    assert search.matched == 5
+    assert [match.title for match in plan.matches[1::2]] == [track.title for track in tracks[1::2]]
@@ -0,0 +1,40 @@
+import pytest
+
+from spotipy.exceptions import SpotifyException
+
+from tunesynctool.drivers.common.spotify import SpotifyDriver, SpotifyMapper
+from tunesynctool.exceptions import RateLimitException, TrackNotFoundException
+
+class FakeSpotify:
+    def __init__(self, error: SpotifyException) -> None:
+        self.error = error
+
+    def track(self, track_id):
+        raise self.error
+
+    def tracks(self, track_ids):
+        raise self.error
+
+def make_driver(error: SpotifyException) -> SpotifyDriver:
+    driver = object.__new__(SpotifyDriver)
+    driver._mapper = SpotifyMapper()
+    driver._SpotifyDriver__spotify = FakeSpotify(error)
+
+    return driver
+
+def test_too_many_requests_raise_rate_limit_exception():
+    driver = make_driver(SpotifyException(429, -1, 'Too many requests', headers={'Retry-After': '7'}))
+
+    with pytest.raises(RateLimitException) as e:
+        driver.get_track('track-id')
+
+    assert e.value.retry_after == 7
+
+    with pytest.raises(RateLimitException):
+        driver.get_tracks(['track-id'])
+
+def test_other_errors_are_not_rate_limits():
+    driver = make_driver(SpotifyException(404, -1, 'Not found'))
+
+    with pytest.raises(TrackNotFoundException):
+        driver.get_track('track-id')
@@ -0,0 +1,24 @@
+import pytest
+
+from tunesynctool.drivers.common.subsonic import SubsonicDriver
+from tunesynctool.exceptions import RateLimitException
+from tunesynctool.models import Configuration
+
+class FakeResponse:
+    status_code = 429
+    headers = {'Retry-After': '3'}
+
+def test_too_many_requests_raise_rate_limit_exception():
+    driver = SubsonicDriver(Configuration(subsonic_username='user', subsonic_password='password'))
+    driver._SubsonicDriver__subsonic._session.request = lambda **kwargs: FakeResponse()
+
+    with pytest.raises(RateLimitException) as e:
+        driver.get_track('track-id')
+
+    assert e.value.retry_after == 3
+
+    # Not wrapped in a ServiceDriverException on the way out of the thread pool either
+    with pytest.raises(RateLimitException):
+        driver.get_tracks(['track-id'])
+
+    driver.close()
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from tunesynctool.utilities import BackgroundEventLoop
+
+def test_background_loop_reuses_the_same_loop():
+    background_loop = BackgroundEventLoop()
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    try:
+        assert background_loop.run(current_loop()) is background_loop.run(current_loop())
+    finally:
+        background_loop.close()
+
+def test_background_loop_raises_the_coroutines_exception():
+    background_loop = BackgroundEventLoop()
+
+    async def fail():
+        raise ValueError('boom')
+
+    try:
+        with pytest.raises(ValueError):
+            background_loop.run(fail())
+    finally:
+        background_loop.close()
+
+def test_background_loop_runs_off_the_calling_thread():
+    background_loop = BackgroundEventLoop()
+
+    async def current_thread():
+        return threading.current_thread()
+
+    try:
+        assert background_loop.run(current_thread()) is not threading.current_thread()
+    finally:
+        background_loop.close()
+
+def test_background_loop_refuses_work_once_closed():
+    background_loop = BackgroundEventLoop()
+    background_loop.close()
+    background_loop.close()
+
+    async def noop():
+        pass
+
+    with pytest.raises(RuntimeError):
+        background_loop.run(noop())
@@ -0,0 +1,17 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from tunesynctool.utilities import parse_retry_after
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after('-5') == 0
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=60)
+
+    assert 50 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 60
+
+def test_parse_retry_after_invalid():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
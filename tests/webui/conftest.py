@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "webui"))
+
+# The API's Config() is instantiated at import time and requires these settings.
+# The tests never connect to the database, so dummy values are enough.
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_USER": "root",
+    "APP_HOST": "localhost",
+    "APP_SECRET": "dummy",
+    "ENCRYPTION_KEY": "dummy",
+    "ENCRYPTION_SALT": "dummy",
+}.items():
+    os.environ.setdefault(name, value)
+
+# The API imports its core first. Importing a model first runs into a circular import between the modules.
+import api.core  # noqa: E402, F401
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import uuid
+
+from fakeredis import FakeAsyncRedis, FakeServer
+from tunesynctool.exceptions import RateLimitException
+
+from api.models.task import PlaylistTaskCreate, PlaylistTaskProgress, PlaylistTaskStatus, TaskKind, TaskStatus
+from api.workers import dispatcher
+from api.workers.dispatcher import TaskOutcome, process_single_task
+from api.workers.utils.context import WorkerContext
+from api.workers.utils.keys import make_task_checkpoint_key, make_task_key, make_user_running_tasks_key, make_user_waiting_tasks_key
+from api.workers.utils.queue import dequeue_next_entry, enqueue_task, ensure_consumer_group
+from api.workers.utils.serialization import serialize_task
+
+async def queue_task(redis: FakeAsyncRedis, user_id: int) -> str:
+    task = PlaylistTaskStatus(
+        task_id=uuid.uuid4(),
+        status=TaskStatus.QUEUED,
+        queued_at=int(time.time()),
+        arguments=PlaylistTaskCreate(
+            from_provider="spotify",
+            to_provider="youtube",
+            kind=TaskKind.USER_INITIATED_PLAYLIST_TRANSFER,
+            is_dry_run=False,
+            from_playlist="abc",
+        ),
+        progress=PlaylistTaskProgress(),
+    )
+    redis_key = make_task_key(TaskKind.USER_INITIATED_PLAYLIST_TRANSFER, user_id, str(task.task_id))
+    task_fields, _ = serialize_task(task)
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(redis_key, mapping=task_fields)
+        enqueue_task(pipe, redis_key)
+        await pipe.execute()
+
+    return redis_key
+
+def test_a_task_out_of_quota_waits_in_the_queue_until_the_quota_resets(monkeypatch):
+    async def get_task_user(ctx, user_id, task_uuid):
+        return object()
+
+    async def dispatch_task(ctx, task_kind, task, user, redis_key):
+        await ctx.redis.hset(make_task_checkpoint_key(redis_key), "cursor", "3")
+        raise RateLimitException("The daily YouTube Data API quota is exhausted.", retry_after=7200)
+
+    monkeypatch.setattr(dispatcher, "get_task_user", get_task_user)
+    monkeypatch.setattr(dispatcher, "dispatch_task", dispatch_task)
+
+    async def run():
+        redis = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+        await ensure_consumer_group(redis)
+        redis_key = await queue_task(redis, 7)
+
+        ctx = WorkerContext(worker_id=0, worker_name="worker-1", redis=redis)
+        started_at = time.monotonic()
+
+        assert await process_single_task(ctx) == TaskOutcome.THROTTLED
+        assert time.monotonic() - started_at < 5
+
+        fields = await redis.hgetall(redis_key)
+        assert fields["status"] == TaskStatus.QUEUED
+        assert int(fields["not_before"]) >= time.time() + 7100
+        assert "quota is exhausted" in fields["status_reason"]
+        assert await redis.ttl(redis_key) > 7200
+        assert await redis.ttl(make_task_checkpoint_key(redis_key)) > 7200
+
+        assert await redis.lrange(make_user_waiting_tasks_key(7), 0, -1) == [redis_key]
+        assert await redis.zrange(make_user_running_tasks_key(7), 0, -1) == []
+        assert await dequeue_next_entry(redis, "worker-2") is None
+
+    asyncio.run(run())
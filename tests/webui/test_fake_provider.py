@@ -0,0 +1,9 @@
+from api.core.config import config
+from api.helpers.service_driver import SUPPORTED_PROVIDERS, is_valid_provider
+from api.services.factories.service_driver_factory import ServiceDriverFactory
+
+def test_fake_provider_is_off_by_default():
+    assert not config.ENABLE_FAKE_PROVIDER
+    assert "fake" not in SUPPORTED_PROVIDERS
+    assert not is_valid_provider("fake")
+    assert ServiceDriverFactory("fake", credentials_service=None).check_if_provider_disabled()
@@ -0,0 +1,127 @@
+import asyncio
+import time
+import uuid
+
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from api.models.task import PlaylistTaskCreate, PlaylistTaskProgress, PlaylistTaskStatus, TaskKind, TaskStatus
+from api.workers.utils.keys import make_active_tasks_index_key, make_task_key, make_user_running_tasks_key, make_user_waiting_tasks_key
+from api.workers.utils.queue import dequeue_next_entry, enqueue_task, ensure_consumer_group, get_queue_stats
+from api.workers.utils.serialization import serialize_task
+
+def make_redis() -> FakeAsyncRedis:
+    return FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+
+async def queue_task(redis: FakeAsyncRedis, user_id: int) -> str:
+    task = PlaylistTaskStatus(
+        task_id=uuid.uuid4(),
+        status=TaskStatus.QUEUED,
+        queued_at=int(time.time()),
+        arguments=PlaylistTaskCreate(
+            from_provider="spotify",
+            to_provider="deezer",
+            kind=TaskKind.USER_INITIATED_PLAYLIST_TRANSFER,
+            is_dry_run=False,
+            from_playlist="abc",
+        ),
+        progress=PlaylistTaskProgress(),
+    )
+    redis_key = make_task_key(TaskKind.USER_INITIATED_PLAYLIST_TRANSFER, user_id, str(task.task_id))
+    task_fields, _ = serialize_task(task)
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(redis_key, mapping=task_fields)
+        pipe.sadd(make_active_tasks_index_key(), redis_key)
+        enqueue_task(pipe, redis_key)
+        await pipe.execute()
+
+    return redis_key
+
+def test_a_task_with_unreadable_arguments_is_dropped():
+    async def run():
+        redis = make_redis()
+        await ensure_consumer_group(redis)
+
+        broken_key = await queue_task(redis, 7)
+        await redis.hdel(broken_key, "arguments")
+        valid_key = await queue_task(redis, 7)
+
+        entry = await dequeue_next_entry(redis, "worker-1")
+
+        assert entry.redis_key == valid_key
+        assert await redis.lrange(make_user_waiting_tasks_key(7), 0, -1) == []
+
+    asyncio.run(run())
+
+def test_a_task_with_invalid_json_arguments_is_dropped():
+    async def run():
+        redis = make_redis()
+        await ensure_consumer_group(redis)
+
+        broken_key = await queue_task(redis, 7)
+        await redis.hset(broken_key, "arguments", "{not json")
+
+        assert await dequeue_next_entry(redis, "worker-1") is None
+        assert await redis.lrange(make_user_waiting_tasks_key(7), 0, -1) == []
+
+    asyncio.run(run())
+
+def test_stats_include_users_whose_tasks_all_run():
+    async def run():
+        redis = make_redis()
+        await ensure_consumer_group(redis)
+
+        await queue_task(redis, 7)
+        await dequeue_next_entry(redis, "worker-1")
+        await queue_task(redis, 8)
+
+        stats = await get_queue_stats(redis)
+
+        assert [(user.user_id, user.depth, user.running) for user in stats.users] == [(8, 1, 0), (7, 0, 1)]
+        assert stats.waiting == 1
+
+    asyncio.run(run())
+
+def test_dormant_waiting_tasks_take_no_slots():
+    async def run():
+        redis = make_redis()
+        await ensure_consumer_group(redis)
+
+        cancelled_key = await queue_task(redis, 7)
+        await redis.hset(cancelled_key, "status", TaskStatus.CANCELED)
+        deleted_key = await queue_task(redis, 7)
+        await redis.hset(deleted_key, "status", TaskStatus.MARKED_FOR_DELETION)
+        valid_key = await queue_task(redis, 7)
+
+        entry = await dequeue_next_entry(redis, "worker-1")
+
+        assert entry.redis_key == valid_key
+        assert await redis.zrange(make_user_running_tasks_key(7), 0, -1) == [valid_key]
+        assert await redis.exists(cancelled_key)
+        assert not await redis.exists(deleted_key)
+        assert not await redis.sismember(make_active_tasks_index_key(), deleted_key)
+
+    asyncio.run(run())
+
+def test_a_task_backing_off_is_held_back_until_its_not_before_time():
+    async def run():
+        redis = make_redis()
+        await ensure_consumer_group(redis)
+
+        throttled_key = await queue_task(redis, 7)
+        await redis.hset(throttled_key, "not_before", str(int(time.time()) + 3600))
+        await queue_task(redis, 8)
+
+        entry = await dequeue_next_entry(redis, "worker-1")
+
+        assert entry.redis_key != throttled_key
+        assert await dequeue_next_entry(redis, "worker-2") is None
+        assert await redis.lrange(make_user_waiting_tasks_key(7), 0, -1) == [throttled_key]
+        assert await redis.zrange(make_user_running_tasks_key(7), 0, -1) == []
+
+        await redis.hset(throttled_key, "not_before", str(int(time.time()) - 1))
+
+        entry = await dequeue_next_entry(redis, "worker-2")
+        assert entry.redis_key == throttled_key
+
+    asyncio.run(run())
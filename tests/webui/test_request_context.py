@@ -0,0 +1,37 @@
+import asyncio
+
+from api.core import context
+from api.core.context import get_streaming_request_context
+from api.models.user import User
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.is_open = False
+
+    async def __aenter__(self):
+        self.is_open = True
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.is_open = False
+
+def test_streaming_request_context_releases_its_session_before_returning(monkeypatch):
+    session = FakeSession()
+    user = User(id=7, username="someone")
+    looked_up_with_open_session = []
+
+    async def get_session_instance():
+        return session
+
+    async def resolve_user_from_jwt(self, jwt):
+        looked_up_with_open_session.append(self.user_service.db.is_open)
+        return user
+
+    monkeypatch.setattr(context, "get_session_instance", get_session_instance)
+    monkeypatch.setattr(context.AuthService, "resolve_user_from_jwt", resolve_user_from_jwt)
+
+    request_context = asyncio.run(get_streaming_request_context("token"))
+
+    assert request_context.user is user
+    assert looked_up_with_open_session == [True]
+    assert not session.is_open
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+import uuid
+
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from api.models.task import PlaylistTaskCreate, PlaylistTaskProgress, PlaylistTaskStatus, TaskKind, TaskStatus
+from api.workers.utils.keys import make_task_key, make_task_checkpoint_key, make_task_checkpoint_matches_key
+from api.workers.utils.scripts import SAVE_TASK_UNLESS_DORMANT, get_script
+from api.workers.utils.task_status import check_if_task_is_dormant, save_task, save_task_heartbeat
+
+def make_task() -> PlaylistTaskStatus:
+    return PlaylistTaskStatus(
+        task_id=uuid.uuid4(),
+        status=TaskStatus.RUNNING,
+        queued_at=int(time.time()),
+        arguments=PlaylistTaskCreate(
+            from_provider="spotify",
+            to_provider="deezer",
+            kind=TaskKind.USER_INITIATED_PLAYLIST_TRANSFER,
+            is_dry_run=False,
+            from_playlist="abc",
+        ),
+        progress=PlaylistTaskProgress(),
+    )
+
+async def store_legacy_task(redis: FakeAsyncRedis, task: PlaylistTaskStatus) -> str:
+    redis_key = make_task_key(TaskKind.USER_INITIATED_PLAYLIST_TRANSFER, 7, str(task.task_id))
+    await redis.set(redis_key, task.model_dump_json())
+    return redis_key
+
+def test_partial_write_leaves_a_legacy_task_alone():
+    async def run():
+        redis = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+        task = make_task()
+        redis_key = await store_legacy_task(redis, task)
+        blob = await redis.get(redis_key)
+
+        task.worker_id = "worker-1"
+        task.last_heartbeat = int(time.time())
+
+        assert not await save_task_heartbeat(redis, task, redis_key)
+        assert await redis.type(redis_key) == "string"
+        assert await redis.get(redis_key) == blob
+
+    asyncio.run(run())
+
+def test_complete_write_converts_a_legacy_task():
+    async def run():
+        redis = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+        task = make_task()
+        redis_key = await store_legacy_task(redis, task)
+
+        assert await save_task(redis, task, redis_key, status=TaskStatus.ON_HOLD, use_finished_ttl=False)
+        assert await redis.type(redis_key) == "hash"
+
+        fields = await redis.hgetall(redis_key)
+        assert fields["status"] == TaskStatus.ON_HOLD
+        assert json.loads(fields["arguments"])["from_playlist"] == "abc"
+
+    asyncio.run(run())
+
+def test_deleting_a_task_removes_its_checkpoint():
+    async def run():
+        redis = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+        task = make_task()
+        redis_key = await store_legacy_task(redis, task)
+
+        assert await save_task(redis, task, redis_key, status=TaskStatus.RUNNING, use_finished_ttl=False)
+        await redis.hset(make_task_checkpoint_key(redis_key), mapping={"cursor": "2"})
+        await redis.rpush(make_task_checkpoint_matches_key(redis_key), "a", "b")
+
+        assert await save_task(redis, task, redis_key, status=TaskStatus.MARKED_FOR_DELETION, use_finished_ttl=False)
+        assert await check_if_task_is_dormant(redis, redis_key)
+
+        assert not await redis.exists(
+            redis_key,
+            make_task_checkpoint_key(redis_key),
+            make_task_checkpoint_matches_key(redis_key)
+        )
+
+    asyncio.run(run())
+
+def test_task_scripts_are_built_once_for_every_client():
+    async def run():
+        tasks = [make_task(), make_task()]
+
+        for task in tasks:
+            redis = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+            redis_key = await store_legacy_task(redis, task)
+
+            assert await save_task(redis, task, redis_key, status=TaskStatus.ON_HOLD, use_finished_ttl=False)
+            assert await redis.hget(redis_key, "status") == TaskStatus.ON_HOLD
+
+        assert get_script(redis, SAVE_TASK_UNLESS_DORMANT) is get_script(FakeAsyncRedis(), SAVE_TASK_UNLESS_DORMANT)
+
+    asyncio.run(run())
@@ -0,0 +1,18 @@
+from api.workers.utils.rate_limit import TokenBucket, get_shared_bucket
+
+def test_bursts_go_through_and_the_rest_waits():
+    bucket = TokenBucket(rate=10.0, capacity=50.0)
+
+    assert bucket.reserve(50) == 0
+    assert 0.9 < bucket.reserve(10) <= 1.0
+
+def test_tasks_share_one_bucket_per_name():
+    first = get_shared_bucket("test:shared", 10.0, 50.0)
+    second = get_shared_bucket("test:shared", 10.0, 50.0)
+
+    assert first is second
+    assert get_shared_bucket("test:other", 10.0, 50.0) is not first
+
+    # The burst is used up by the first task, so the second one has to wait
+    assert first.reserve(50) == 0
+    assert second.reserve(10) > 0
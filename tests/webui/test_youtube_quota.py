@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from api.drivers.youtube import quota
+from api.drivers.youtube.quota import QuotaLedger, get_quota_day_start, make_quota_key, make_user_quota_key
+
+def make_ledger() -> QuotaLedger:
+    return QuotaLedger(FakeAsyncRedis(server=FakeServer(), decode_responses=True))
+
+def test_record_and_get_usage():
+    async def run():
+        ledger = make_ledger()
+
+        await ledger.record(7, {"search.list": 100, "videos.list": 2})
+        await ledger.record(None, {"videos.list": 1})
+
+        usage = await ledger.get_usage(7)
+        day = get_quota_day_start()
+
+        assert usage.spent == 103
+        assert usage.remaining == 10000 - 103
+        assert usage.spent_by_method == {"search.list": 100, "videos.list": 3}
+        assert usage.user_spent == 102
+        assert not usage.searches_use_fallback
+        assert usage.resets_at == day + timedelta(days=1)
+        assert await ledger.redis.ttl(make_quota_key(day)) > 0
+        assert await ledger.redis.ttl(make_user_quota_key(day, 7)) > 0
+
+    asyncio.run(run())
+
+def test_searches_fall_back_once_the_reserve_is_reached():
+    async def run():
+        ledger = make_ledger()
+
+        # 10,000 - 6,900 - 100 leaves exactly the 3,000 units kept in reserve
+        await ledger.record(None, {"playlistItems.insert": 6900})
+        assert not await ledger.should_use_fallback_for_search(None)
+
+        await ledger.record(None, {"videos.list": 1})
+        assert await ledger.should_use_fallback_for_search(None)
+
+    asyncio.run(run())
+
+def test_searches_fall_back_once_the_user_used_their_share():
+    async def run():
+        ledger = make_ledger()
+
+        # The next search would use up exactly a quarter of the quota
+        await ledger.record(7, {"search.list": 2400})
+        assert not await ledger.should_use_fallback_for_search(7)
+
+        await ledger.record(7, {"videos.list": 1})
+        assert await ledger.should_use_fallback_for_search(7)
+        assert not await ledger.should_use_fallback_for_search(8)
+
+    asyncio.run(run())
+
+def test_quota_day_starts_at_midnight_pacific_time():
+    before_midnight = get_quota_day_start(datetime(2026, 1, 15, 7, 59, tzinfo=timezone.utc))
+    after_midnight = get_quota_day_start(datetime(2026, 1, 15, 8, 0, tzinfo=timezone.utc))
+
+    assert before_midnight.date().isoformat() == "2026-01-14"
+    assert after_midnight.date().isoformat() == "2026-01-15"
+    assert after_midnight - before_midnight == timedelta(days=1)
+
+def test_usage_resets_when_the_day_rolls_over(monkeypatch):
+    async def run():
+        ledger = make_ledger()
+        today = get_quota_day_start(datetime(2026, 1, 15, 12, 0, tzinfo=timezone.utc))
+        tomorrow = today + timedelta(days=1)
+
+        monkeypatch.setattr(quota, "get_quota_day_start", lambda now=None: today)
+        await ledger.record(7, {"search.list": 9000})
+        assert await ledger.should_use_fallback_for_search(7)
+
+        monkeypatch.setattr(quota, "get_quota_day_start", lambda now=None: tomorrow)
+        usage = await ledger.get_usage(7)
+
+        assert usage.spent == 0
+        assert usage.user_spent == 0
+        assert not usage.searches_use_fallback
+        assert usage.resets_at == tomorrow + timedelta(days=1)
+
+    asyncio.run(run())
@@ -1,13 +1,15 @@
 import json
 import os
 import sys
+import threading
 
+import pytest
 from googleapiclient.errors import HttpError
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "webui"))
 
 from api.drivers.youtube.driver import YouTubeOAuth2Driver
-from tunesynctool.exceptions import ServiceDriverException
+from tunesynctool.exceptions import RateLimitException
 from tunesynctool.models import Track
 
 
@@ -50,9 +52,36 @@ class FakeOfficialClient:
         return FakeSearchResource()
 
 
-class FailingLegacyDriver:
+class FailingRequest:
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+
+    def execute(self):
+        raise make_http_error(self.reason)
+
+
+class FakePlaylistsResource:
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+
+    def list(self, **kwargs):
+        return FailingRequest(self.reason)
+
+
+class FakePlaylistsClient:
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+
+    def playlists(self):
+        return FakePlaylistsResource(self.reason)
+
+
+class FakeLegacyDriver:
+    def __init__(self, tracks) -> None:
+        self.tracks = tracks
+
     def search_tracks(self, query: str, limit: int = 10):
-        raise ServiceDriverException("legacy search failed")
+        return self.tracks[:limit]
 
 
 def test_rate_limit_exception_reads_error_details_reason():
@@ -69,7 +98,7 @@ def test_rate_limit_exception_rejects_unrelated_error_details_reason():
     assert not driver._is_rate_limit_exception(make_http_error("forbidden"))
 
 
-def test_search_tracks_uses_public_search_when_authenticated_legacy_fallback_fails(monkeypatch):
+def test_search_tracks_falls_back_to_the_legacy_driver_when_rate_limited():
     fallback_track = Track(
         title="WOW",
         primary_artist="Artist",
@@ -78,12 +107,36 @@ def test_search_tracks_uses_public_search_when_authenticated_legacy_fallback_fai
     )
     driver = object.__new__(YouTubeOAuth2Driver)
     driver.client = FakeOfficialClient()
-    driver._YouTubeOAuth2Driver__legacy_driver = FailingLegacyDriver()
-
-    monkeypatch.setattr(
-        YouTubeOAuth2Driver,
-        "_YouTubeOAuth2Driver__search_tracks_without_auth",
-        lambda self, query, limit=10: [fallback_track],
-    )
+    driver._YouTubeOAuth2Driver__legacy_driver = FakeLegacyDriver([fallback_track])
+    driver._YouTubeOAuth2Driver__spent_units = {}
+    driver._YouTubeOAuth2Driver__spent_units_lock = threading.Lock()
 
     assert driver.search_tracks("WOW", limit=5) == [fallback_track]
+    assert driver.pop_spent_units() == {"search.list": 100}
+
+
+def make_playlists_driver(reason: str) -> YouTubeOAuth2Driver:
+    driver = object.__new__(YouTubeOAuth2Driver)
+    driver.client = FakePlaylistsClient(reason)
+    driver._YouTubeOAuth2Driver__spent_units = {}
+    driver._YouTubeOAuth2Driver__spent_units_lock = threading.Lock()
+
+    return driver
+
+
+def test_exhausted_quota_raises_rate_limit_exception_until_the_quota_resets():
+    driver = make_playlists_driver("quotaExceeded")
+
+    with pytest.raises(RateLimitException) as e:
+        driver.get_playlist("playlist-id")
+
+    assert 0 < e.value.retry_after <= 25 * 60 * 60
+
+
+def test_rate_limit_raises_rate_limit_exception():
+    driver = make_playlists_driver("rateLimitExceeded")
+
+    with pytest.raises(RateLimitException) as e:
+        driver.get_user_playlists()
+
+    assert e.value.retry_after is None
@@ -0,0 +1,31 @@
+import pytest
+
+from ytmusicapi.exceptions import YTMusicServerError
+
+from tunesynctool.drivers.common.youtube import YouTubeDriver
+from tunesynctool.exceptions import RateLimitException, TrackNotFoundException
+
+class FakeYTMusic:
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+
+    def get_song(self, videoId, signatureTimestamp=None):
+        raise self.error
+
+def make_driver(error: Exception) -> YouTubeDriver:
+    driver = object.__new__(YouTubeDriver)
+    driver._YouTubeDriver__youtube = FakeYTMusic(error)
+
+    return driver
+
+def test_too_many_requests_raise_rate_limit_exception():
+    driver = make_driver(YTMusicServerError('Server returned HTTP 429: Too Many Requests.'))
+
+    with pytest.raises(RateLimitException):
+        driver.get_track('video-id')
+
+def test_other_server_errors_are_not_rate_limits():
+    driver = make_driver(YTMusicServerError('Server returned HTTP 404: Not Found.'))
+
+    with pytest.raises(TrackNotFoundException):
+        driver.get_track('video-id')
@@ -1,6 +1,7 @@
 from typing import Optional, List
 
 from tunesynctool.cli.utils.driver import get_driver_by_name, SUPPORTED_PROVIDERS
+from tunesynctool.cli.utils.catalog import get_catalog_index
 from tunesynctool.drivers import ServiceDriver
 from tunesynctool.features import PlaylistSynchronizer, TrackMatcher
 from tunesynctool.models import Track
@@ -82,7 +83,7 @@ def sync(
         for d in diff:
             echo(style(d, fg='yellow'))
     
-    matcher = TrackMatcher(target_driver)
+    matcher = TrackMatcher(target_driver, catalog=get_catalog_index(target_driver))
 
     matched_tracks = []
     for track in tqdm(diff, desc='Matching tracks'):
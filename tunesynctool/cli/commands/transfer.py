@@ -1,8 +1,11 @@
 from typing import Optional
+import asyncio
 
 from tunesynctool.cli.utils.driver import get_driver_by_name, SUPPORTED_PROVIDERS
-from tunesynctool.drivers import ServiceDriver
-from tunesynctool.features import TrackMatcher
+from tunesynctool.cli.utils.catalog import get_catalog_index
+from tunesynctool.drivers import ServiceDriver, AsyncWrappedServiceDriver
+from tunesynctool.features import AsyncTransferPlanner
+from tunesynctool.models import Track
 from tunesynctool.exceptions import PlaylistNotFoundException
 
 from click import command, option, Choice, echo, argument, pass_obj, UsageError, style, Abort
@@ -44,17 +47,25 @@ def transfer(
         limit=limit
     )
 
-    matcher = TrackMatcher(target_driver)
-    matched_tracks = []
+    catalog = get_catalog_index(target_driver)
 
-    for track in tqdm(source_tracks, desc='Matching tracks'):
-        matched_track = matcher.find_match(track)
-        
-        if matched_track:
-            matched_tracks.append(matched_track)
-            tqdm.write(style(f"Success: Found match: \"{track}\" --> \"{matched_track}\"", fg='green'))
-        else:
-            tqdm.write(style(f"Fail: No result for \"{track}\"", fg='yellow'))
+    with tqdm(total=len(source_tracks), desc='Matching tracks') as progress:
+        async def on_match(track: Track, matched_track: Optional[Track]) -> None:
+            if matched_track:
+                tqdm.write(style(f"Success: Found match: \"{track}\" --> \"{matched_track}\"", fg='green'))
+            else:
+                tqdm.write(style(f"Fail: No result for \"{track}\"", fg='yellow'))
+
+            progress.update()
+
+        # Tracks with IDs or ISRCs are resolved in bulk first, only the rest are searched for
+        planner = AsyncTransferPlanner(AsyncWrappedServiceDriver(target_driver), catalog=catalog, on_match=on_match)
+        plan = asyncio.run(planner.plan(source_tracks))
+
+    matched_tracks = plan.matched_tracks
+
+    for phase in plan.phases:
+        echo(style(f"Matched {phase.matched} of {phase.tracks} tracks by {phase.name} in {phase.seconds:.1f}s", fg='blue'))
 
     echo(style(f"Found {len(matched_tracks)} matches in total", fg='blue' if len(matched_tracks) > 0 else 'red'))
 
@@ -0,0 +1,21 @@
+from typing import Optional
+
+from tunesynctool.drivers import ServiceDriver, SubsonicDriver
+from tunesynctool.features import CatalogIndex, SubsonicCatalog
+
+from click import echo, style
+
+def get_catalog_index(driver: ServiceDriver) -> Optional[CatalogIndex]:
+    """Index the library of the target service, if the driver supports it, so tracks can be matched without sending requests."""
+
+    if not isinstance(driver, SubsonicDriver):
+        return None
+
+    echo(style('Indexing the target library...', fg='blue'))
+
+    catalog = SubsonicCatalog(driver)
+    catalog.refresh()
+
+    echo(style(f'Indexed {len(catalog.index)} tracks', fg='blue'))
+
+    return catalog.index
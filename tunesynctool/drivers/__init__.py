@@ -7,4 +7,5 @@ from .common import (
     DeezerDriver, AsyncDeezerDriver,
     SubsonicDriver, AsyncSubsonicDriver,
     YouTubeDriver, AsyncYouTubeDriver,
+    FakeDriver, AsyncFakeDriver, FakeDriverBehavior,
 )
\ No newline at end of file
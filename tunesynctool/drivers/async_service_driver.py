@@ -1,10 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Dict, List, Optional
+import asyncio
 import logging
 import anyio
 
 from .service_driver import ServiceDriver
 from tunesynctool.models import Playlist, Track, Configuration
+from tunesynctool.exceptions import TrackNotFoundException
 from .service_mapper import ServiceMapper
 
 """
@@ -27,6 +29,7 @@ class AsyncWrappedServiceDriver:
         self.service_name = sync_driver.service_name
         self.supports_musicbrainz_id_querying = sync_driver.supports_musicbrainz_id_querying
         self.supports_direct_isrc_querying = sync_driver.supports_direct_isrc_querying
+        self.max_playlist_insert_batch_size = sync_driver.max_playlist_insert_batch_size
         self.sync_driver = sync_driver
 
         logger.debug(f'Initialized async wrapper for {self.__class__.__name__} driver for {self.service_name} service.')
@@ -86,6 +89,12 @@ class AsyncWrappedServiceDriver:
             track_id=track_id
         )
     
+    async def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        return await self._wrap_sync(
+            self.sync_driver.get_tracks,
+            track_ids=track_ids
+        )
+
     async def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
         return await self._wrap_sync(
             self.sync_driver.search_tracks,
@@ -93,12 +102,63 @@ class AsyncWrappedServiceDriver:
             limit=limit
         )
     
+    async def search_tracks_many(self, queries: List[str], limit: int = 10, max_concurrency: int = 1) -> List[List[Track]]:
+        """
+        Runs search_tracks() for several queries, one after another unless told otherwise.
+        Drivers whose client bounds its own requests (like Deezer's) override this to run them all at once.
+
+        :param queries: The search queries.
+        :param limit: The maximum number of tracks to fetch per query.
+        :param max_concurrency: The maximum number of searches running at the same time. Keep it low for services with tight rate limits.
+        :return: A list of results for each query, in the same order as the queries.
+        """
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def search(query: str) -> List[Track]:
+            async with semaphore:
+                return await self.search_tracks(query=query, limit=limit)
+
+        return list(await asyncio.gather(*[search(query) for query in queries]))
+
     async def get_track_by_isrc(self, isrc: str) -> Track:
         return await self._wrap_sync(
             self.sync_driver.get_track_by_isrc,
             isrc=isrc
         )
     
+    async def get_tracks_by_isrcs(self, isrcs: List[str], max_concurrency: int = 8) -> Dict[str, Track]:
+        """
+        Runs get_track_by_isrc() for several ISRCs at the same time.
+
+        :param isrcs: The ISRCs of the tracks to fetch.
+        :param max_concurrency: The maximum number of lookups running at the same time.
+        :return: The tracks that were found, by their ISRCs. Empty if the service can't be queried by ISRC.
+        """
+
+        if not self.supports_direct_isrc_querying:
+            return {}
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        unique_isrcs = list(dict.fromkeys(isrcs))
+
+        async def lookup(isrc: str) -> Track:
+            async with semaphore:
+                return await self.get_track_by_isrc(isrc=isrc)
+
+        results = await asyncio.gather(*[lookup(isrc) for isrc in unique_isrcs], return_exceptions=True)
+
+        tracks = {}
+        for isrc, result in zip(unique_isrcs, results):
+            if isinstance(result, TrackNotFoundException):
+                continue
+            elif isinstance(result, BaseException):
+                raise result
+
+            tracks[isrc] = result
+
+        return tracks
+
     async def get_saved_tracks(self, limit: int = 10) -> List[Track]:
         return await self._wrap_sync(
             self.sync_driver.get_saved_tracks,
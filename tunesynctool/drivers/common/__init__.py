@@ -1,4 +1,5 @@
 from .spotify import SpotifyDriver, AsyncSpotifyDriver
 from .subsonic import SubsonicDriver, AsyncSubsonicDriver
 from .deezer import DeezerDriver, AsyncDeezerDriver
-from .youtube import YouTubeDriver, AsyncYouTubeDriver
\ No newline at end of file
+from .youtube import YouTubeDriver, AsyncYouTubeDriver
+from .fake import FakeDriver, AsyncFakeDriver, FakeDriverBehavior
\ No newline at end of file
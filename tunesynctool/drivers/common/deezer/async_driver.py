@@ -1,21 +1,59 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
+import asyncio
+import json
 
-from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException
+from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException, RateLimitException
 from tunesynctool.models import Playlist, Configuration, Track
 from tunesynctool.drivers import AsyncWrappedServiceDriver, ServiceDriver
+from tunesynctool.utilities.rate_limit import parse_retry_after
 from .mapper import DeezerMapper
+from .client_pool import SharedDeezerClient, get_shared_client
 
 from streamrip import Config as StreamRipConfig
 from streamrip.client import DeezerClient
-from deezer.errors import InvalidQueryException, DataException
+from deezer.errors import InvalidQueryException, DataException, APIError
 from streamrip.exceptions import NonStreamableError
 
+QUOTA_ERROR_CODES = (4, 700)
+"""Deezer API error codes of an exceeded request quota (4) and an overloaded service (700)."""
+
+QUOTA_RETRY_AFTER = 5
+"""Seconds to wait after a quota error. Deezer's quota is 50 requests per 5 seconds."""
+
+def _raise_for_rate_limit(e: Exception) -> None:
+    """
+    Raise a RateLimitException if the error means Deezer is rate limiting us:
+    a quota error from its API, or a 429 response to one of streamrip's own requests.
+    """
+
+    if isinstance(e, RateLimitException):
+        raise e
+
+    if isinstance(e, APIError):
+        try:
+            error = json.loads(str(e))
+        except ValueError:
+            error = None
+
+        if isinstance(error, dict) and error.get('code') in QUOTA_ERROR_CODES:
+            raise RateLimitException(f'Deezer quota exceeded: {error.get("message")}', retry_after=QUOTA_RETRY_AFTER) from e
+
+    # aiohttp.ClientResponseError
+    if getattr(e, 'status', None) == 429:
+        raise RateLimitException(
+            'Rate limited by Deezer.',
+            retry_after=parse_retry_after((getattr(e, 'headers', None) or {}).get('Retry-After'))
+        ) from e
+
 class AsyncDeezerDriver(ServiceDriver, AsyncWrappedServiceDriver):
     """
     Deezer service driver.
 
     Uses streamrip as its backend:
     https://github.com/nathom/streamrip
+
+    Drivers using the same ARL share one logged-in client (and its connections) per event loop,
+    which also caps how many requests they send to Deezer at once.
     """
 
     def __init__(self, config: Configuration, streamrip_config: Optional[StreamRipConfig] = None) -> None:
@@ -26,31 +64,40 @@ class AsyncDeezerDriver(ServiceDriver, AsyncWrappedServiceDriver):
             supports_direct_isrc_querying=True
         )
 
-        self.__deezer = self.__get_client(
-            streamrip_config=streamrip_config
-        )
-
-    def __get_client(self, streamrip_config: Optional[StreamRipConfig]) -> DeezerClient:
         if not self._config.deezer_arl:
             raise ValueError('Deezer ARL token is required for this service to work but was not set.')
-        
-        if not streamrip_config:
-            streamrip_config = StreamRipConfig.defaults()
 
-        streamrip_config.session.deezer.arl = self._config.deezer_arl
+        self.__streamrip_config = streamrip_config
+        self.__private_client: Optional[SharedDeezerClient] = None
 
-        return DeezerClient(
-            config=streamrip_config
-        )
+    async def __get_client(self) -> SharedDeezerClient:
+        """
+        Get the client to send requests with, logged in.
+        A custom streamrip config gets a client of its own, since it may differ from the shared one's.
+        """
+
+        if self.__streamrip_config:
+            if not self.__private_client:
+                self.__streamrip_config.session.deezer.arl = self._config.deezer_arl
+                self.__private_client = SharedDeezerClient(client=DeezerClient(config=self.__streamrip_config))
+
+            shared = self.__private_client
+        else:
+            shared = get_shared_client(self._config.deezer_arl)
+
+        await shared.ensure_logged_in()
+        return shared
 
     async def get_user_playlists(self, limit: int = 25) -> List[Playlist]:
         raise UnsupportedFeatureException('Fetching user playlists from Deezer is not supported currently.')
 
     async def get_playlist_tracks(self, playlist_id: str, limit: int = 100) -> List[Track]:
         try:
-            response = await self.__deezer.get_playlist(
-                item_id=playlist_id
-            )
+            shared = await self.__get_client()
+            async with shared.semaphore:
+                response = await shared.client.get_playlist(
+                    item_id=playlist_id
+                )
             
             response_tracks: List[dict] = response.get('tracks', [])
             if limit > 0:
@@ -65,6 +112,7 @@ class AsyncDeezerDriver(ServiceDriver, AsyncWrappedServiceDriver):
         except (InvalidQueryException, DataException) as e:
             raise PlaylistNotFoundException(e)
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
     
     async def create_playlist(self, name: str) -> Playlist:
@@ -78,38 +126,70 @@ class AsyncDeezerDriver(ServiceDriver, AsyncWrappedServiceDriver):
 
     async def get_playlist(self, playlist_id: str) -> Playlist:
         try:
-            response = await self.__deezer.get_playlist(
-                item_id=playlist_id
-            )
+            shared = await self.__get_client()
+            async with shared.semaphore:
+                response = await shared.client.get_playlist(
+                    item_id=playlist_id
+                )
 
             return self._mapper.map_playlist(response)
         except (InvalidQueryException, DataException) as e:
             raise PlaylistNotFoundException(e)
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
 
     async def get_track(self, track_id: str) -> Track:
         try:
-            response = await self.__deezer.get_track(
-                item_id=track_id
-            )
+            shared = await self.__get_client()
+            async with shared.semaphore:
+                response = await shared.client.get_track(
+                    item_id=track_id
+                )
 
             return self._mapper.map_track(response)
         except (InvalidQueryException, NonStreamableError) as e:
             raise TrackNotFoundException(e)
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
 
+    async def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        """
+        Fetch several tracks at the same time, bounded by the shared client's request limit.
+
+        :param track_ids: The IDs of the tracks to fetch.
+        :return: The tracks that exist, in the same order as the IDs.
+        """
+
+        results = await asyncio.gather(
+            *[self.get_track(track_id=track_id) for track_id in track_ids],
+            return_exceptions=True
+        )
+
+        tracks = []
+        for result in results:
+            if isinstance(result, TrackNotFoundException):
+                continue
+            elif isinstance(result, BaseException):
+                raise result
+
+            tracks.append(result)
+
+        return tracks
+
     async def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
         if not query or len(query) == 0:
             return []
         
         try:
-            response: List[dict] = await self.__deezer.search(
-                media_type='track',
-                query=query,
-                limit=limit
-            )
+            shared = await self.__get_client()
+            async with shared.semaphore:
+                response: List[dict] = await shared.client.search(
+                    media_type='track',
+                    query=query,
+                    limit=limit
+                )
 
             if not response or len(response) == 0:
                 return []
@@ -118,32 +198,35 @@ class AsyncDeezerDriver(ServiceDriver, AsyncWrappedServiceDriver):
 
             # Deezer doesn't return all track information when using their search endpoint
             # so we have to manually query for additional track information.
-            # If the limit is set too high, this may lead to unintentional API spamming...
-            return_values = []
-            for track in response_tracks:
-                try:
-                    track_id = track.get('id', None)
-                    if not track_id:
-                        continue
+            # These lookups run concurrently, bounded by the shared client's request limit.
+            return await self.get_tracks(
+                track_ids=[track.get('id') for track in response_tracks if track.get('id')]
+            )
+        except Exception as e:
+            _raise_for_rate_limit(e)
+            raise ServiceDriverException(e)
 
-                    result = await self.get_track(
-                        track_id=track_id
-                    )
+    async def search_tracks_many(self, queries: List[str], limit: int = 10) -> List[List[Track]]:
+        """
+        Runs search_tracks() for several queries at the same time.
+        The shared client limits how many requests are sent at once, so any number of queries can be given.
 
-                    if result:
-                        return_values.append(result)
-                except TrackNotFoundException:
-                    continue
+        :param queries: The search queries.
+        :param limit: The maximum number of tracks to fetch per query.
+        :return: A list of results for each query, in the same order as the queries.
+        """
 
-            return return_values
-        except Exception as e:
-            raise ServiceDriverException(e)
+        return list(await asyncio.gather(*[self.search_tracks(query=query, limit=limit) for query in queries]))
         
     async def get_track_by_isrc(self, isrc: str) -> Track:
         try:
-            response = self.__deezer.client.api.get_track_by_ISRC(
-                isrc=isrc.replace('-', '').upper()
-            )
+            shared = await self.__get_client()
+            async with shared.semaphore:
+                # The underlying API client is synchronous, so it runs in a thread to keep lookups from blocking each other.
+                response = await asyncio.to_thread(
+                    shared.client.client.api.get_track_by_ISRC,
+                    isrc=isrc.replace('-', '').upper()
+                )
 
             return self._mapper.map_track(response)
         except DataException as e:
@@ -151,7 +234,34 @@ class AsyncDeezerDriver(ServiceDriver, AsyncWrappedServiceDriver):
         except InvalidQueryException as e:
             raise TrackNotFoundException(e)
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
         
+    async def get_tracks_by_isrcs(self, isrcs: List[str]) -> Dict[str, Track]:
+        """
+        Look up several ISRCs at the same time, each with a single request to Deezer's /track/isrc: endpoint.
+        The shared client limits how many requests are sent at once, so any number of ISRCs can be given.
+
+        :param isrcs: The ISRCs of the tracks to fetch.
+        :return: The tracks that were found, by their ISRCs.
+        """
+
+        unique_isrcs = list(dict.fromkeys(isrcs))
+        results = await asyncio.gather(
+            *[self.get_track_by_isrc(isrc=isrc) for isrc in unique_isrcs],
+            return_exceptions=True
+        )
+
+        tracks = {}
+        for isrc, result in zip(unique_isrcs, results):
+            if isinstance(result, TrackNotFoundException):
+                continue
+            elif isinstance(result, BaseException):
+                raise result
+
+            tracks[isrc] = result
+
+        return tracks
+
     async def get_saved_tracks(self, limit: int = 10) -> List[Track]:
         raise UnsupportedFeatureException('Retrieving saved tracks on Deezer is not currently supported.')
\ No newline at end of file
@@ -0,0 +1,86 @@
+from dataclasses import dataclass, field
+from typing import Dict
+from weakref import WeakKeyDictionary
+import asyncio
+import hashlib
+import logging
+import time
+
+from streamrip import Config as StreamRipConfig
+from streamrip.client import DeezerClient
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_REQUESTS = 8
+"""How many requests a shared client sends to Deezer at the same time, across every driver using it."""
+
+LOGIN_RETRY_DELAY = 30
+"""Seconds to wait before logging in again after a failed attempt. Doubles with every further failure."""
+
+LOGIN_RETRY_MAX_DELAY = 900
+"""Upper bound for the wait between login attempts, in seconds."""
+
+@dataclass
+class SharedDeezerClient:
+    """
+    A streamrip client shared by every Deezer driver that uses the same ARL on the same event loop.
+    """
+
+    client: DeezerClient
+    semaphore: asyncio.Semaphore = field(default_factory=lambda: asyncio.Semaphore(MAX_CONCURRENT_REQUESTS))
+    login_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    logged_in: bool = False
+    login_failures: int = 0
+    next_login_at: float = 0.0
+
+    async def ensure_logged_in(self) -> None:
+        """
+        Log in with the ARL, unless already logged in.
+
+        Public catalog lookups work without logging in, so a failed login is only logged. It is retried on later calls,
+        waiting longer after every failure (see LOGIN_RETRY_DELAY), so a Deezer outage doesn't turn every request into a login attempt.
+        """
+
+        if self.logged_in or time.monotonic() < self.next_login_at:
+            return
+
+        async with self.login_lock:
+            if self.logged_in or time.monotonic() < self.next_login_at:
+                return
+
+            try:
+                await self.client.login()
+            except Exception as e:
+                delay = min(LOGIN_RETRY_DELAY * 2 ** self.login_failures, LOGIN_RETRY_MAX_DELAY)
+                self.login_failures += 1
+                self.next_login_at = time.monotonic() + delay
+
+                logger.warning(f'Logging in to Deezer failed, continuing without a session and retrying in {delay}s. Reason: {e}')
+                return
+
+            self.logged_in = True
+            self.login_failures = 0
+
+# Clients hold sessions bound to the loop they were created on, so they are kept per loop
+# and go away together with it.
+_clients: 'WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, SharedDeezerClient]]' = WeakKeyDictionary()
+
+def get_shared_client(arl: str) -> SharedDeezerClient:
+    """
+    Get the client of an ARL on the running event loop, creating it on first use.
+
+    :param arl: The Deezer ARL token.
+    :return: The shared client.
+    """
+
+    loop = asyncio.get_running_loop()
+    key = hashlib.sha256(arl.encode()).hexdigest()
+
+    clients = _clients.setdefault(loop, {})
+
+    if key not in clients:
+        streamrip_config = StreamRipConfig.defaults()
+        streamrip_config.session.deezer.arl = arl
+        clients[key] = SharedDeezerClient(client=DeezerClient(config=streamrip_config))
+
+    return clients[key]
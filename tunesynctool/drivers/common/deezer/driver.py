@@ -1,9 +1,9 @@
-from typing import List, Optional
-import asyncio
+from typing import Dict, List, Optional
 
 from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException
 from tunesynctool.models import Playlist, Configuration, Track
 from tunesynctool.drivers import ServiceDriver
+from tunesynctool.utilities import BackgroundEventLoop
 from .mapper import DeezerMapper
 from .async_driver import AsyncDeezerDriver
 
@@ -16,6 +16,9 @@ class DeezerDriver(ServiceDriver):
     Deezer service driver.
 
     Synchronous wrapper for AsyncDeezerDriver.
+
+    Every call runs on the same background event loop, so the client's sessions and connections
+    are reused across calls instead of being set up again for each one. Call close() when done.
     """
     def __init__(self, config, streamrip_config = None):
         super().__init__(
@@ -26,52 +29,76 @@ class DeezerDriver(ServiceDriver):
         )
 
         self._async_driver = AsyncDeezerDriver(config, streamrip_config)
+        self._loop = BackgroundEventLoop(name='deezer-driver')
+
+    def close(self) -> None:
+        """
+        Stop the background event loop. The driver can't be used afterwards.
+        """
+
+        self._loop.close()
 
     def get_user_playlists(self, limit: int = 25) -> List[Playlist]:
-        return asyncio.run(self._async_driver.get_user_playlists(
+        return self._loop.run(self._async_driver.get_user_playlists(
             limit=limit
         ))
 
     def get_playlist_tracks(self, playlist_id: str, limit: int = 100) -> List[Track]:
-        return asyncio.run(self._async_driver.get_playlist_tracks(
+        return self._loop.run(self._async_driver.get_playlist_tracks(
             playlist_id=playlist_id,
             limit=limit
         ))    
     
     def create_playlist(self, name: str) -> Playlist:
-        return asyncio.run(self._async_driver.create_playlist(
+        return self._loop.run(self._async_driver.create_playlist(
             name=name
         ))
 
     def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
-        asyncio.run(self._async_driver.add_tracks_to_playlist(
+        self._loop.run(self._async_driver.add_tracks_to_playlist(
             playlist_id=playlist_id,
             track_ids=track_ids
         ))
 
     def get_random_track(self) -> Optional[Track]:
-        return asyncio.run(self._async_driver.get_random_track())
+        return self._loop.run(self._async_driver.get_random_track())
 
     def get_playlist(self, playlist_id: str) -> Playlist:
-        return asyncio.run(self._async_driver.get_playlist(
+        return self._loop.run(self._async_driver.get_playlist(
             playlist_id=playlist_id
         ))
 
     def get_track(self, track_id: str) -> Track:
-        return asyncio.run(self._async_driver.get_track(
+        return self._loop.run(self._async_driver.get_track(
             track_id=track_id
         ))
 
     def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
-        return asyncio.run(self._async_driver.search_tracks(
+        return self._loop.run(self._async_driver.search_tracks(
             query=query,
             limit=limit
         ))
         
+    def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        return self._loop.run(self._async_driver.get_tracks(
+            track_ids=track_ids
+        ))
+
+    def search_tracks_many(self, queries: List[str], limit: int = 10) -> List[List[Track]]:
+        return self._loop.run(self._async_driver.search_tracks_many(
+            queries=queries,
+            limit=limit
+        ))
+
     def get_track_by_isrc(self, isrc: str) -> Track:
-        return asyncio.run(self._async_driver.get_track_by_isrc(
+        return self._loop.run(self._async_driver.get_track_by_isrc(
             isrc=isrc
         ))
     
+    def get_tracks_by_isrcs(self, isrcs: List[str]) -> Dict[str, Track]:
+        return self._loop.run(self._async_driver.get_tracks_by_isrcs(
+            isrcs=isrcs
+        ))
+
     def get_saved_tracks(self, limit: int = 10) -> List[Track]:
         raise UnsupportedFeatureException('Retrieving saved tracks on Deezer is not currently supported.')
\ No newline at end of file
@@ -0,0 +1,5 @@
+from .behavior import FakeDriverBehavior, FakeRequestSimulator
+from .catalog import FakeCatalog
+from .mapper import FakeMapper
+from .driver import FakeDriver
+from .async_driver import AsyncFakeDriver
\ No newline at end of file
@@ -0,0 +1,79 @@
+from typing import Callable, List, Optional, TypeVar
+import asyncio
+
+from tunesynctool.models import Playlist, Configuration, Track
+from tunesynctool.drivers import AsyncWrappedServiceDriver
+from .behavior import FakeDriverBehavior
+from .catalog import FakeCatalog
+from .driver import FakeDriver
+
+T = TypeVar('T')
+
+class AsyncFakeDriver(AsyncWrappedServiceDriver):
+    """
+    Async version of FakeDriver.
+
+    Unlike the other wrapped drivers, this does not offload calls to a thread.
+    Latency is simulated with asyncio.sleep(), so thousands of concurrent requests
+    can be simulated without being capped by the size of the thread pool.
+    """
+
+    def __init__(self, config: Optional[Configuration] = None, behavior: Optional[FakeDriverBehavior] = None, catalog: Optional[FakeCatalog] = None) -> None:
+        super().__init__(
+            sync_driver=FakeDriver(
+                config=config,
+                behavior=behavior,
+                catalog=catalog
+            )
+        )
+
+    async def _simulate(self, handler: Callable[..., T], *args, **kwargs) -> T:
+        with self.sync_driver.simulator.request() as latency:
+            await asyncio.sleep(latency)
+            return handler(*args, **kwargs)
+
+    async def get_user_playlists(self, limit: int = 25) -> List[Playlist]:
+        return await self._simulate(self.sync_driver._get_user_playlists, limit=limit)
+
+    async def get_playlist_tracks(self, playlist_id: str, limit: int = 100) -> List[Track]:
+        track_ids = await self._simulate(self.sync_driver._get_playlist_item_ids, playlist_id=playlist_id, limit=limit)
+
+        mapped_tracks = []
+        for page in self.sync_driver._paginate(track_ids):
+            mapped_tracks.extend(await self._simulate(self.sync_driver._get_tracks, track_ids=page))
+
+        return mapped_tracks
+
+    async def create_playlist(self, name: str) -> Playlist:
+        return await self._simulate(self.sync_driver._create_playlist, name=name)
+
+    async def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
+        await self._simulate(self.sync_driver._add_tracks_to_playlist, playlist_id=playlist_id, track_ids=track_ids)
+
+    async def get_random_track(self) -> Optional[Track]:
+        return await self._simulate(self.sync_driver._get_random_track)
+
+    async def get_playlist(self, playlist_id: str) -> Playlist:
+        return await self._simulate(self.sync_driver._get_playlist, playlist_id=playlist_id)
+
+    async def get_track(self, track_id: str) -> Track:
+        return await self._simulate(self.sync_driver._get_track, track_id=track_id)
+
+    async def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        mapped_tracks = []
+        for page in self.sync_driver._paginate(track_ids):
+            mapped_tracks.extend(await self._simulate(self.sync_driver._get_tracks, track_ids=page))
+
+        return mapped_tracks
+
+    async def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
+        if not query or len(query) == 0:
+            return []
+
+        return await self._simulate(self.sync_driver._search_tracks, query=query, limit=limit)
+
+    async def get_track_by_isrc(self, isrc: str) -> Track:
+        return await self._simulate(self.sync_driver._get_track_by_isrc, isrc=isrc)
+
+    async def get_saved_tracks(self, limit: int = 10) -> List[Track]:
+        return await self._simulate(self.sync_driver._get_saved_tracks, limit=limit)
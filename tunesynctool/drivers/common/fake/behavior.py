@@ -0,0 +1,202 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Generator, Self
+import random
+import threading
+
+from tunesynctool.exceptions import ServiceDriverException, RateLimitException
+
+@dataclass(frozen=True)
+class FakeDriverBehavior:
+    """
+    Describes the catalog and the simulated network behavior of a fake driver.
+
+    Everything is derived from the seed, so two drivers created with the same behavior
+    serve the exact same catalog. Latencies and injected failures are drawn from a
+    separate seeded generator, which makes a run reproducible as long as requests are issued in the same order.
+    """
+
+    service_name: str = field(default='fake')
+    """Service name reported by the driver and stamped on every returned object."""
+
+    seed: int = field(default=0)
+    """Seed for the catalog and for the request simulator."""
+
+    catalog_size: int = field(default=5000)
+    """Number of tracks in the generated catalog."""
+
+    playlist_count: int = field(default=20)
+    """Number of playlists owned by the fake user."""
+
+    playlist_size: int = field(default=100)
+    """Number of tracks in each generated playlist."""
+
+    latency_distribution: str = field(default='constant')
+    """How request latency is sampled. One of 'constant', 'uniform' or 'lognormal'."""
+
+    latency_ms: float = field(default=0.0)
+    """Constant latency, the midpoint of the uniform range or the median of the lognormal distribution."""
+
+    latency_spread_ms: float = field(default=0.0)
+    """Half-width of the uniform range or the standard deviation (in milliseconds) of the lognormal distribution."""
+
+    error_rate: float = field(default=0.0)
+    """Probability (0.0 to 1.0) of a request failing with a ServiceDriverException."""
+
+    rate_limit_rate: float = field(default=0.0)
+    """Probability (0.0 to 1.0) of a request being rejected with a RateLimitException."""
+
+    rate_limit_retry_after: float = field(default=1.0)
+    """Retry-After value (in seconds) attached to simulated rate limit responses."""
+
+    max_concurrent_requests: int = field(default=0)
+    """Requests above this many in flight are rejected as rate limited. 0 or smaller means no limit."""
+
+    page_size: int = field(default=0)
+    """How many playlist items a single simulated request returns. 0 or smaller means everything in one request."""
+
+    exposes_isrc: bool = field(default=True)
+    """Whether returned tracks carry their ISRC. Some real services (like YouTube) never return it."""
+
+    supports_direct_isrc_querying: bool = field(default=True)
+    """Whether the driver allows looking up tracks by ISRC."""
+
+    supports_musicbrainz_id_querying: bool = field(default=False)
+    """Whether searching with a MusicBrainz ID returns the matching track."""
+
+    @classmethod
+    def spotify_like(cls, **overrides) -> Self:
+        """
+        Fast responses with ISRCs and a concurrency cap that answers with rate limits, roughly how Spotify behaves.
+
+        :param overrides: Fields to override on top of the preset.
+        :return: A new FakeDriverBehavior.
+        """
+
+        return replace(cls(
+            service_name='fake-spotify',
+            latency_distribution='lognormal',
+            latency_ms=120,
+            latency_spread_ms=60,
+            error_rate=0.001,
+            rate_limit_rate=0.005,
+            rate_limit_retry_after=2.0,
+            max_concurrent_requests=10,
+            page_size=50,
+        ), **overrides)
+
+    @classmethod
+    def youtube_like(cls, **overrides) -> Self:
+        """
+        Slow responses without ISRCs and no direct ISRC lookups, roughly how YouTube behaves.
+
+        :param overrides: Fields to override on top of the preset.
+        :return: A new FakeDriverBehavior.
+        """
+
+        return replace(cls(
+            service_name='fake-youtube',
+            latency_distribution='lognormal',
+            latency_ms=350,
+            latency_spread_ms=200,
+            error_rate=0.005,
+            rate_limit_rate=0.01,
+            rate_limit_retry_after=5.0,
+            max_concurrent_requests=4,
+            page_size=50,
+            exposes_isrc=False,
+            supports_direct_isrc_querying=False,
+        ), **overrides)
+
+class FakeRequestSimulator:
+    """
+    Decides how long a fake request takes and whether it fails.
+    Thread safe, so one instance can be shared by the sync and async flavors of the driver.
+    """
+
+    def __init__(self, behavior: FakeDriverBehavior) -> None:
+        self._behavior = behavior
+        self._random = random.Random(behavior.seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        self.request_count = 0
+        """Total number of simulated requests, including failed ones."""
+
+    def sample_latency(self) -> float:
+        """
+        Draws a latency from the configured distribution.
+
+        :return: The latency in seconds.
+        """
+
+        behavior = self._behavior
+
+        with self._lock:
+            match behavior.latency_distribution:
+                case 'constant':
+                    latency_ms = behavior.latency_ms
+                case 'uniform':
+                    latency_ms = self._random.uniform(
+                        behavior.latency_ms - behavior.latency_spread_ms,
+                        behavior.latency_ms + behavior.latency_spread_ms
+                    )
+                case 'lognormal':
+                    latency_ms = self.__sample_lognormal(behavior.latency_ms, behavior.latency_spread_ms)
+                case _:
+                    raise ValueError(f'Unknown latency distribution: {behavior.latency_distribution}')
+
+        return max(0.0, latency_ms) / 1000
+
+    def __sample_lognormal(self, median_ms: float, spread_ms: float) -> float:
+        if median_ms <= 0:
+            return 0.0
+
+        # Convert the spread to a sigma relative to the median so that the
+        # parameters stay intuitive (both expressed in milliseconds).
+        sigma = spread_ms / median_ms if spread_ms > 0 else 0.0
+        return self._random.lognormvariate(0, sigma) * median_ms
+
+    @contextmanager
+    def request(self) -> Generator[float, None, None]:
+        """
+        Simulates a single request to the fake service.
+
+        The caller is expected to wait for the yielded latency while inside the context,
+        so that the request counts as in flight for the whole duration.
+
+        :return: The latency to wait for, in seconds.
+        :raises: RateLimitException if the request was rate limited.
+        :raises: ServiceDriverException if an error was injected.
+        """
+
+        behavior = self._behavior
+
+        with self._lock:
+            self.request_count += 1
+            roll = self._random.random()
+            limit = behavior.max_concurrent_requests
+
+            if limit > 0 and self._in_flight >= limit:
+                raise RateLimitException(
+                    f'Too many concurrent requests to {behavior.service_name} (limit is {limit}).',
+                    retry_after=behavior.rate_limit_retry_after
+                )
+
+            self._in_flight += 1
+
+        try:
+            latency = self.sample_latency()
+
+            if roll < behavior.rate_limit_rate:
+                raise RateLimitException(
+                    f'Simulated rate limit from {behavior.service_name}.',
+                    retry_after=behavior.rate_limit_retry_after
+                )
+            elif roll < behavior.rate_limit_rate + behavior.error_rate:
+                raise ServiceDriverException(f'Simulated error from {behavior.service_name}.')
+
+            yield latency
+        finally:
+            with self._lock:
+                self._in_flight -= 1
@@ -0,0 +1,159 @@
+from typing import Dict, List, Optional, Set
+import random
+import threading
+import uuid
+
+from tunesynctool.utilities import clean_str
+from .behavior import FakeDriverBehavior
+
+_ADJECTIVES = [
+    'Midnight', 'Golden', 'Electric', 'Silent', 'Broken', 'Crimson', 'Velvet', 'Neon',
+    'Hollow', 'Distant', 'Wild', 'Frozen', 'Burning', 'Lonely', 'Paper', 'Silver',
+    'Endless', 'Faded', 'Restless', 'Sweet', 'Heavy', 'Little', 'Secret', 'Bitter',
+]
+
+_NOUNS = [
+    'River', 'Heart', 'City', 'Summer', 'Ghost', 'Highway', 'Dream', 'Ocean',
+    'Garden', 'Signal', 'Mirror', 'Fire', 'Parade', 'Machine', 'Horizon', 'Season',
+    'Letter', 'Shadow', 'Satellite', 'Harbor', 'Window', 'Island', 'Thunder', 'Echo',
+]
+
+_ARTIST_SUFFIXES = ['Band', 'Collective', 'Project', 'Orchestra', 'Club', 'Society']
+
+class FakeCatalog:
+    """
+    Deterministically generated music catalog served by the fake drivers.
+
+    Entries are stored as raw dicts, the same way a real API would return them,
+    and are mapped to Track and Playlist objects by FakeMapper.
+    """
+
+    def __init__(self, behavior: FakeDriverBehavior) -> None:
+        self._behavior = behavior
+        self._random = random.Random(behavior.seed)
+        self._lock = threading.Lock()
+
+        self.tracks: Dict[str, dict] = {}
+        """Raw track entries by ID."""
+
+        self.playlists: Dict[str, dict] = {}
+        """Raw playlist entries by ID."""
+
+        self.playlist_items: Dict[str, List[str]] = {}
+        """Track IDs in each playlist, in order."""
+
+        self._tracks_by_isrc: Dict[str, str] = {}
+        self._tracks_by_musicbrainz_id: Dict[str, str] = {}
+        self._search_index: Dict[str, Set[str]] = {}
+
+        self.__generate()
+
+    def __generate(self) -> None:
+        artists = self.__generate_artists(max(1, self._behavior.catalog_size // 12))
+
+        for index in range(self._behavior.catalog_size):
+            track = self.__generate_track(index, artists)
+            self.tracks[track['id']] = track
+            self._tracks_by_isrc[track['isrc']] = track['id']
+            self._tracks_by_musicbrainz_id[track['musicbrainz_id']] = track['id']
+
+            for token in self.__tokenize(f"{track['title']} {track['artist']} {track['album']}"):
+                self._search_index.setdefault(token, set()).add(track['id'])
+
+        track_ids = list(self.tracks.keys())
+        for index in range(self._behavior.playlist_count):
+            playlist_id = f'playlist-{index:05d}'
+            size = min(self._behavior.playlist_size, len(track_ids))
+
+            self.playlists[playlist_id] = {
+                'id': playlist_id,
+                'name': f'{self._random.choice(_ADJECTIVES)} {self._random.choice(_NOUNS)} Mix',
+                'description': 'Generated by tunesynctool for testing purposes.',
+                'owner': 'fake-user',
+                'public': self._random.random() < 0.5,
+            }
+            self.playlist_items[playlist_id] = self._random.sample(track_ids, size)
+
+    def __generate_artists(self, count: int) -> List[str]:
+        artists = []
+
+        for _ in range(count):
+            if self._random.random() < 0.5:
+                artists.append(f'The {self._random.choice(_ADJECTIVES)} {self._random.choice(_NOUNS)}s')
+            else:
+                artists.append(f'{self._random.choice(_NOUNS)} {self._random.choice(_ARTIST_SUFFIXES)}')
+
+        return artists
+
+    def __generate_track(self, index: int, artists: List[str]) -> dict:
+        artist = self._random.choice(artists)
+        featured_artists = [self._random.choice(artists)] if self._random.random() < 0.15 else []
+        year = self._random.randint(1960, 2024)
+
+        return {
+            'id': f'track-{index:07d}',
+            'title': f'{self._random.choice(_ADJECTIVES)} {self._random.choice(_NOUNS)}',
+            'artist': artist,
+            'featured_artists': [name for name in featured_artists if name != artist],
+            'album': f'{self._random.choice(_NOUNS)} of {self._random.choice(_NOUNS)}s',
+            'duration': self._random.randint(120, 420),
+            'track_number': self._random.randint(1, 14),
+            'year': year,
+            'isrc': f'QZF{(index // 100000) % 100:02d}{year % 100:02d}{index % 100000:05d}',
+            'musicbrainz_id': str(uuid.UUID(int=self._random.getrandbits(128), version=4)),
+        }
+
+    def __tokenize(self, text: str) -> List[str]:
+        return clean_str(text).split()
+
+    def get_track(self, track_id: str) -> Optional[dict]:
+        return self.tracks.get(track_id)
+
+    def get_track_by_isrc(self, isrc: str) -> Optional[dict]:
+        track_id = self._tracks_by_isrc.get(isrc.replace('-', '').strip().upper())
+        return self.tracks.get(track_id) if track_id else None
+
+    def search(self, query: str, limit: int) -> List[dict]:
+        """
+        Ranks tracks by how many of the query's words appear in their title, artist or album name.
+        Supports the isrc:<ISRC> query syntax, and bare MusicBrainz IDs.
+
+        :param query: The search query.
+        :param limit: The maximum number of results.
+        :return: A list of raw track entries.
+        """
+
+        query = query.strip()
+
+        if query.lower().startswith('isrc:'):
+            track = self.get_track_by_isrc(query[5:])
+            return [track] if track else []
+
+        if query in self._tracks_by_musicbrainz_id:
+            return [self.tracks[self._tracks_by_musicbrainz_id[query]]]
+
+        scores: Dict[str, int] = {}
+        for token in set(self.__tokenize(query)):
+            for track_id in self._search_index.get(token, ()):
+                scores[track_id] = scores.get(track_id, 0) + 1
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.tracks[track_id] for track_id, _ in ranked[:max(0, limit)]]
+
+    def create_playlist(self, name: str) -> dict:
+        with self._lock:
+            playlist_id = f'playlist-{len(self.playlists):05d}'
+            self.playlists[playlist_id] = {
+                'id': playlist_id,
+                'name': name,
+                'description': None,
+                'owner': 'fake-user',
+                'public': False,
+            }
+            self.playlist_items[playlist_id] = []
+
+            return self.playlists[playlist_id]
+
+    def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
+        with self._lock:
+            self.playlist_items[playlist_id].extend(track_ids)
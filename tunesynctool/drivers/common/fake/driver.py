@@ -0,0 +1,176 @@
+from typing import Callable, List, Optional, TypeVar
+import random
+import time
+
+from tunesynctool.exceptions import PlaylistNotFoundException, TrackNotFoundException, UnsupportedFeatureException
+from tunesynctool.models import Playlist, Configuration, Track
+from tunesynctool.drivers import ServiceDriver
+from .behavior import FakeDriverBehavior, FakeRequestSimulator
+from .catalog import FakeCatalog
+from .mapper import FakeMapper
+
+T = TypeVar('T')
+
+class FakeDriver(ServiceDriver):
+    """
+    In-memory fake service driver.
+
+    Serves a generated catalog with simulated latency, errors and rate limits
+    so that matching, caching and the web UI's workers can be load tested without network access.
+    Never talks to a real streaming service.
+    """
+
+    def __init__(self, config: Optional[Configuration] = None, behavior: Optional[FakeDriverBehavior] = None, catalog: Optional[FakeCatalog] = None) -> None:
+        """
+        Initializes the fake driver.
+
+        :param config: Unused, accepted for parity with the other drivers.
+        :param behavior: Describes the catalog and the simulated network conditions. Defaults to an instant, error free service.
+        :param catalog: Optional catalog to serve. Pass the same catalog to several drivers to share playlists created during a run.
+        """
+
+        behavior = behavior if behavior else FakeDriverBehavior()
+
+        super().__init__(
+            service_name=behavior.service_name,
+            config=config if config else Configuration(),
+            mapper=FakeMapper(
+                service_name=behavior.service_name,
+                exposes_isrc=behavior.exposes_isrc,
+                exposes_musicbrainz_id=behavior.supports_musicbrainz_id_querying
+            ),
+            supports_musicbrainz_id_querying=behavior.supports_musicbrainz_id_querying,
+            supports_direct_isrc_querying=behavior.supports_direct_isrc_querying
+        )
+
+        self.behavior = behavior
+        self.catalog = catalog if catalog else FakeCatalog(behavior)
+        self.simulator = FakeRequestSimulator(behavior)
+        self._random = random.Random(behavior.seed)
+
+    def _simulate(self, handler: Callable[..., T], *args, **kwargs) -> T:
+        with self.simulator.request() as latency:
+            time.sleep(latency)
+            return handler(*args, **kwargs)
+
+    def get_user_playlists(self, limit: int = 25) -> List[Playlist]:
+        return self._simulate(self._get_user_playlists, limit=limit)
+
+    def get_playlist_tracks(self, playlist_id: str, limit: int = 100) -> List[Track]:
+        track_ids = self._simulate(self._get_playlist_item_ids, playlist_id=playlist_id, limit=limit)
+
+        mapped_tracks = []
+        for page in self._paginate(track_ids):
+            mapped_tracks.extend(self._simulate(self._get_tracks, track_ids=page))
+
+        return mapped_tracks
+
+    def create_playlist(self, name: str) -> Playlist:
+        return self._simulate(self._create_playlist, name=name)
+
+    def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
+        self._simulate(self._add_tracks_to_playlist, playlist_id=playlist_id, track_ids=track_ids)
+
+    def get_random_track(self) -> Optional[Track]:
+        return self._simulate(self._get_random_track)
+
+    def get_playlist(self, playlist_id: str) -> Playlist:
+        return self._simulate(self._get_playlist, playlist_id=playlist_id)
+
+    def get_track(self, track_id: str) -> Track:
+        return self._simulate(self._get_track, track_id=track_id)
+
+    def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        mapped_tracks = []
+        for page in self._paginate(track_ids):
+            mapped_tracks.extend(self._simulate(self._get_tracks, track_ids=page))
+
+        return mapped_tracks
+
+    def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
+        if not query or len(query) == 0:
+            return []
+
+        return self._simulate(self._search_tracks, query=query, limit=limit)
+
+    def get_track_by_isrc(self, isrc: str) -> Track:
+        return self._simulate(self._get_track_by_isrc, isrc=isrc)
+
+    def get_saved_tracks(self, limit: int = 10) -> List[Track]:
+        return self._simulate(self._get_saved_tracks, limit=limit)
+
+    def _paginate(self, items: List[str]) -> List[List[str]]:
+        page_size = self.behavior.page_size if self.behavior.page_size > 0 else max(1, len(items))
+        return [items[offset:offset + page_size] for offset in range(0, len(items), page_size)]
+
+    # The handlers below hold the actual logic. They are shared with AsyncFakeDriver
+    # which only differs in how it waits for the simulated latency.
+
+    def _get_user_playlists(self, limit: int) -> List[Playlist]:
+        playlists = list(self.catalog.playlists.values())
+
+        if limit > 0:
+            playlists = playlists[:limit]
+
+        return [self._mapper.map_playlist(playlist) for playlist in playlists]
+
+    def _get_playlist_item_ids(self, playlist_id: str, limit: int) -> List[str]:
+        track_ids = self.catalog.playlist_items.get(playlist_id)
+        if track_ids is None:
+            raise PlaylistNotFoundException(f'No playlist with ID {playlist_id}')
+
+        return list(track_ids[:limit] if limit > 0 else track_ids)
+
+    def _get_tracks(self, track_ids: List[str]) -> List[Track]:
+        tracks = [self.catalog.get_track(track_id) for track_id in track_ids]
+        return [self._mapper.map_track(track) for track in tracks if track]
+
+    def _create_playlist(self, name: str) -> Playlist:
+        return self._mapper.map_playlist(self.catalog.create_playlist(name))
+
+    def _add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
+        if playlist_id not in self.catalog.playlists:
+            raise PlaylistNotFoundException(f'No playlist with ID {playlist_id}')
+
+        self.catalog.add_tracks_to_playlist(playlist_id, list(track_ids))
+
+    def _get_random_track(self) -> Optional[Track]:
+        if len(self.catalog.tracks) == 0:
+            return None
+
+        return self._mapper.map_track(self._random.choice(list(self.catalog.tracks.values())))
+
+    def _get_playlist(self, playlist_id: str) -> Playlist:
+        playlist = self.catalog.playlists.get(playlist_id)
+        if not playlist:
+            raise PlaylistNotFoundException(f'No playlist with ID {playlist_id}')
+
+        return self._mapper.map_playlist(playlist)
+
+    def _get_track(self, track_id: str) -> Track:
+        track = self.catalog.get_track(track_id)
+        if not track:
+            raise TrackNotFoundException(f'No track with ID {track_id}')
+
+        return self._mapper.map_track(track)
+
+    def _search_tracks(self, query: str, limit: int) -> List[Track]:
+        return [self._mapper.map_track(track) for track in self.catalog.search(query, limit)]
+
+    def _get_track_by_isrc(self, isrc: str) -> Track:
+        if not self.supports_direct_isrc_querying:
+            raise UnsupportedFeatureException(f'{self.service_name} does not support fetching tracks by ISRC.')
+
+        track = self.catalog.get_track_by_isrc(isrc)
+        if not track:
+            raise TrackNotFoundException(f'No track found with ISRC {isrc}')
+
+        return self._mapper.map_track(track)
+
+    def _get_saved_tracks(self, limit: int) -> List[Track]:
+        tracks = list(self.catalog.tracks.values())
+
+        if limit > 0:
+            tracks = tracks[:limit]
+
+        return [self._mapper.map_track(track) for track in tracks]
@@ -0,0 +1,43 @@
+from tunesynctool.drivers import ServiceMapper
+from tunesynctool.models import Playlist, Track
+
+class FakeMapper(ServiceMapper):
+    """Maps fake catalog entries to internal models."""
+
+    def __init__(self, service_name: str = 'fake', exposes_isrc: bool = True, exposes_musicbrainz_id: bool = False) -> None:
+        self._service_name = service_name
+        self._exposes_isrc = exposes_isrc
+        self._exposes_musicbrainz_id = exposes_musicbrainz_id
+
+    def map_playlist(self, data: dict) -> Playlist:
+        if isinstance(data, type(None)):
+            raise ValueError('Input data cannot be None')
+
+        return Playlist(
+            service_id=data.get('id'),
+            service_name=self._service_name,
+            name=data.get('name'),
+            description=data.get('description'),
+            is_public=data.get('public', False),
+            author_name=data.get('owner'),
+            service_data=data
+        )
+
+    def map_track(self, data: dict) -> Track:
+        if isinstance(data, type(None)):
+            raise ValueError('Input data cannot be None')
+
+        return Track(
+            title=data.get('title'),
+            album_name=data.get('album'),
+            primary_artist=data.get('artist'),
+            additional_artists=list(data.get('featured_artists', [])),
+            duration_seconds=data.get('duration'),
+            track_number=data.get('track_number'),
+            release_year=data.get('year'),
+            isrc=data.get('isrc') if self._exposes_isrc else None,
+            musicbrainz_id=data.get('musicbrainz_id') if self._exposes_musicbrainz_id else None,
+            service_id=data.get('id'),
+            service_name=self._service_name,
+            service_data=data
+        )
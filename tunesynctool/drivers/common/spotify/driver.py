@@ -1,15 +1,28 @@
 from typing import List, Optional
 
-from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException
+from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException, RateLimitException
 from tunesynctool.models import Playlist, Configuration, Track
 from tunesynctool.drivers import ServiceDriver
 from tunesynctool.utilities.collections import batch
+from tunesynctool.utilities.rate_limit import parse_retry_after
 from .mapper import SpotifyMapper
 
 from spotipy.oauth2 import SpotifyOAuth
 import spotipy
 from spotipy.exceptions import SpotifyException
 
+def _raise_for_rate_limit(e: SpotifyException) -> None:
+    """
+    Raise a RateLimitException if Spotify answered with 429 Too Many Requests.
+    spotipy retries those on its own first, so this is only reached once its retries ran out.
+    """
+
+    if e.http_status == 429:
+        raise RateLimitException(
+            f'Rate limited by Spotify: {e.msg}',
+            retry_after=parse_retry_after((e.headers or {}).get('Retry-After'))
+        ) from e
+
 class SpotifyDriver(ServiceDriver):
     """
     Spotify service driver.
@@ -34,6 +47,7 @@ class SpotifyDriver(ServiceDriver):
             config=config,
             mapper=SpotifyMapper(),
             supports_direct_isrc_querying=True,
+            max_playlist_insert_batch_size=100,
         )
 
         self.__spotify = spotipy.Spotify(
@@ -92,6 +106,7 @@ class SpotifyDriver(ServiceDriver):
 
             return mapped_playlists
         except SpotifyException as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
         except Exception as e:
             raise ServiceDriverException(e)
@@ -142,6 +157,7 @@ class SpotifyDriver(ServiceDriver):
 
             return mapped_tracks
         except SpotifyException as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
         except Exception as e:
             raise ServiceDriverException(e)
@@ -154,6 +170,9 @@ class SpotifyDriver(ServiceDriver):
             )
 
             return self._mapper.map_playlist(response)
+        except SpotifyException as e:
+            _raise_for_rate_limit(e)
+            raise ServiceDriverException(e)
         except Exception as e:
             raise ServiceDriverException(e)
         
@@ -165,6 +184,7 @@ class SpotifyDriver(ServiceDriver):
                     items=chunked_ids
                 )
         except SpotifyException as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
         except Exception as e:
             raise ServiceDriverException(e)
@@ -177,6 +197,7 @@ class SpotifyDriver(ServiceDriver):
             response = self.__spotify.playlist(playlist_id)
             return self._mapper.map_playlist(response)
         except SpotifyException as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
         except Exception as e:
             raise ServiceDriverException(e)
@@ -186,10 +207,27 @@ class SpotifyDriver(ServiceDriver):
             response = self.__spotify.track(track_id)
             return self._mapper.map_track(response)
         except SpotifyException as e:
+            _raise_for_rate_limit(e)
             raise TrackNotFoundException(e)
         except Exception as e:
             raise ServiceDriverException(e)
         
+    def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        try:
+            tracks = []
+
+            # The API returns up to 50 tracks per request, with None in place of the ones that don't exist
+            for chunk in batch(track_ids, 50):
+                response = self.__spotify.tracks(list(chunk))
+                tracks.extend(self._mapper.map_track(track) for track in response['tracks'] if track)
+
+            return tracks
+        except SpotifyException as e:
+            _raise_for_rate_limit(e)
+            raise ServiceDriverException(e)
+        except Exception as e:
+            raise ServiceDriverException(e)
+
     def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
         if not query or len(query) == 0:
             return []
@@ -209,6 +247,7 @@ class SpotifyDriver(ServiceDriver):
 
             return mapped_tracks
         except SpotifyException as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
         except Exception as e:
             raise ServiceDriverException(e)
@@ -258,6 +297,7 @@ class SpotifyDriver(ServiceDriver):
 
             return mapped_tracks
         except SpotifyException as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
         except Exception as e:
             raise ServiceDriverException(e)
\ No newline at end of file
@@ -8,4 +8,7 @@ class AsyncSubsonicDriver(AsyncWrappedServiceDriver):
             sync_driver=SubsonicDriver(
                 config=config
             )
-        )
\ No newline at end of file
+        )
+
+    async def close(self) -> None:
+        self.sync_driver.close()
@@ -0,0 +1,56 @@
+import json
+import urllib.request
+
+import requests
+from libsonic.connection import Connection
+
+from tunesynctool.exceptions import RateLimitException
+from tunesynctool.utilities.rate_limit import parse_retry_after
+
+REQUEST_TIMEOUT = 30
+"""Seconds to wait for the Subsonic server to answer a request."""
+
+class PooledConnection(Connection):
+    """
+    libsonic connection that sends its API requests through a pooled HTTP session.
+
+    libsonic opens a new connection (and does a new TLS handshake) for every request.
+    This keeps connections to the server alive instead, which matters when many requests
+    are sent in a row, like when matching a playlist or taking a snapshot of the library.
+    Binary requests (streams, cover art) still go through libsonic's own opener.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+
+        self._session = requests.Session()
+
+    def _doInfoReq(self, req: urllib.request.Request) -> dict:
+        headers = dict(req.header_items())
+        if req.data is not None:
+            # urllib only adds this when the request is sent, so it's not among the headers yet
+            headers.setdefault('Content-type', 'application/x-www-form-urlencoded')
+
+        response = self._session.request(
+            method=req.get_method(),
+            url=req.full_url,
+            data=req.data,
+            headers=headers,
+            timeout=REQUEST_TIMEOUT
+        )
+
+        # Servers behind a rate limiting reverse proxy answer with 429 when too many requests are sent
+        if response.status_code == 429:
+            raise RateLimitException(
+                'Rate limited by the Subsonic server.',
+                retry_after=parse_retry_after(response.headers.get('Retry-After'))
+            )
+
+        response.raise_for_status()
+
+        return json.loads(response.content.decode('utf-8'))['subsonic-response']
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+
+        self._session.close()
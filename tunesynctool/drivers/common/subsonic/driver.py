@@ -1,19 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 
-from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, TrackNotFoundException, UnsupportedFeatureException
+from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, TrackNotFoundException, UnsupportedFeatureException, RateLimitException
 from tunesynctool.models import Playlist, Configuration, Track
 from tunesynctool.drivers import ServiceDriver
+from .connection import PooledConnection
 from .mapper import SubsonicMapper
 
-from libsonic.connection import Connection
 from libsonic.errors import DataNotFoundError
 
+ALBUM_LIST_PAGE_SIZE = 500
+"""Albums requested per getAlbumList2 call, the most servers (e.g. Navidrome) return at once."""
+
+LIBRARY_FETCH_WORKERS = 4
+"""Albums fetched in parallel while taking a snapshot of the library."""
+
 class SubsonicDriver(ServiceDriver):
     """
     Subsonic service driver.
     
     Uses libsonic (py-sonic) as its backend:
     https://github.com/crustymonkey/py-sonic
+
+    API requests are sent through a pooled HTTP session (see PooledConnection).
     """
     
     def __init__(self, config: Configuration) -> None:
@@ -21,12 +30,18 @@ class SubsonicDriver(ServiceDriver):
             service_name='subsonic',
             config=config,
             mapper=SubsonicMapper(),
-            supports_musicbrainz_id_querying=True
+            supports_musicbrainz_id_querying=True,
+            max_playlist_insert_batch_size=0
         )
 
         self.__subsonic = self.__get_connection()
 
-    def __get_connection(self) -> Connection:
+    def close(self) -> None:
+        """Close the connections kept open to the Subsonic server."""
+
+        self.__subsonic.close()
+
+    def __get_connection(self) -> PooledConnection:
         """Configures and returns a Connection object."""
 
         if not self._config.subsonic_base_url:
@@ -38,7 +53,7 @@ class SubsonicDriver(ServiceDriver):
         elif not self._config.subsonic_password:
             raise ValueError('Subsonic password is required for this service to work but was not set.')
 
-        return Connection(
+        return PooledConnection(
             baseUrl=self._config.subsonic_base_url,
             port=self._config.subsonic_port,
             username=self._config.subsonic_username,
@@ -65,6 +80,8 @@ class SubsonicDriver(ServiceDriver):
             return mapped_playlists
         except DataNotFoundError as e:
             raise PlaylistNotFoundException(e)
+        except RateLimitException:
+            raise
         except Exception as e:
             raise ServiceDriverException(e)
     
@@ -75,6 +92,9 @@ class SubsonicDriver(ServiceDriver):
             )
 
             fetched_tracks = response['playlist'].get('entry', [])
+            if isinstance(fetched_tracks, dict):
+                fetched_tracks = [fetched_tracks]
+
             if limit > 0:
                 fetched_tracks = fetched_tracks[:min(limit, len(fetched_tracks))]
         
@@ -86,6 +106,8 @@ class SubsonicDriver(ServiceDriver):
             return mapped_tracks
         except DataNotFoundError as e:
             raise PlaylistNotFoundException(e)
+        except RateLimitException:
+            raise
         except Exception as e:
             raise ServiceDriverException(e)
         
@@ -96,6 +118,8 @@ class SubsonicDriver(ServiceDriver):
             )
 
             return self._mapper.map_playlist(response['playlist'])
+        except RateLimitException:
+            raise
         except Exception as e:
             raise ServiceDriverException(e)
         
@@ -108,6 +132,8 @@ class SubsonicDriver(ServiceDriver):
                 lid=playlist_id,
                 songIdsToAdd=list(track_ids) if track_ids is not None else []
             )
+        except RateLimitException:
+            raise
         except Exception as e:
             raise ServiceDriverException(e)
         
@@ -123,6 +149,8 @@ class SubsonicDriver(ServiceDriver):
                 track.service_name = self.service_name
 
             return mapped_tracks[0] if mapped_tracks else None
+        except RateLimitException:
+            raise
         except Exception as e:
             raise ServiceDriverException(e)
     
@@ -134,6 +162,8 @@ class SubsonicDriver(ServiceDriver):
             return self._mapper.map_playlist(response['playlist'])
         except DataNotFoundError as e:
             raise PlaylistNotFoundException(e)
+        except RateLimitException:
+            raise
         except Exception as e:
             raise ServiceDriverException(e)
         
@@ -145,31 +175,137 @@ class SubsonicDriver(ServiceDriver):
             return self._mapper.map_track(response['song'])
         except DataNotFoundError as e:
             raise TrackNotFoundException(e)
+        except RateLimitException:
+            raise
         except Exception as e:
             raise ServiceDriverException(e)
         
+    def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        # Subsonic has no endpoint for several songs, so they are fetched in parallel over the pooled connections
+        with ThreadPoolExecutor(max_workers=LIBRARY_FETCH_WORKERS) as executor:
+            results = list(executor.map(self.__get_track_or_none, track_ids))
+
+        return [track for track in results if track]
+
+    def __get_track_or_none(self, track_id: str) -> Optional[Track]:
+        try:
+            return self.get_track(track_id=track_id)
+        except TrackNotFoundException:
+            return None
+
     def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
         if not query or len(query) == 0:
             return []
 
         try:
-            response = self.__subsonic.search2(
+            # search3 searches the ID3 tags, search2 the folder structure
+            response = self.__subsonic.search3(
                 query=query,
                 artistCount=0,
                 albumCount=0,
                 songCount=limit,
             )
 
-            fetched_tracks = response['searchResult2'].get('song', [])
+            fetched_tracks = response['searchResult3'].get('song', [])
             mapped_tracks = [self._mapper.map_track(track) for track in fetched_tracks]
 
             for track in mapped_tracks:
                 track.service_name = self.service_name
 
             return mapped_tracks
+        except RateLimitException:
+            raise
         except Exception as e:
             raise ServiceDriverException(e)
         
+    def get_library_tracks(self) -> List[Track]:
+        """
+        Take a snapshot of every track in the library.
+
+        Lists every album with getAlbumList2, then fetches the tracks of the albums in parallel.
+        This costs one request per album, but afterwards tracks can be looked up without any more requests.
+
+        :return: All tracks of the library.
+        """
+
+        return self.get_album_tracks([album['id'] for album in self.get_library_albums()])
+
+    def get_library_albums(self) -> List[dict]:
+        """
+        List every album in the library, without their tracks.
+
+        :return: The albums as returned by getAlbumList2.
+        """
+
+        try:
+            albums = []
+            while True:
+                response = self.__subsonic.getAlbumList2(
+                    ltype='alphabeticalByName',
+                    size=ALBUM_LIST_PAGE_SIZE,
+                    offset=len(albums)
+                )
+
+                page = response['albumList2'].get('album', [])
+                if isinstance(page, dict):
+                    page = [page]
+
+                albums.extend(page)
+
+                if len(page) < ALBUM_LIST_PAGE_SIZE:
+                    return albums
+        except RateLimitException:
+            raise
+        except Exception as e:
+            raise ServiceDriverException(e)
+
+    def get_album_tracks(self, album_ids: List[str]) -> List[Track]:
+        """
+        Fetch the tracks of several albums in parallel.
+
+        :param album_ids: IDs of the albums.
+        :return: Tracks of the albums, in the order of the albums.
+        """
+
+        try:
+            with ThreadPoolExecutor(max_workers=LIBRARY_FETCH_WORKERS) as executor:
+                album_songs = executor.map(self.__get_album_songs, album_ids)
+                fetched_tracks = [song for songs in album_songs for song in songs]
+
+            mapped_tracks = [self._mapper.map_track(track) for track in fetched_tracks]
+
+            for track in mapped_tracks:
+                track.service_name = self.service_name
+
+            return mapped_tracks
+        except RateLimitException:
+            raise
+        except Exception as e:
+            raise ServiceDriverException(e)
+
+    def __get_album_songs(self, album_id: str) -> List[dict]:
+        songs = self.__subsonic.getAlbum(id=album_id)['album'].get('song', [])
+        return [songs] if isinstance(songs, dict) else songs
+
+    def get_library_last_modified(self, if_modified_since: int = 0) -> int:
+        """
+        Ask the server when its library last changed, using getIndexes.
+
+        :param if_modified_since: Time of the last known change in milliseconds. When nothing changed since, the server leaves out the index itself, which keeps the response small.
+        :return: Time of the last change in milliseconds since the epoch, or 0 if the server doesn't tell.
+        """
+
+        try:
+            response = self.__subsonic.getIndexes(
+                ifModifiedSince=if_modified_since
+            )
+
+            return int(response['indexes'].get('lastModified', 0))
+        except RateLimitException:
+            raise
+        except Exception as e:
+            raise ServiceDriverException(e)
+
     def get_track_by_isrc(self, isrc: str) -> Track:
         raise NotImplementedError('Subsonic does not support fetching tracks by ISRC.')
     
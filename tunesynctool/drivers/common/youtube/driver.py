@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException
+from tunesynctool.exceptions import PlaylistNotFoundException, ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException, RateLimitException
 from tunesynctool.models import Playlist, Configuration, Track
 from tunesynctool.drivers import ServiceDriver
 from .mapper import YouTubeMapper
@@ -8,8 +8,46 @@ from .mapper import YouTubeMapper
 from ytmusicapi import YTMusic, OAuthCredentials
 from ytmusicapi.exceptions import YTMusicServerError, YTMusicError
 import ytmusicapi
+import hashlib
+import json
+import threading
 import time
 
+_browser_auth_cache: Dict[str, dict] = {}
+"""Auth dicts parsed from browser request headers, keyed by the SHA-256 hash of the headers."""
+
+_browser_auth_cache_lock = threading.Lock()
+
+def _get_browser_auth(headers_raw: str) -> dict:
+    """
+    Parse raw browser request headers into an auth dict for YTMusic.
+    The headers are only parsed once, later calls with the same headers get a copy of the cached result.
+
+    :param headers_raw: The request headers copied from the browser.
+    :return: The auth dict.
+    """
+
+    key = hashlib.sha256(headers_raw.encode()).hexdigest()
+
+    with _browser_auth_cache_lock:
+        if key not in _browser_auth_cache:
+            # Without a file path, setup() only returns the parsed headers instead of writing them to disk
+            _browser_auth_cache[key] = json.loads(ytmusicapi.setup(headers_raw=headers_raw))
+
+        return dict(_browser_auth_cache[key])
+
+def _raise_for_rate_limit(e: Exception) -> None:
+    """
+    Raise a RateLimitException if YouTube Music answered with 429 Too Many Requests.
+    ytmusicapi only reports the status code in the message of its errors.
+    """
+
+    if isinstance(e, RateLimitException):
+        raise e
+
+    if isinstance(e, YTMusicServerError) and 'HTTP 429' in str(e):
+        raise RateLimitException(f'Rate limited by YouTube Music: {e}') from e
+
 class YouTubeDriver(ServiceDriver):
     """
     Youtube service driver.
@@ -54,15 +92,8 @@ class YouTubeDriver(ServiceDriver):
         if not self._config.youtube_request_headers:
             raise ValueError('Youtube request headers are required for this service to work but were not set.')
         
-        auth_file_path = 'tunesynctool_ytmusic_session.json'
-
-        ytmusicapi.setup(
-            filepath=auth_file_path,
-            headers_raw=self._config.youtube_request_headers
-        )
-
         return YTMusic(
-            auth=auth_file_path
+            auth=_get_browser_auth(self._config.youtube_request_headers)
         )
     
     def __get_client_from_oauth_credentials(self, oauth_credentials: OAuthCredentials, auth_dict: dict) -> YTMusic:
@@ -84,8 +115,10 @@ class YouTubeDriver(ServiceDriver):
             
             return [self._mapper.map_playlist(playlist) for playlist in response]
         except YTMusicError as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
 
     def get_playlist_tracks(self, playlist_id: str, limit: int = 100) -> List[Track]:
@@ -98,8 +131,10 @@ class YouTubeDriver(ServiceDriver):
             tracks = response.get('tracks', [])
             return [self._mapper.map_track(data=track, additional_data=track) for track in tracks]
         except YTMusicServerError as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
 
     def create_playlist(self, name: str) -> Playlist:
@@ -119,6 +154,7 @@ class YouTubeDriver(ServiceDriver):
 
             raise ServiceDriverException("Freshly created playlist couldn't be retrieved even after several retries.")
         except YTMusicError as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
 
     def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
@@ -129,6 +165,7 @@ class YouTubeDriver(ServiceDriver):
                 duplicates=True
             )
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
 
     def get_random_track(self) -> Optional[Track]:
@@ -148,8 +185,10 @@ class YouTubeDriver(ServiceDriver):
             
             return self._mapper.map_playlist(response)
         except YTMusicServerError as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise PlaylistNotFoundException(e)
 
     def get_track(self, track_id: str) -> Track:
@@ -167,8 +206,10 @@ class YouTubeDriver(ServiceDriver):
                 additional_data={}
             )
         except YTMusicError as e:
+            _raise_for_rate_limit(e)
             raise TrackNotFoundException(e)
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
         
     def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
@@ -196,11 +237,13 @@ class YouTubeDriver(ServiceDriver):
                         additional_data=result
                     ))
                 except Exception as e:
-                    # If we can't fetch the track, we'll just skip it.
+                    # If we can't fetch the track, we'll just skip it. Unless we're being rate limited.
+                    _raise_for_rate_limit(e)
                     continue
 
             return response_tracks
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
         
     def get_track_by_isrc(self, isrc: str) -> Track:
@@ -223,4 +266,5 @@ class YouTubeDriver(ServiceDriver):
             tracks = response.get('tracks', [])
             return [self._mapper.map_liked_track(data=track) for track in tracks]
         except Exception as e:
+            _raise_for_rate_limit(e)
             raise ServiceDriverException(e)
\ No newline at end of file
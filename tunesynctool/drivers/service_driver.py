@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Dict, List, Optional
 import logging
 
 from tunesynctool.models import Playlist, Track, Configuration
+from tunesynctool.exceptions import TrackNotFoundException
 from .service_mapper import ServiceMapper
 
 """
@@ -29,12 +30,15 @@ class ServiceDriver(ABC):
         mapper: ServiceMapper,
         supports_musicbrainz_id_querying: bool = False,
         supports_direct_isrc_querying: bool = False,
+        max_playlist_insert_batch_size: int = 25,
     ) -> None:
         self.service_name = service_name
         self._config = config
         self._mapper = mapper
         self.supports_musicbrainz_id_querying = supports_musicbrainz_id_querying
         self.supports_direct_isrc_querying = supports_direct_isrc_querying
+        self.max_playlist_insert_batch_size = max_playlist_insert_batch_size
+        """How many tracks add_tracks_to_playlist() is best given at once when inserting a long list in steps. 0 means all of them."""
 
         logger.debug(f'Initialized {self.__class__.__name__} driver for {self.service_name} service.')
 
@@ -80,6 +84,7 @@ class ServiceDriver(ABC):
     def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
         """
         Add tracks to a playlist. Does not validate if the tracks are already in the playlist or if they exist.
+        Any number of tracks is accepted, see max_playlist_insert_batch_size for how many are best passed at once.
         
         :param playlist_id: The ID of the playlist to add tracks to.
         :param track_ids: The IDs of the tracks to add.
@@ -131,6 +136,26 @@ class ServiceDriver(ABC):
         """
 
         raise NotImplementedError()
+
+    def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        """
+        Fetch several tracks by their IDs.
+        Fetches them one after another, drivers whose service can do better override this.
+
+        :param track_ids: The IDs of the tracks to fetch.
+        :return: The tracks that exist, in the same order as the IDs.
+        :raises: ServiceDriverException if an unknown error occurs while fetching the tracks.
+        """
+
+        tracks = []
+
+        for track_id in track_ids:
+            try:
+                tracks.append(self.get_track(track_id=track_id))
+            except TrackNotFoundException:
+                continue
+
+        return tracks
     
     @abstractmethod
     def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
@@ -145,6 +170,19 @@ class ServiceDriver(ABC):
         
         raise NotImplementedError()
     
+    def search_tracks_many(self, queries: List[str], limit: int = 10) -> List[List[Track]]:
+        """
+        Search for tracks by several queries.
+        Runs the searches one after another, drivers that can do better override this.
+
+        :param queries: The search queries.
+        :param limit: The maximum number of tracks to fetch per query.
+        :return: A list of results for each query, in the same order as the queries.
+        :raises: ServiceDriverException if an unknown error occurs while searching for tracks.
+        """
+
+        return [self.search_tracks(query=query, limit=limit) for query in queries]
+
     @abstractmethod
     def get_track_by_isrc(self, isrc: str) -> Track:
         """
@@ -158,6 +196,29 @@ class ServiceDriver(ABC):
 
         raise NotImplementedError()
     
+    def get_tracks_by_isrcs(self, isrcs: List[str]) -> Dict[str, Track]:
+        """
+        Fetch several tracks by their ISRCs.
+        Looks them up one after another, drivers that can do better override this.
+
+        :param isrcs: The ISRCs of the tracks to fetch.
+        :return: The tracks that were found, by their ISRCs. Empty if the service can't be queried by ISRC.
+        :raises: ServiceDriverException if an unknown error occurs while fetching the tracks.
+        """
+
+        if not self.supports_direct_isrc_querying:
+            return {}
+
+        tracks = {}
+
+        for isrc in dict.fromkeys(isrcs):
+            try:
+                tracks[isrc] = self.get_track_by_isrc(isrc=isrc)
+            except TrackNotFoundException:
+                continue
+
+        return tracks
+
     @abstractmethod
     def get_saved_tracks(self, limit: int = 10) -> List[Track]:
         """
@@ -20,4 +20,11 @@ class UnsupportedFeatureException(Exception):
     """Should be raised when a feature is not supported by the streaming service and no easy workaround is possible."""
     
     def __init__(self, message="Feature is not supported by the streaming service."):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+class RateLimitException(ServiceDriverException):
+    """Should be raised when the streaming service rejects a request because of rate limiting or quota exhaustion."""
+    
+    def __init__(self, message="Rate limited by the streaming service.", retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -1,3 +1,5 @@
+from .catalog import CatalogIndex, SubsonicCatalog
 from .track_matcher import TrackMatcher
 from .playlist_sync import PlaylistSynchronizer
-from .async_track_matcher import AsyncTrackMatcher
\ No newline at end of file
+from .async_track_matcher import AsyncTrackMatcher
+from .transfer_planner import AsyncTransferPlanner, TransferPlan, TransferPhase
\ No newline at end of file
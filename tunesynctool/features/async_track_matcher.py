@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 import logging
 
 from tunesynctool.drivers import AsyncWrappedServiceDriver
@@ -6,6 +6,7 @@ from tunesynctool.exceptions import TrackNotFoundException
 from tunesynctool.models import Track
 from tunesynctool.integrations import Musicbrainz
 from tunesynctool.utilities import clean_str, batch
+from .catalog import CatalogIndex
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +15,40 @@ class AsyncTrackMatcher:
     Async version of the TrackMatcher class.
     """
 
-    def __init__(self, target_driver: AsyncWrappedServiceDriver) -> None:
+    def __init__(self, target_driver: AsyncWrappedServiceDriver, catalog: Optional[CatalogIndex] = None) -> None:
+        """
+        :param target_driver: Driver of the service to find matches on.
+        :param catalog: Index of the target service's catalog (see SubsonicCatalog). When given, tracks are looked up in it before sending any requests.
+        """
+
         self._target = target_driver
+        self._catalog = catalog
+        self._prefetched: Dict[str, Optional[Track]] = {}
+        self._prefetched_isrcs: Dict[str, Optional[Track]] = {}
+
+    async def prefetch(self, tracks: List[Track]) -> None:
+        """
+        Resolve the tracks that can be identified without searching in bulk, so matching them later doesn't need a request per track.
+        Tracks that originate from the target service are fetched by their IDs (see get_tracks()), the rest by their ISRCs
+        if the target supports it (see get_tracks_by_isrcs()).
+
+        :param tracks: The tracks that are going to be matched, usually a whole playlist.
+        """
+
+        track_ids = [track.service_id for track in tracks if track.service_id and track.service_name == self._target.service_name]
+        if len(track_ids) > 0:
+            fetched = {track.service_id: track for track in await self._target.get_tracks(track_ids=track_ids)}
+
+            for track_id in track_ids:
+                # Tracks missing from the result don't exist anymore, there's no point fetching them again
+                self._prefetched[track_id] = fetched.get(track_id)
+
+        isrcs = [track.isrc for track in tracks if track.isrc and track.service_id not in self._prefetched]
+        if len(isrcs) > 0 and self._target.supports_direct_isrc_querying:
+            fetched = await self._target.get_tracks_by_isrcs(isrcs=isrcs)
+
+            for isrc in isrcs:
+                self._prefetched_isrcs[isrc] = fetched.get(isrc)
 
     async def find_match(self, track: Track) -> Optional[Track]:
         """
@@ -28,6 +61,36 @@ class AsyncTrackMatcher:
         :return: The matched track, if any.
         """
 
+        matched_track = await self.find_match_by_identifiers(track)
+        if matched_track:
+            return matched_track
+
+        matched_track = await self.find_match_by_search(track)
+        if matched_track:
+            return matched_track
+
+        # At this point we haven't found any matches unfortunately
+        logger.debug(f'Failure: could not find a match for track {track}.')
+        return None
+
+    async def find_match_by_identifiers(self, track: Track) -> Optional[Track]:
+        """
+        Tries to match the track using only identifiers that point to a single recording: its ID if it originates from the target service,
+        its ISRC and its MusicBrainz ID (if already known). Doesn't search by text or look anything up on MusicBrainz.
+
+        After prefetch(), only tracks with a MusicBrainz ID may need a request.
+
+        :param track: The track to match.
+        :return: The matched track, if any.
+        """
+
+        # Strategy -1: If the catalog of the target service is indexed locally, look the track up without sending any requests
+        if self._catalog is not None:
+            matched_track = self._catalog.find_match(track)
+            if matched_track:
+                logger.debug(f'Success: matched track {track} to {matched_track} using the catalog index.')
+                return matched_track
+
         # Strategy 0: If the track is suspected to originate from the same service, try to fetch it directly
         matched_track = await self.__search_on_origin_service(track)
         if track.matches(matched_track):
@@ -39,21 +102,38 @@ class AsyncTrackMatcher:
         if track.matches(matched_track):
             logger.debug(f'Success: matched track {track} to {matched_track} using direct ISRC. querying.')
             return matched_track
-        
-        # Strategy 2: Using plain old text search
+
+        # Strategy 2: If the MusicBrainz ID is already known, it's as good as an ISRC
+        if track.musicbrainz_id:
+            matched_track = await self.__search_with_musicbrainz_id(track)
+            if track.matches(matched_track):
+                logger.debug(f'Success: matched track {track} to {matched_track} using its MusicBrainz ID.')
+                return matched_track
+
+        return None
+
+    async def find_match_by_search(self, track: Track) -> Optional[Track]:
+        """
+        Tries to match the track by searching for it, for tracks that find_match_by_identifiers() couldn't match.
+        Text search comes first, then the MusicBrainz ID is looked up (if it isn't known yet) and searched for.
+
+        :param track: The track to match.
+        :return: The matched track, if any.
+        """
+
+        # Strategy 3: Using plain old text search
         matched_track = await self.__search_with_text(track)
         if track.matches(matched_track):
             logger.debug(f'Success: matched track {track} to {matched_track} using text search.')
             return matched_track
 
-        # Stategy 3: Using the ISRC + MusicBrainz ID
-        matched_track = await self.__search_with_musicbrainz_id(track)
-        if track.matches(matched_track):
-            logger.debug(f'Success: matched track {track} to {matched_track} using its MusicBrainz ID.')
-            return matched_track
+        # Stategy 4: Using the ISRC + MusicBrainz ID, the ID was already tried by find_match_by_identifiers() if known
+        if not track.musicbrainz_id:
+            matched_track = await self.__search_with_musicbrainz_id(track)
+            if track.matches(matched_track):
+                logger.debug(f'Success: matched track {track} to {matched_track} using its MusicBrainz ID.')
+                return matched_track
 
-        # At this point we haven't found any matches unfortunately
-        logger.debug(f'Failure: could not find a match for track {track}.')
         return None
     
     def __get_musicbrainz_id(self, track: Track) -> Optional[str]:
@@ -111,12 +191,13 @@ class AsyncTrackMatcher:
         for queries in batch(query_attempts, 5):
             subresults: List[Track] = []
             
-            for query in queries:
-                search_results = await self._target.search_tracks(
-                    query=query,
-                    limit=5
-                )
+            # Drivers that can run several searches at once (like Deezer's) do so here
+            search_results_per_query = await self._target.search_tracks_many(
+                queries=list(queries),
+                limit=5
+            )
 
+            for query, search_results in zip(queries, search_results_per_query):
                 if len(search_results) == 0:
                     continue
 
@@ -179,7 +260,10 @@ class AsyncTrackMatcher:
         """
 
         if (track.service_name and self._target.service_name) and (track.service_name == self._target.service_name):
-            maybe_match = await self._target.get_track(track.service_id)
+            if track.service_id in self._prefetched:
+                maybe_match = self._prefetched[track.service_id]
+            else:
+                maybe_match = await self._target.get_track(track.service_id)
             
             if maybe_match and track.matches(maybe_match):
                 return maybe_match
@@ -200,9 +284,12 @@ class AsyncTrackMatcher:
             return None
         
         try:
-            likely_match = await self._target.get_track_by_isrc(
-                isrc=track.isrc
-            )
+            if track.isrc in self._prefetched_isrcs:
+                likely_match = self._prefetched_isrcs[track.isrc]
+            else:
+                likely_match = await self._target.get_track_by_isrc(
+                    isrc=track.isrc
+                )
 
             if likely_match and track.matches(likely_match):
                 return likely_match
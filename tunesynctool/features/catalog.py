@@ -0,0 +1,200 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from tunesynctool.drivers import SubsonicDriver
+from tunesynctool.models import Track
+from tunesynctool.utilities import clean_str
+
+logger = logging.getLogger(__name__)
+
+DURATION_TOLERANCE = 5
+"""Seconds two tracks' durations may differ by for them to be considered the same recording."""
+
+class CatalogIndex:
+    """
+    In-memory index of a whole catalog (e.g. a Subsonic library), to match tracks against without sending any requests.
+
+    Tracks are looked up by their ISRC and MusicBrainz ID first, then by their normalized title and primary artist.
+    Candidates whose duration is too far off are ignored.
+    """
+
+    def __init__(self, tracks: Iterable[Track] = ()) -> None:
+        self._tracks: Dict[str, Track] = {}
+        self._by_isrc: Dict[str, Set[str]] = {}
+        self._by_musicbrainz_id: Dict[str, Set[str]] = {}
+        self._by_title: Dict[str, Set[str]] = {}
+        self._by_artist: Dict[str, Set[str]] = {}
+
+        self.add(tracks)
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._tracks
+
+    def __keys(self, track: Track) -> List[Tuple[Dict[str, Set[str]], str]]:
+        keys = [
+            (self._by_isrc, track.isrc),
+            (self._by_musicbrainz_id, track.musicbrainz_id),
+            (self._by_title, clean_str(track.title)),
+            (self._by_artist, clean_str(track.primary_artist)),
+        ]
+
+        return [(index, key) for index, key in keys if key]
+
+    def add(self, tracks: Iterable[Track]) -> None:
+        """
+        Add tracks to the index. A track that is already indexed (by its ID) is replaced.
+
+        :param tracks: The tracks to add.
+        """
+
+        for track in tracks:
+            if not track.service_id:
+                continue
+
+            self.remove([track.service_id])
+            self._tracks[track.service_id] = track
+
+            for index, key in self.__keys(track):
+                index.setdefault(key, set()).add(track.service_id)
+
+    def remove(self, track_ids: Iterable[str]) -> None:
+        """
+        Remove tracks from the index. IDs that aren't indexed are ignored.
+
+        :param track_ids: IDs of the tracks to remove.
+        """
+
+        for track_id in track_ids:
+            track = self._tracks.pop(track_id, None)
+            if not track:
+                continue
+
+            for index, key in self.__keys(track):
+                ids = index[key]
+                ids.discard(track_id)
+
+                if len(ids) == 0:
+                    del index[key]
+
+    def copy(self) -> 'CatalogIndex':
+        """
+        Make an independent copy of the index, to change without affecting the original.
+
+        :return: The copy.
+        """
+
+        return CatalogIndex(self._tracks.values())
+
+    def get(self, track_id: str) -> Optional[Track]:
+        """
+        Get an indexed track by its ID.
+
+        :param track_id: The ID of the track.
+        :return: The track, if indexed.
+        """
+
+        return self._tracks.get(track_id)
+
+    def find_match(self, track: Track) -> Optional[Track]:
+        """
+        Find the indexed track that matches the given one the best.
+
+        :param track: The track to match, usually from another service.
+        :return: The matched track, if any.
+        """
+
+        for index, key in [(self._by_isrc, track.isrc), (self._by_musicbrainz_id, track.musicbrainz_id)]:
+            if key and key in index:
+                return self._tracks[min(index[key])]
+
+        candidate_ids = self._by_title.get(clean_str(track.title), set()) | self._by_artist.get(clean_str(track.primary_artist), set())
+        candidates = [self._tracks[track_id] for track_id in candidate_ids]
+        candidates = [candidate for candidate in candidates if self.__durations_match(track, candidate)]
+
+        if len(candidates) == 0:
+            return None
+
+        best_match = max(candidates, key=lambda candidate: candidate.similarity(track))
+        return best_match if track.matches(best_match) else None
+
+    def __durations_match(self, a: Track, b: Track) -> bool:
+        if not a.duration_seconds or not b.duration_seconds:
+            return True
+
+        return abs(a.duration_seconds - b.duration_seconds) <= DURATION_TOLERANCE
+
+class SubsonicCatalog:
+    """
+    Keeps a CatalogIndex of a Subsonic (or Navidrome) library up to date.
+
+    The first refresh takes a snapshot of the whole library. Later refreshes first ask the server whether
+    the library changed at all (getIndexes with ifModifiedSince), and if it did, only fetch the albums
+    that were added or changed since.
+
+    Refreshing replaces the index instead of changing it in place, so a matcher given the previous index
+    can keep using it while a refresh runs in another thread.
+    """
+
+    def __init__(self, driver: SubsonicDriver) -> None:
+        self.index = CatalogIndex()
+        """Index of the library, as of the last refresh. Replaced by every refresh that finds changes."""
+
+        self._driver = driver
+        self._last_modified = 0
+        self._album_signatures: Optional[Dict[str, tuple]] = None
+        self._album_track_ids: Dict[str, List[str]] = {}
+
+    def refresh(self, driver: Optional[SubsonicDriver] = None) -> bool:
+        """
+        Bring the index up to date with the library.
+
+        :param driver: Driver to read the library with from now on, for catalogs that outlive the driver they were created with.
+        :return: True if the library changed since the last refresh (or this was the first one).
+        """
+
+        if driver is not None:
+            self._driver = driver
+
+        is_first_refresh = self._album_signatures is None
+        last_modified = self._driver.get_library_last_modified(self._last_modified)
+
+        # Servers that don't report when their library changed are checked album by album every time
+        if not is_first_refresh and 0 < last_modified <= self._last_modified:
+            return False
+
+        album_signatures = {album['id']: self.__signature(album) for album in self._driver.get_library_albums()}
+        known_signatures = self._album_signatures or {}
+
+        removed_ids = [album_id for album_id in known_signatures if album_id not in album_signatures]
+        changed_ids = [album_id for album_id, signature in album_signatures.items() if known_signatures.get(album_id) != signature]
+
+        has_changed = is_first_refresh or len(removed_ids) > 0 or len(changed_ids) > 0
+        tracks = self._driver.get_album_tracks(changed_ids)
+
+        if has_changed:
+            index = self.index.copy()
+
+            for album_id in removed_ids + changed_ids:
+                index.remove(self._album_track_ids.pop(album_id, []))
+
+            index.add(tracks)
+
+            for track in tracks:
+                album_id = track.service_data.get('albumId') if track.service_data else None
+                self._album_track_ids.setdefault(album_id, []).append(track.service_id)
+
+            self.index = index
+
+        logger.debug(f'Refreshed Subsonic catalog: {len(changed_ids)} albums fetched, {len(removed_ids)} removed, {len(self.index)} tracks indexed.')
+
+        self._album_signatures = album_signatures
+        self._last_modified = last_modified
+
+        return has_changed
+
+    def __signature(self, album: dict) -> tuple:
+        # An album whose songs, length or modification time changed needs to be fetched again
+        return (album.get('songCount'), album.get('duration'), album.get('created'), album.get('changed'))
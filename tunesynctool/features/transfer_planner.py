@@ -0,0 +1,137 @@
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import logging
+import time
+
+from tunesynctool.drivers import AsyncWrappedServiceDriver
+from tunesynctool.models import Track
+from .async_track_matcher import AsyncTrackMatcher
+from .catalog import CatalogIndex
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class TransferPhase:
+    """Outcome of one phase of a transfer plan."""
+
+    name: str
+    """Name of the phase, either "identifiers" or "search"."""
+
+    tracks: int = 0
+    """Number of tracks the phase tried to match."""
+
+    matched: int = 0
+    """Number of tracks the phase matched."""
+
+    seconds: float = 0.0
+    """Time the phase took."""
+
+@dataclass
+class TransferPlan:
+    """Matches of a whole playlist on the target service."""
+
+    matches: List[Optional[Track]] = field(default_factory=list)
+    """Match of every source track, in the order of the source tracks. None where no match was found."""
+
+    phases: List[TransferPhase] = field(default_factory=list)
+    """The phases that ran, in order."""
+
+    @property
+    def matched_tracks(self) -> List[Track]:
+        """The matched tracks in playlist order, without the tracks that couldn't be matched."""
+
+        return [track for track in self.matches if track is not None]
+
+class AsyncTransferPlanner:
+    """
+    Matches a whole playlist at once, in two phases.
+
+    Matching tracks one by one walks every strategy of the matcher for each track,
+    so a single hard to find track is searched for in between cheap ID lookups.
+    The planner instead resolves every track that has a strong identifier first (IDs on the target service,
+    ISRCs, cached mappings, known MusicBrainz IDs), in bulk where the target supports it (see AsyncTrackMatcher.prefetch()).
+    Only the tracks that are left are searched for, with a bounded number of searches in flight.
+    """
+
+    def __init__(
+            self,
+            target_driver: AsyncWrappedServiceDriver,
+            catalog: Optional[CatalogIndex] = None,
+            max_concurrency: int = 4,
+            on_match: Optional[Callable[[Track, Optional[Track]], Awaitable[None]]] = None
+        ) -> None:
+        """
+        :param target_driver: Driver of the service to find matches on.
+        :param catalog: Index of the target service's catalog, passed to the matcher.
+        :param max_concurrency: Maximum number of tracks matched at the same time.
+        :param on_match: Called once for every source track, with its match (or None) as soon as it's final. Useful for reporting progress.
+        """
+
+        self._target = target_driver
+        self._catalog = catalog
+        self._max_concurrency = max_concurrency
+        self._on_match = on_match
+
+    async def plan(self, tracks: List[Track]) -> TransferPlan:
+        """
+        Match the tracks on the target service.
+
+        :param tracks: The tracks to match, usually a whole playlist.
+        :return: The matches and how long each phase took.
+        """
+
+        matcher = AsyncTrackMatcher(self._target, catalog=self._catalog)
+        plan = TransferPlan(matches=[None] * len(tracks))
+
+        identifiers = TransferPhase(name='identifiers', tracks=len(tracks))
+        started_at = time.perf_counter()
+        await matcher.prefetch(tracks)
+        await self.__run_phase(identifiers, plan, tracks, list(range(len(tracks))), matcher.find_match_by_identifiers, is_final=False)
+        identifiers.seconds = time.perf_counter() - started_at
+        plan.phases.append(identifiers)
+
+        residue = [i for i, match in enumerate(plan.matches) if match is None]
+        search = TransferPhase(name='search', tracks=len(residue))
+        started_at = time.perf_counter()
+        await self.__run_phase(search, plan, tracks, residue, matcher.find_match_by_search, is_final=True)
+        search.seconds = time.perf_counter() - started_at
+        plan.phases.append(search)
+
+        for phase in plan.phases:
+            logger.info(f'Transfer phase "{phase.name}" matched {phase.matched} of {phase.tracks} tracks in {phase.seconds:.2f}s.')
+
+        return plan
+
+    async def __run_phase(
+            self,
+            phase: TransferPhase,
+            plan: TransferPlan,
+            tracks: List[Track],
+            indices: List[int],
+            strategy: Callable[[Track], Awaitable[Optional[Track]]],
+            is_final: bool
+        ) -> None:
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def match(i: int) -> None:
+            async with semaphore:
+                matched_track = await strategy(tracks[i])
+
+            plan.matches[i] = matched_track
+            if matched_track:
+                phase.matched += 1
+
+            # Tracks without a match yet get another chance in the next phase
+            if self._on_match and (matched_track or is_final):
+                await self._on_match(tracks[i], matched_track)
+
+        tasks = [asyncio.create_task(match(i)) for i in indices]
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+
+            raise
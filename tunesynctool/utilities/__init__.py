@@ -1,3 +1,5 @@
 from .normalization import clean_str
 from .comparison import calculate_int_closeness, calculate_str_similarity
-from .collections import batch
\ No newline at end of file
+from .collections import batch
+from .background_loop import BackgroundEventLoop
+from .rate_limit import parse_retry_after
\ No newline at end of file
@@ -0,0 +1,63 @@
+from typing import Any, Coroutine, Optional, TypeVar
+import asyncio
+import threading
+
+T = TypeVar('T')
+
+class BackgroundEventLoop:
+    """
+    Runs coroutines from synchronous code on a single event loop that lives in a background thread.
+
+    Unlike calling asyncio.run() for every coroutine, the loop (and whatever sessions, connection pools
+    and executors are bound to it) survives between calls.
+    """
+
+    def __init__(self, name: str = 'tunesynctool-event-loop') -> None:
+        """
+        Starts the loop and its thread.
+
+        :param name: Name of the thread, shows up in debuggers and thread dumps.
+        """
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def _run_forever(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def run(self, coroutine: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """
+        Runs a coroutine on the loop and waits for its result. Safe to call from any thread except the loop's own.
+
+        :param coroutine: The coroutine to run.
+        :param timeout: Seconds to wait for the result, or None to wait as long as it takes.
+        :return: The coroutine's result.
+        :raises: Whatever the coroutine raises.
+        :raises: RuntimeError if the loop was closed or this is called from the loop's own thread.
+        """
+
+        if self._loop.is_closed():
+            coroutine.close()
+            raise RuntimeError('The background event loop is closed.')
+
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError('Waiting for the background event loop from its own thread would block it forever.')
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    def close(self) -> None:
+        """
+        Stops the loop and its thread. Calling it more than once is fine.
+        """
+
+        if self._loop.is_closed():
+            return
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+        self._loop.run_until_complete(self._loop.shutdown_default_executor())
+        self._loop.close()
@@ -65,9 +65,19 @@ class Config(BaseSettings):
         except ValueError:
             return True
 
+    # Raise if the Google Cloud project was granted more than the default quota
+    YOUTUBE_DAILY_QUOTA: int = 10000
+
+    # Must be a single Redis instance. The task queue's Lua scripts derive per-user keys at run time, which Redis Cluster doesn't allow.
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
 
+    EMBEDDED_WORKER_COUNT: int = 3
+
+    # Registers the "fake" provider, which serves a generated catalog with simulated latency and rate limits,
+    # so the workers can run real transfers offline for load testing. Never enable it on a public instance.
+    ENABLE_FAKE_PROVIDER: bool = False
+
     @computed_field
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> MySQLDsn:
@@ -1,7 +1,12 @@
+from contextlib import asynccontextmanager
 from typing import Annotated
 from fastapi import Depends
 from api.models.user import User
 from api.services.auth_service import AuthService, get_auth_service
+from api.services.user_service import UserService
+from api.services.task_service import get_task_service
+from api.services.credentials_service import get_credentials_service
+from api.core.database import get_session_instance
 from api.core.security import oauth2_scheme
 
 class RequestContext:
@@ -18,4 +23,28 @@ async def get_request_context(
     return RequestContext(
         user=user,
         jwt=jwt
-    )
\ No newline at end of file
+    )
+
+async def get_streaming_request_context(
+        jwt: Annotated[str, Depends(oauth2_scheme)]
+) -> RequestContext:
+    """
+    Same as get_request_context(), for endpoints that stream their response.
+
+    Dependencies with yield are only closed once the response ends, so the database session of get_request_context()
+    would be held for as long as the client stays connected. This one only holds its session while the user is looked up.
+    """
+
+    async with await get_session_instance() as db_session, asynccontextmanager(get_task_service)() as task_service:
+        auth_service = AuthService(UserService(
+            db=db_session,
+            task_service=task_service,
+            credentials_service=get_credentials_service(db_session)
+        ))
+
+        user = await auth_service.resolve_user_from_jwt(jwt)
+
+    return RequestContext(
+        user=user,
+        jwt=jwt
+    )
@@ -1,8 +1,9 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from sqlmodel import select
 from tunesynctool.drivers import AsyncWrappedServiceDriver
 from tunesynctool.models.playlist import Playlist
 from tunesynctool.models.track import Track
+import asyncio
 import json
 import re
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -20,11 +21,15 @@ class AsyncCachedDriver(AsyncWrappedServiceDriver):
     _db: Optional[AsyncSession] = None
 
     def __init__(self, base: AsyncWrappedServiceDriver):
-        super().__init__(base.sync_driver)
+        # Natively async drivers (like Deezer's) have no sync driver, but carry the same attributes themselves.
+        super().__init__(getattr(base, "sync_driver", base))
 
         self.base = base
         self.redis = get_redis_instance()
 
+        # An AsyncSession does not allow concurrent operations, but transfers match several tracks at once.
+        self._db_lock = asyncio.Lock()
+
     async def __aenter__(self) -> "AsyncCachedDriver":
         return self
     
@@ -32,7 +37,9 @@ class AsyncCachedDriver(AsyncWrappedServiceDriver):
         await self.close()
     
     async def close(self) -> None:
-        """Clean up resources - close database session and Redis connection."""
+        """Clean up resources - close database session, Redis connection and the base driver."""
+        await self.base.close()
+
         if self._db:
             await self._db.close()
             self._db = None
@@ -89,6 +96,24 @@ class AsyncCachedDriver(AsyncWrappedServiceDriver):
 
         return query
     
+    async def get_user_playlists(self, limit: int = 25) -> List[Playlist]:
+        return await self.base.get_user_playlists(limit=limit)
+
+    async def get_playlist_tracks(self, playlist_id: str, limit: int = 100) -> List[Track]:
+        return await self.base.get_playlist_tracks(playlist_id=playlist_id, limit=limit)
+
+    async def create_playlist(self, name: str) -> Playlist:
+        return await self.base.create_playlist(name=name)
+
+    async def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
+        await self.base.add_tracks_to_playlist(playlist_id=playlist_id, track_ids=track_ids)
+
+    async def get_random_track(self) -> Optional[Track]:
+        return await self.base.get_random_track()
+
+    async def get_saved_tracks(self, limit: int = 10) -> List[Track]:
+        return await self.base.get_saved_tracks(limit=limit)
+
     async def get_playlist(self, playlist_id: str) -> Playlist:
         key = f"provider_cache:{self.base.service_name}:playlists:playlist_id#{(playlist_id)}"
         cached = await self.redis.get(key)
@@ -102,67 +127,131 @@ class AsyncCachedDriver(AsyncWrappedServiceDriver):
         await self.redis.set(key, self._serialize_playlist(result), ex=300)
         return result
     
-    async def get_track(self, track_id: str) -> Track:
-        db = await self.get_db()
-        query = await db.execute(
-            select(CachedTrack)
-            .join(CachedTrackProviderMapping)
-            .where(
-                CachedTrackProviderMapping.track_id == track_id,
-                CachedTrackProviderMapping.provider == self.base.service_name,
-            )
+    def _map_cached_track(self, cached: CachedTrack, provider_track_id: str) -> Track:
+        return Track(
+            title=cached.title,
+            album_name=cached.album_name,
+            primary_artist=cached.author,
+            additional_artists=cached.collaborators,
+            duration_seconds=cached.duration,
+            track_number=cached.track_number,
+            release_year=cached.release_year,
+            isrc=cached.isrc,
+            musicbrainz_id=cached.musicbrainz,
+            service_id=provider_track_id,
+            service_name=self.base.service_name
         )
 
-        cached = query.scalar_one_or_none()
+    async def _get_cached_tracks(self, track_ids: List[str]) -> Dict[str, Track]:
+        """
+        Look tracks up in the DB cache by their IDs at the provider.
 
-        if cached:
-            return Track(
-                title=cached.title,
-                album_name=cached.album_name,
-                primary_artist=cached.author,
-                additional_artists=cached.collaborators,
-                duration_seconds=cached.duration,
-                track_number=cached.track_number,
-                release_year=cached.release_year,
-                isrc=cached.isrc,
-                musicbrainz_id=cached.musicbrainz,
-                service_id=track_id,
-                service_name=self.base.service_name
+        :param track_ids: IDs of the tracks at the provider.
+        :return: The cached tracks, by their IDs.
+        """
+
+        async with self._db_lock:
+            db = await self.get_db()
+            query = await db.execute(
+                select(CachedTrack, CachedTrackProviderMapping.provider_track_id)
+                .join(CachedTrackProviderMapping, CachedTrackProviderMapping.track_id == CachedTrack.id)
+                .where(
+                    CachedTrackProviderMapping.provider_track_id.in_(track_ids),
+                    CachedTrackProviderMapping.provider == self.base.service_name,
+                )
             )
+
+            rows = query.all()
+
+        return {
+            provider_track_id: self._map_cached_track(cached, provider_track_id)
+            for cached, provider_track_id in rows
+        }
+
+    async def _cache_tracks(self, tracks: List[Track]) -> None:
+        """
+        Save tracks fetched from the provider in the DB cache, in one transaction.
+        """
+
+        if len(tracks) == 0:
+            return
+
+        async with self._db_lock:
+            db = await self.get_db()
+
+            new_cached = [
+                CachedTrack(
+                    title=track.title,
+                    album_name=track.album_name,
+                    author=track.primary_artist,
+                    collaborators=track.additional_artists,
+                    duration=track.duration_seconds,
+                    track_number=track.track_number,
+                    release_year=track.release_year,
+                    isrc=track.isrc,
+                    musicbrainz=track.musicbrainz_id
+                )
+                for track in tracks
+            ]
+            db.add_all(new_cached)
+            await db.flush()
+
+            db.add_all([
+                CachedTrackProviderMapping(
+                    track_id=cached.id,
+                    provider=self.base.service_name,
+                    provider_track_id=track.service_id
+                )
+                for cached, track in zip(new_cached, tracks)
+            ])
+            await db.commit()
+
+    async def get_track(self, track_id: str) -> Track:
+        cached = await self._get_cached_tracks([track_id])
+        if track_id in cached:
+            return cached[track_id]
         
         result = await self.base.get_track(
             track_id=track_id,
         )
 
         if result:
-            # Cache in DB
-            new_cached = CachedTrack(
-                title=result.title,
-                album_name=result.album_name,
-                author=result.primary_artist,
-                collaborators=result.additional_artists,
-                duration=result.duration_seconds,
-                track_number=result.track_number,
-                release_year=result.release_year,
-                isrc=result.isrc,
-                musicbrainz=result.musicbrainz_id
-            )
-            db.add(new_cached)
-            await db.commit()
-            await db.refresh(new_cached)
+            await self._cache_tracks([result])
 
-            mapping = CachedTrackProviderMapping(
-                track_id=new_cached.id,
-                provider=self.base.service_name,
-                provider_track_id=track_id
+        return result
+
+    async def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        """
+        Fetch several tracks, using the DB cache when available.
+        Only the tracks missing from the cache are fetched from the provider, in one bulk call.
+
+        :param track_ids: IDs of the tracks at the provider.
+        :return: The tracks that exist, in the same order as the IDs.
+        """
+
+        if len(track_ids) == 0:
+            return []
+
+        tracks_by_id = await self._get_cached_tracks(track_ids)
+        missing_ids = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in tracks_by_id]
+
+        if len(missing_ids) > 0:
+            fetched = await self.base.get_tracks(
+                track_ids=missing_ids
             )
-            db.add(mapping)
-            await db.commit()
 
-        return result
+            await self._cache_tracks(fetched)
+            tracks_by_id.update({track.service_id: track for track in fetched})
+
+        logger.debug(f"Fetched {len(track_ids)} tracks from {self.base.service_name}, {len(track_ids) - len(missing_ids)} of them from the cache")
+
+        return [tracks_by_id[track_id] for track_id in track_ids if track_id in tracks_by_id]
     
+    def _search_results_key(self, query: str, limit: int) -> str:
+        return f"provider_cache:{self.base.service_name}:search_results:query#{(self.normalize_query(query))}:limit#{limit}"
+
     async def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
-        key = f"provider_cache:{self.base.service_name}:search_results:query#{(self.normalize_query(query))}:limit#{limit}"
+        key = self._search_results_key(query, limit)
         cached = await self.redis.get(key)
         if cached:
             return self._deserialize_track_array(cached)
@@ -175,6 +264,40 @@ class AsyncCachedDriver(AsyncWrappedServiceDriver):
         await self.redis.set(key, self._serialize_track_array(results), ex=3600) # 1 hour
         return results
 
+    async def search_tracks_many(self, queries: List[str], limit: int = 10) -> List[List[Track]]:
+        """
+        Search for several queries, using the Redis cache when available.
+        Only the queries missing from the cache are passed on to the base driver, in one call.
+
+        :param queries: The search queries.
+        :param limit: The maximum number of tracks to fetch per query.
+        :return: A list of results for each query, in the same order as the queries.
+        """
+
+        if len(queries) == 0:
+            return []
+
+        keys = [self._search_results_key(query, limit) for query in queries]
+        cached = await self.redis.mget(keys)
+
+        results: List[Optional[List[Track]]] = [self._deserialize_track_array(value) if value else None for value in cached]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if len(missing) > 0:
+            fetched = await self.base.search_tracks_many(
+                queries=[queries[i] for i in missing],
+                limit=limit
+            )
+
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for i, tracks in zip(missing, fetched):
+                    results[i] = tracks
+                    pipe.set(keys[i], self._serialize_track_array(tracks), ex=3600) # 1 hour
+
+                await pipe.execute()
+
+        return results
+
     async def get_track_by_isrc(self, isrc: str) -> Optional[Track]:
         """
         Retrieve a track by its ISRC, using DB cache when available.
@@ -185,6 +308,49 @@ class AsyncCachedDriver(AsyncWrappedServiceDriver):
         """
         return await self._get_track_by_isrc_with_cache(isrc)
     
+    async def get_tracks_by_isrcs(self, isrcs: List[str]) -> Dict[str, Track]:
+        """
+        Look up several ISRCs, using the DB cache when available.
+        Only the ISRCs missing from the cache are looked up at the provider, in one bulk call.
+
+        :param isrcs: The ISRCs to look up.
+        :return: The tracks that were found, by their ISRCs.
+        """
+
+        if len(isrcs) == 0 or not self.base.supports_direct_isrc_querying:
+            return {}
+
+        async with self._db_lock:
+            db = await self.get_db()
+            query = await db.execute(
+                select(CachedTrack, CachedTrackProviderMapping.provider_track_id)
+                .join(CachedTrackProviderMapping, CachedTrackProviderMapping.track_id == CachedTrack.id)
+                .where(
+                    CachedTrack.isrc.in_(isrcs),
+                    CachedTrackProviderMapping.provider == self.base.service_name,
+                )
+            )
+
+            rows = query.all()
+
+        tracks = {}
+        for cached, provider_track_id in rows:
+            tracks.setdefault(cached.isrc, self._map_cached_track(cached, provider_track_id))
+
+        missing_isrcs = [isrc for isrc in dict.fromkeys(isrcs) if isrc not in tracks]
+
+        if len(missing_isrcs) > 0:
+            fetched = await self.base.get_tracks_by_isrcs(
+                isrcs=missing_isrcs
+            )
+
+            await self._cache_tracks(list(fetched.values()))
+            tracks.update(fetched)
+
+        logger.debug(f"Resolved {len(tracks)} of {len(set(isrcs))} ISRCs at {self.base.service_name}, {len(set(isrcs)) - len(missing_isrcs)} of them from the cache")
+
+        return tracks
+
     async def _get_track_by_isrc_with_cache(self, isrc: str) -> Optional[Track]:
         """
         Internal method to look up a track by ISRC using the DB cache.
@@ -196,19 +362,20 @@ class AsyncCachedDriver(AsyncWrappedServiceDriver):
         :param isrc: The ISRC to look up.
         :return: The matching Track or None if not found.
         """
-        db = await self.get_db()
-        
-        # Query for cached track with matching ISRC AND provider mapping
-        query = await db.execute(
-            select(CachedTrack, CachedTrackProviderMapping.provider_track_id)
-            .join(CachedTrackProviderMapping, CachedTrackProviderMapping.track_id == CachedTrack.id)
-            .where(
-                CachedTrack.isrc == isrc,
-                CachedTrackProviderMapping.provider == self.base.service_name,
+        async with self._db_lock:
+            db = await self.get_db()
+
+            # Query for cached track with matching ISRC AND provider mapping
+            query = await db.execute(
+                select(CachedTrack, CachedTrackProviderMapping.provider_track_id)
+                .join(CachedTrackProviderMapping, CachedTrackProviderMapping.track_id == CachedTrack.id)
+                .where(
+                    CachedTrack.isrc == isrc,
+                    CachedTrackProviderMapping.provider == self.base.service_name,
+                )
             )
-        )
 
-        result = query.first()
+            result = query.first()
         
         if result is not None:
             cached_track, provider_track_id = result
@@ -235,28 +402,29 @@ class AsyncCachedDriver(AsyncWrappedServiceDriver):
 
         if api_result:
             # Cache the result in DB
-            new_cached = CachedTrack(
-                title=api_result.title,
-                album_name=api_result.album_name,
-                author=api_result.primary_artist,
-                collaborators=api_result.additional_artists,
-                duration=api_result.duration_seconds,
-                track_number=api_result.track_number,
-                release_year=api_result.release_year,
-                isrc=api_result.isrc,
-                musicbrainz=api_result.musicbrainz_id
-            )
-            db.add(new_cached)
-            await db.commit()
-            await db.refresh(new_cached)
+            async with self._db_lock:
+                new_cached = CachedTrack(
+                    title=api_result.title,
+                    album_name=api_result.album_name,
+                    author=api_result.primary_artist,
+                    collaborators=api_result.additional_artists,
+                    duration=api_result.duration_seconds,
+                    track_number=api_result.track_number,
+                    release_year=api_result.release_year,
+                    isrc=api_result.isrc,
+                    musicbrainz=api_result.musicbrainz_id
+                )
+                db.add(new_cached)
+                await db.commit()
+                await db.refresh(new_cached)
 
-            mapping = CachedTrackProviderMapping(
-                track_id=new_cached.id,
-                provider=self.base.service_name,
-                provider_track_id=api_result.service_id
-            )
-            db.add(mapping)
-            await db.commit()
-            logger.debug(f"Cached track {api_result.service_id} with ISRC {isrc} for provider {self.base.service_name}")
+                mapping = CachedTrackProviderMapping(
+                    track_id=new_cached.id,
+                    provider=self.base.service_name,
+                    provider_track_id=api_result.service_id
+                )
+                db.add(mapping)
+                await db.commit()
+                logger.debug(f"Cached track {api_result.service_id} with ISRC {isrc} for provider {self.base.service_name}")
 
         return api_result
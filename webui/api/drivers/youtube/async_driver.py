@@ -1,12 +1,59 @@
+from typing import List, Optional
 from tunesynctool.drivers import AsyncWrappedServiceDriver
+from tunesynctool.models import Track
 from google.oauth2.credentials import Credentials as GoogleCredentials
 
 from .driver import YouTubeOAuth2Driver
+from .quota import QuotaLedger
+from api.core.logging import logger
+from api.core.redis import get_redis_instance
 
 class AsyncYouTubeOAuth2Driver(AsyncWrappedServiceDriver):
-    def __init__(self, google_credentials: GoogleCredentials):
+    """
+    Async wrapper of YouTubeOAuth2Driver that records the Data API quota it spends,
+    and sends searches to the quota free fallback driver before the quota runs out.
+    """
+
+    def __init__(self, google_credentials: GoogleCredentials, user_id: Optional[int] = None):
         super().__init__(
             sync_driver=YouTubeOAuth2Driver(
                 google_credentials=google_credentials
             )
-        )
\ No newline at end of file
+        )
+
+        self.user_id = user_id
+        self.redis = get_redis_instance()
+        self.quota = QuotaLedger(self.redis)
+
+    async def _wrap_sync(self, fn, *args, **kwargs):
+        try:
+            return await super()._wrap_sync(fn, *args, **kwargs)
+        finally:
+            await self.__record_spent_units()
+
+    async def __record_spent_units(self) -> None:
+        spent = self.sync_driver.pop_spent_units()
+        if len(spent) == 0:
+            return
+
+        try:
+            await self.quota.record(self.user_id, spent)
+        except Exception as e:
+            logger.warning(f"Failed to record {sum(spent.values())} spent YouTube quota units: {e}")
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+    async def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
+        # Each search costs 100 units of the 10,000 a project gets per day, while the fallback costs none
+        if await self.quota.should_use_fallback_for_search(self.user_id):
+            return await self._wrap_sync(
+                self.sync_driver.legacy_driver.search_tracks,
+                query=query,
+                limit=limit
+            )
+
+        return await super().search_tracks(
+            query=query,
+            limit=limit
+        )
@@ -1,17 +1,24 @@
 from tunesynctool.drivers import ServiceDriver, YouTubeDriver as LegacyYouTubeDriver
-from tunesynctool.exceptions import ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException, PlaylistNotFoundException
+from tunesynctool.exceptions import ServiceDriverException, UnsupportedFeatureException, TrackNotFoundException, PlaylistNotFoundException, RateLimitException
 from tunesynctool.models import Track, Playlist
 from tunesynctool.models import Configuration as LegacyConfiguration
+from tunesynctool.utilities import batch, parse_retry_after
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials as GoogleCredentials
-from typing import List, Optional
+from typing import Dict, List, Optional
 from googleapiclient.errors import HttpError
+import threading
 
 from .mapper import YouTubeAPIV3Mapper
 from .exception import PrivateResourceException
+from .quota import QUOTA_COSTS, get_seconds_until_quota_reset
+from api.core.logging import logger
 from api.helpers.ytmusicapi import CustomYTMusicAPIOAuthCredentials
 from api.core.config import config
 
+VIDEOS_PER_REQUEST = 50 # the most IDs videos.list accepts at once
+REQUESTS_PER_BATCH = 50 # the most calls a batch HTTP request may hold
+
 class YouTubeOAuth2Driver(ServiceDriver):
     """
     YouTube OAuth2 service driver.
@@ -26,12 +33,109 @@ class YouTubeOAuth2Driver(ServiceDriver):
             service_name="youtube",
             config=None,
             mapper=YouTubeAPIV3Mapper(),
-            supports_direct_isrc_querying=False
+            supports_direct_isrc_querying=False,
+            max_playlist_insert_batch_size=50
         )
 
         self.client = self.__get_client(google_credentials)
         self.__legacy_driver = self.__get_legacy_driver(google_credentials)
 
+        self.__spent_units: Dict[str, int] = {}
+        self.__spent_units_lock = threading.Lock()
+
+    @property
+    def legacy_driver(self) -> ServiceDriver:
+        """
+        The ytmusicapi based driver, which doesn't spend any of the Data API quota.
+        """
+
+        return self.__legacy_driver
+
+    def pop_spent_units(self) -> Dict[str, int]:
+        """
+        Get the quota units spent since the last call, per API method.
+        """
+
+        with self.__spent_units_lock:
+            spent, self.__spent_units = self.__spent_units, {}
+
+        return spent
+
+    def _execute(self, method: str, request, calls: int = 1):
+        """
+        Execute an API request and note the quota units it costs. Failed requests cost quota too.
+
+        :param method: The API method of the request, as in QUOTA_COSTS
+        :param request: The request to execute
+        :param calls: How many calls to the method the request holds, for batch requests
+        """
+
+        try:
+            return request.execute()
+        finally:
+            with self.__spent_units_lock:
+                self.__spent_units[method] = self.__spent_units.get(method, 0) + QUOTA_COSTS[method] * calls
+
+    def __list_videos(self, video_ids: List[str], part: str) -> Dict[str, dict]:
+        """
+        Fetch videos by their IDs, 50 per videos.list call.
+        When more than one call is needed, they are sent together in batch HTTP requests, which saves round trips but not quota.
+
+        :param video_ids: IDs of the videos, duplicates are fetched once
+        :param part: The parts of the videos to fetch
+        :return: The videos that exist, by their IDs
+        """
+
+        videos_by_id = {}
+        errors = []
+
+        def collect(request_id, response, exception) -> None:
+            if exception:
+                errors.append(exception)
+                return
+
+            for video in response.get("items", []):
+                if video.get("id"):
+                    videos_by_id[video.get("id")] = video
+
+        id_chunks = list(batch(list(dict.fromkeys(video_ids)), VIDEOS_PER_REQUEST))
+
+        for chunks in batch(id_chunks, REQUESTS_PER_BATCH):
+            if len(chunks) == 1:
+                collect(None, self._execute("videos.list", self.client.videos().list(part=part, id=",".join(chunks[0]))), None)
+                continue
+
+            request = self.client.new_batch_http_request(callback=collect)
+            for chunk in chunks:
+                request.add(self.client.videos().list(part=part, id=",".join(chunk)))
+
+            self._execute("videos.list", request, calls=len(chunks))
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        return videos_by_id
+
+    def __hydrate_playlist_items(self, items: List[dict]) -> List[Track]:
+        """
+        Map playlist items to tracks, fetching the details of their videos.
+        Items whose videos no longer exist (or are private) are left out.
+        """
+
+        def get_video_id(item: dict) -> Optional[str]:
+            return item.get("snippet", {}).get("resourceId", {}).get("videoId")
+
+        videos_by_id = self.__list_videos(
+            video_ids=[get_video_id(item) for item in items if get_video_id(item)],
+            part="contentDetails"
+        )
+
+        return [
+            self._mapper.map_track_from_playlist_item(item, videos_by_id[get_video_id(item)])
+            for item in items
+            if get_video_id(item) in videos_by_id
+        ]
+
     def __get_client(self, google_credentials: GoogleCredentials):
         return build(
             serviceName="youtube",
@@ -58,12 +162,12 @@ class YouTubeOAuth2Driver(ServiceDriver):
             next_page_token = None
 
             while True:
-                results = self.client.playlists().list(
+                results = self._execute("playlists.list", self.client.playlists().list(
                     part="id,snippet,status,contentDetails",
                     maxResults=50,
                     mine=True,
                     pageToken=next_page_token
-                ).execute()
+                ))
 
                 if not results or "items" not in results or len(results["items"]) == 0:
                     break
@@ -83,6 +187,7 @@ class YouTubeOAuth2Driver(ServiceDriver):
 
             return mapped_playlists
         except HttpError as e:
+            self._raise_for_rate_limit(e)
             if e.status_code == 403:
                 raise PrivateResourceException("Permission error. This is most likely happening because not all required scopes were granted during authorization. Relinking the account should fix this.")
             raise ServiceDriverException(e)
@@ -94,58 +199,43 @@ class YouTubeOAuth2Driver(ServiceDriver):
             mapped_videos = []
             next_page_token = None
 
+            pending_items = []
+
+            # Pages are fetched back to back, their videos are only fetched once enough items piled up
+            # (or the playlist ends), so that up to 2,500 videos are fetched per round trip.
             while True:
-                results = self.client.playlistItems().list(
+                results = self._execute("playlistItems.list", self.client.playlistItems().list(
                     part="id,snippet,contentDetails",
                     maxResults=50,
                     playlistId=playlist_id,
                     pageToken=next_page_token
-                ).execute()
+                ))
 
                 if not results or "items" not in results or len(results["items"]) == 0:
                     break
 
-                result_ids = [
-                    result.get("snippet", {}).get("resourceId", {}).get("videoId")
-                    for result in results.get("items", [])
-                    if result.get("snippet", {}).get("resourceId", {}).get("videoId")
-                ]
-
-                if result_ids:
-                    video_results = self.client.videos().list(
-                        part="contentDetails",
-                        id=",".join(result_ids)
-                    ).execute()
-                else:
-                    video_results = {"items": []}
-
-                videos_by_id = {
-                    video.get("id"): video
-                    for video in video_results.get("items", [])
-                    if video.get("id")
-                }
-
-                for result in results.get("items", []):
-                    video_id = result.get("snippet", {}).get("resourceId", {}).get("videoId")
-                    video = videos_by_id.get(video_id)
-
-                    if not video:
-                        continue
+                pending_items.extend(results.get("items", []))
+                next_page_token = results.get("nextPageToken")
 
-                    mapped_videos.append(self._mapper.map_track_from_playlist_item(result, video))
+                if len(pending_items) >= VIDEOS_PER_REQUEST * REQUESTS_PER_BATCH or (limit > 0 and len(mapped_videos) + len(pending_items) >= limit):
+                    mapped_videos.extend(self.__hydrate_playlist_items(pending_items))
+                    pending_items = []
 
                 if limit > 0 and len(mapped_videos) >= limit:
                     break
 
-                next_page_token = results.get("nextPageToken")
                 if not next_page_token:
                     break
 
+            if len(pending_items) > 0:
+                mapped_videos.extend(self.__hydrate_playlist_items(pending_items))
+
             if limit > 0:
                 return mapped_videos[:limit]
 
             return mapped_videos
         except HttpError as e:
+            self._raise_for_rate_limit(e)
             if e.status_code == 404:
                 raise PlaylistNotFoundException()
             elif e.status_code == 403:
@@ -156,17 +246,18 @@ class YouTubeOAuth2Driver(ServiceDriver):
 
     def create_playlist(self, name: str) -> Playlist:
         try:
-            result = self.client.playlists().insert(
+            result = self._execute("playlists.insert", self.client.playlists().insert(
                 part="snippet",
                 body={
                     "snippet": {
                         "title": name
                     }
                 }
-            ).execute()
+            ))
 
             return self._mapper.map_playlist(result)
         except HttpError as e:
+            self._raise_for_rate_limit(e)
             if e.status_code == 403:
                 raise PrivateResourceException("Permission error. This is most likely happening because not all required scopes were granted during authorization. Relinking the account should fix this.")
             raise ServiceDriverException(e)
@@ -175,9 +266,11 @@ class YouTubeOAuth2Driver(ServiceDriver):
 
     def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> None:
         try:
+            # One insert per video, in order. Batch HTTP requests would save round trips, but the API applies
+            # the calls of a batch in no particular order, which would shuffle the playlist.
             for track_id in track_ids:
                 try:
-                    self.client.playlistItems().insert(
+                    self._execute("playlistItems.insert", self.client.playlistItems().insert(
                         part="snippet",
                         body={
                             "snippet": {
@@ -188,7 +281,7 @@ class YouTubeOAuth2Driver(ServiceDriver):
                                 }
                             }
                         }
-                    ).execute()
+                    ))
                 except HttpError as e:
                     if e.status_code == 404:
                         if isinstance(e.error_details, list) and len(e.error_details) > 0:
@@ -196,6 +289,7 @@ class YouTubeOAuth2Driver(ServiceDriver):
                                 continue
                     raise
         except HttpError as e:
+            self._raise_for_rate_limit(e)
             if e.status_code == 404:
                 if isinstance(e.error_details, list) and len(e.error_details) > 0:
                     error = e.error_details[0]
@@ -213,10 +307,10 @@ class YouTubeOAuth2Driver(ServiceDriver):
 
     def get_playlist(self, playlist_id: str) -> Playlist:
         try:
-            result = self.client.playlists().list(
+            result = self._execute("playlists.list", self.client.playlists().list(
                 part="id,snippet,status",
                 id=playlist_id
-            ).execute()
+            ))
 
             if not result or "items" not in result or len(result["items"]) == 0:
                 raise PlaylistNotFoundException()
@@ -227,6 +321,7 @@ class YouTubeOAuth2Driver(ServiceDriver):
         except PlaylistNotFoundException:
             raise
         except HttpError as e:
+            self._raise_for_rate_limit(e)
             if e.status_code == 403:
                 raise PrivateResourceException("Permission error. This is either happening because the playlist doesn't belong to the linked account or not all required scopes were granted during authorization. Relinking the account should fix this.")
             raise ServiceDriverException(e)
@@ -235,10 +330,10 @@ class YouTubeOAuth2Driver(ServiceDriver):
 
     def get_track(self, track_id: str) -> Track:
         try:
-            result = self.client.videos().list(
+            result = self._execute("videos.list", self.client.videos().list(
                 part="id,snippet,contentDetails",
                 id=track_id
-            ).execute()
+            ))
 
             if not result or "items" not in result or len(result["items"]) == 0:
                 raise TrackNotFoundException()
@@ -261,19 +356,54 @@ class YouTubeOAuth2Driver(ServiceDriver):
         except Exception as e:
             raise ServiceDriverException(e)
 
+    def get_tracks(self, track_ids: List[str]) -> List[Track]:
+        """
+        Fetch several videos at once, 50 per videos.list call.
+
+        :param track_ids: IDs of the videos.
+        :return: The videos that exist, in the order of the IDs.
+        """
+
+        try:
+            videos_by_id = self.__list_videos(
+                video_ids=track_ids,
+                part="id,snippet,contentDetails"
+            )
+
+            return [self._mapper.map_track(videos_by_id[track_id]) for track_id in track_ids if track_id in videos_by_id]
+        except HttpError as e:
+            if self._is_rate_limit_exception(e):
+                return self.__get_tracks_from_legacy_driver(track_ids)
+            elif e.status_code == 403:
+                raise PrivateResourceException("Permission error. This is either happening because a track doesn't belong to the linked account, the user does not have permission to access it, or not all required scopes were granted during authorization. Relinking the account may fix this.")
+            raise ServiceDriverException(e)
+        except Exception as e:
+            raise ServiceDriverException(e)
+
+    def __get_tracks_from_legacy_driver(self, track_ids: List[str]) -> List[Track]:
+        tracks = []
+
+        for track_id in track_ids:
+            try:
+                tracks.append(self.__legacy_driver.get_track(track_id=track_id))
+            except TrackNotFoundException:
+                logger.debug(f"Video {track_id} was not found by the fallback driver")
+
+        return tracks
+
     def search_tracks(self, query: str, limit: int = 10) -> List[Track]:
         if not query or len(query) == 0:
             return []
 
         try:
-            search_results = self.client.search().list(
+            search_results = self._execute("search.list", self.client.search().list(
                 q=query,
                 part="id,snippet",
                 type="video",
                 maxResults=limit,
                 videoCategoryId="10", # Music
                 safeSearch="none"
-            ).execute()
+            ))
 
             result_ids = [
                 result.get("id", {}).get("videoId")
@@ -284,10 +414,10 @@ class YouTubeOAuth2Driver(ServiceDriver):
             if len(result_ids) == 0:
                 return []
 
-            video_results = self.client.videos().list(
+            video_results = self._execute("videos.list", self.client.videos().list(
                 part="id,snippet,contentDetails",
                 id=",".join(result_ids)
-            ).execute()
+            ))
             videos_by_id = {
                 video.get("id"): video
                 for video in video_results.get("items", [])
@@ -333,14 +463,34 @@ class YouTubeOAuth2Driver(ServiceDriver):
             "userRateLimitExceeded",
         ]
 
+        return any(reason in error_codes for reason in self.__get_error_reasons(e))
+
+    def _raise_for_rate_limit(self, e: HttpError) -> None:
+        """
+        Raise a RateLimitException if the request was rejected because of a rate limit or the exhausted daily quota.
+        Used where there is no quota free fallback to send the request to instead.
+        """
+
+        if not self._is_rate_limit_exception(e):
+            return
+
+        if "quotaExceeded" in self.__get_error_reasons(e):
+            raise RateLimitException("The daily YouTube Data API quota is exhausted.", retry_after=get_seconds_until_quota_reset()) from e
+
+        # httplib2 responses are dicts of their (lowercased) headers
+        headers = e.resp if isinstance(e.resp, dict) else {}
+
+        raise RateLimitException(
+            "Rate limited by the YouTube Data API.",
+            retry_after=parse_retry_after(headers.get("retry-after"))
+        ) from e
+
+    def __get_error_reasons(self, e: HttpError) -> List[str]:
         details = e.error_details
         if isinstance(details, dict):
             details = [details]
 
         if not isinstance(details, list):
-            return False
+            return []
 
-        return any(
-            isinstance(error, dict) and error.get("reason") in error_codes
-            for error in details
-        )
+        return [error.get("reason") for error in details if isinstance(error, dict)]
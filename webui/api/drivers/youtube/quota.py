@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+from redis.asyncio import Redis
+
+from api.core.config import config
+from api.models.quota import YouTubeQuotaUsage
+
+# https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COSTS = {
+    "search.list": 100,
+    "videos.list": 1,
+    "playlists.list": 1,
+    "playlists.insert": 50,
+    "playlistItems.list": 1,
+    "playlistItems.insert": 50,
+}
+
+# The quota of every project resets at midnight Pacific Time.
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+# Share of the daily quota kept for what only the Data API can do, like adding tracks to playlists.
+# Once less than this remains, searches go to the ytmusicapi based fallback instead.
+SEARCH_RESERVE_SHARE = 0.3
+
+# Share of the daily quota a single user's searches may use up, so one large transfer can't starve everyone else.
+USER_SEARCH_SHARE = 0.25
+
+QUOTA_TTL = 172800 # 2 days, the ledger of a day is only needed until it ends
+
+def get_quota_day_start(now: Optional[datetime] = None) -> datetime:
+    """
+    Get the start of the current quota day.
+
+    :param now: Time to get the quota day of, defaults to the current time
+    :return: Midnight Pacific Time
+    """
+
+    now = (now or datetime.now(QUOTA_TIMEZONE)).astimezone(QUOTA_TIMEZONE)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def get_seconds_until_quota_reset(now: Optional[datetime] = None) -> float:
+    """
+    Get how long until the quota resets.
+
+    :param now: Time to count from, defaults to the current time
+    :return: Seconds until the next midnight Pacific Time
+    """
+
+    now = (now or datetime.now(QUOTA_TIMEZONE)).astimezone(QUOTA_TIMEZONE)
+    return (get_quota_day_start(now) + timedelta(days=1) - now).total_seconds()
+
+def make_quota_key(day: datetime) -> str:
+    """
+    Key of the hash holding the units the project spent on the given day, per API method.
+    The "total" field holds the sum.
+    """
+
+    return f"youtube_quota:{day.date().isoformat()}"
+
+def make_user_quota_key(day: datetime, user_id: int) -> str:
+    """
+    Key of the hash holding the units spent on the given day on behalf of a user, per API method.
+    """
+
+    return f"youtube_quota:{day.date().isoformat()}:user:{user_id}"
+
+class QuotaLedger:
+    """
+    Keeps track of the YouTube Data API quota spent today, by the whole project and per user.
+    """
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+
+    async def record(self, user_id: Optional[int], spent: Dict[str, int]) -> None:
+        """
+        Record spent quota units.
+
+        :param user_id: The user the requests were sent for, if any
+        :param spent: Units spent per API method
+        """
+
+        day = get_quota_day_start()
+        keys = [make_quota_key(day)]
+        if user_id is not None:
+            keys.append(make_user_quota_key(day, user_id))
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                for method, units in spent.items():
+                    pipe.hincrby(key, method, units)
+
+                pipe.hincrby(key, "total", sum(spent.values()))
+                pipe.expire(key, QUOTA_TTL)
+
+            await pipe.execute()
+
+    async def get_usage(self, user_id: Optional[int] = None) -> YouTubeQuotaUsage:
+        """
+        Get the quota spent today.
+
+        :param user_id: The user to also return the spending of
+        :return: Usage of the current quota day
+        """
+
+        day = get_quota_day_start()
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(make_quota_key(day))
+            if user_id is not None:
+                pipe.hget(make_user_quota_key(day, user_id), "total")
+
+            results = await pipe.execute()
+
+        spent_by_method = {method: int(units) for method, units in results[0].items()}
+        spent = spent_by_method.pop("total", 0)
+        user_spent = int(results[1] or 0) if user_id is not None else 0
+        search_cost = QUOTA_COSTS["search.list"]
+
+        return YouTubeQuotaUsage(
+            limit=config.YOUTUBE_DAILY_QUOTA,
+            spent=spent,
+            remaining=max(config.YOUTUBE_DAILY_QUOTA - spent, 0),
+            spent_by_method=spent_by_method,
+            user_spent=user_spent,
+            searches_use_fallback=(
+                config.YOUTUBE_DAILY_QUOTA - spent - search_cost < config.YOUTUBE_DAILY_QUOTA * SEARCH_RESERVE_SHARE
+                or user_spent + search_cost > config.YOUTUBE_DAILY_QUOTA * USER_SEARCH_SHARE
+            ),
+            resets_at=day + timedelta(days=1)
+        )
+
+    async def should_use_fallback_for_search(self, user_id: Optional[int]) -> bool:
+        """
+        Whether a search should skip the Data API, because it would eat into the reserved quota
+        or the user already used up their share of it.
+
+        :param user_id: The user the search is sent for, if any
+        """
+
+        usage = await self.get_usage(user_id)
+        return usage.searches_use_fallback
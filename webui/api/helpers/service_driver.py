@@ -2,9 +2,11 @@ from tunesynctool.drivers import (
     AsyncWrappedServiceDriver,
     AsyncDeezerDriver,
     AsyncSpotifyDriver,
-    AsyncSubsonicDriver
+    AsyncSubsonicDriver,
+    AsyncFakeDriver
 )
 
+from api.core.config import config
 from api.drivers.youtube import AsyncYouTubeOAuth2Driver
 
 DRIVERS = {
@@ -14,6 +16,10 @@ DRIVERS = {
     "deezer": AsyncDeezerDriver,
 }
 
+# Only for load testing, see Config.ENABLE_FAKE_PROVIDER
+if config.ENABLE_FAKE_PROVIDER:
+    DRIVERS["fake"] = AsyncFakeDriver
+
 SUPPORTED_PROVIDERS = list(DRIVERS.keys())
 
 def is_valid_provider(name: str) -> bool:
@@ -8,7 +8,7 @@ from api.core.config import config
 from api.core.database import initialize_database
 from api.core.logging import logger
 from api.workers.dispatcher import worker_dispatcher
-from api.workers.recovery import recover_stale_tasks, recover_marked_for_deletion_tasks
+from api.workers.recovery import run_startup_recovery
 
 app = FastAPI(
     title="tunesynctool web API",
@@ -24,17 +24,15 @@ async def on_startup():
     logger.info("Starting application...")
     
     await initialize_database()
-    
-    recovered = await recover_stale_tasks()
-    if recovered > 0:
-        logger.info(f"Recovered {recovered} stale task(s) from previous run")
 
-    deleted = await recover_marked_for_deletion_tasks()
-    if deleted > 0:
-        logger.info(f"Deleted {deleted} task(s) marked for deletion from previous run")
-    
-    worker_count = 3
-    logger.info(f"Starting {worker_count} background workers...")
+    await run_startup_recovery()
+
+    worker_count = config.EMBEDDED_WORKER_COUNT
+    if worker_count > 0:
+        logger.info(f"Starting {worker_count} embedded background workers...")
+    else:
+        logger.info("Embedded background workers are disabled, tasks have to be processed by standalone workers (python -m api.workers)")
+
     for i in range(worker_count):
         task = asyncio.create_task(worker_dispatcher(i))
         worker_tasks.append(task)
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Dict
+
+from pydantic import BaseModel, Field
+
+class YouTubeQuotaUsage(BaseModel):
+    """
+    YouTube Data API quota spent on the current quota day.
+    The quota is shared by every user of the Google Cloud project the instance is configured with.
+    """
+
+    limit: int = Field(description="Units the project may spend per day.")
+    spent: int = Field(description="Units the project spent today.")
+    remaining: int = Field(description="Units the project has left today.")
+    spent_by_method: Dict[str, int] = Field(description="Units the project spent today per API method (e.g. search.list).", default_factory=dict)
+    user_spent: int = Field(description="Units spent today on behalf of the authenticated user.", default=0)
+    searches_use_fallback: bool = Field(description="Whether searches are currently sent to the quota free fallback client instead of the Data API.", default=False)
+    resets_at: datetime = Field(description="When the quota resets (midnight Pacific Time).")
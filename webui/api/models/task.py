@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from pydantic import BaseModel, Field, field_validator
 from enum import StrEnum
@@ -64,6 +64,9 @@ class TaskResponseBase(BaseModel):
     done_at: Optional[int] = Field(description="Unix timestamp in UTC to help tell when the task was considered done.", default=None)
     worker_id: Optional[str] = Field(description="ID of the worker currently processing this task.", default=None)
     last_heartbeat: Optional[int] = Field(description="Unix timestamp of last worker heartbeat for stale detection.", default=None)
+    retry_count: int = Field(description="How many times the task was handed to another worker after its previous one stopped responding.", default=0)
+    queue_entry_id: Optional[str] = Field(description="ID of the queue entry the task was last delivered with.", default=None)
+    not_before: Optional[int] = Field(description="Unix timestamp in UTC before which the waiting task isn't scheduled, set while it backs off from a rate limit.", default=None)
 
 class PlaylistTaskProgress(BaseModel):
     """
@@ -80,4 +83,33 @@ class PlaylistTaskStatus(TaskResponseBase):
     """
 
     arguments: PlaylistTaskCreate = Field(description="Original request parameters.")
-    progress: PlaylistTaskProgress = Field(description="Details about the progress of the task.")
\ No newline at end of file
+    progress: PlaylistTaskProgress = Field(description="Details about the progress of the task.")
+
+class UserQueueStats(BaseModel):
+    """
+    Waiting tasks of a single user.
+    """
+
+    user_id: int = Field(description="Database ID of the user.")
+    depth: int = Field(description="Tasks of the user waiting to be scheduled.")
+    running: int = Field(description="Tasks of the user currently held by workers.")
+    oldest_wait: Optional[int] = Field(description="Seconds the user's next task has been waiting for.", default=None)
+    average_wait: Optional[float] = Field(description="Average seconds the user's tasks waited before they were scheduled.", default=None)
+    last_wait: Optional[float] = Field(description="Seconds the user's most recently scheduled task waited.", default=None)
+    scheduled: int = Field(description="Tasks of the user scheduled since the statistics were last reset.", default=0)
+
+class TaskQueueStats(BaseModel):
+    """
+    Current state of the task queue.
+
+    Queued tasks wait in per-user queues until the scheduler picks them, then move to the task stream
+    that workers read from.
+    """
+
+    length: int = Field(description="Entries in the task stream, including the ones being processed by workers.")
+    pending: int = Field(description="Entries delivered to a worker, but not acknowledged yet.")
+    lag: Optional[int] = Field(description="Entries not delivered to any worker yet. Unavailable on Redis versions older than 7.", default=None)
+    consumers: int = Field(description="Workers that have read from the queue since it was created.")
+    dead_letter_length: int = Field(description="Tasks given up on after too many retries.")
+    waiting: int = Field(description="Tasks waiting in the per-user queues.", default=0)
+    users: List[UserQueueStats] = Field(description="Users with waiting or running tasks. Users with waiting tasks come first, in the order they are served next.", default_factory=list)
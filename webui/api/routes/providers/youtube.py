@@ -1,11 +1,15 @@
 from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, Query, status
 from fastapi.responses import RedirectResponse, HTMLResponse
+from redis.asyncio import Redis
 
 from api.services.oauth2_linking.youtube_oauth2_handler import YouTubeOAuth2Handler, get_youtube_oauth2_handler
 from api.core.context import RequestContext, get_request_context
 from api.services.providers.base_provider import BaseProvider
 from api.services.providers.provider_factory import get_provider_in_route
+from api.core.redis import get_redis
+from api.drivers.youtube.quota import QuotaLedger
+from api.models.quota import YouTubeQuotaUsage
 
 router = APIRouter(
     prefix="/providers/youtube",
@@ -94,4 +98,26 @@ async def unlink(
 
     return await provider.handle_account_unlink(
         user=request_context.user
-    )
\ No newline at end of file
+    )
+
+@router.get(
+    path="/quota",
+    summary="Inspect the YouTube API quota",
+    operation_id="getYouTubeQuotaUsage",
+    name="youtube:quota",
+)
+async def quota(
+    request_context: Annotated[RequestContext, Depends(get_request_context)],
+    redis: Annotated[Redis, Depends(get_redis)]
+) -> YouTubeQuotaUsage:
+    """
+    Returns how much of the daily YouTube Data API quota is left and when it resets.
+
+    The quota is shared by every user of this instance. Searches are sent to a quota free fallback
+    once it runs low, while other requests (like adding tracks to playlists) keep using the API.
+    Large transfers to YouTube may be worth starting after the reset.
+    """
+
+    return await QuotaLedger(redis).get_usage(
+        user_id=request_context.user.id
+    )
@@ -1,15 +1,17 @@
-from typing import Annotated
+from typing import Annotated, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, Path, Query, Body, status
+from fastapi import APIRouter, Depends, Header, Path, Query, Body, status
+from fastapi.responses import StreamingResponse
 
 from api.models.track import TrackRead, TrackMatchCreate
 from api.models.search import SearchParamsBase
-from api.models.task import PlaylistTaskCreate, PlaylistTaskStatus
+from api.models.task import PlaylistTaskCreate, PlaylistTaskStatus, TaskQueueStats
 from api.core.security import oauth2_scheme
 from api.services.track_matching_service import TrackMatchingService, get_track_matching_service
-from api.core.context import RequestContext, get_request_context
+from api.core.context import RequestContext, get_request_context, get_streaming_request_context
 from api.services.task_service import TaskService, get_task_service
 from api.models.collection import Collection
+from api.workers.utils.events import stream_task_events
 
 router = APIRouter(
     prefix="/tasks",
@@ -101,6 +103,68 @@ async def all_tasks(
         user=request_context.user
     )
 
+@router.get(
+    path="/events",
+    summary="Stream changes to tasks",
+    operation_id="streamTaskEvents",
+    name="tasks:task_events",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"text/event-stream": {}},
+            "description": "A stream of Server-Sent Events.",
+        }
+    },
+)
+async def task_events(
+    request_context: Annotated[RequestContext, Depends(get_streaming_request_context)],
+    last_event_id: Annotated[Optional[str], Header()] = None,
+) -> StreamingResponse:
+    """
+    Streams changes to the authenticated user's tasks as Server-Sent Events, so clients don't have to poll.
+
+    Every `task` event carries the ID of the task, the type of change (`created`, `updated` or `deleted`)
+    and only the fields that changed. `created` events carry the whole task.
+
+    Send the `Last-Event-ID` header to resume after a dropped connection. If the missed events are no longer
+    available, a `reset` event is sent first, and clients should reload every task.
+    """
+
+    return StreamingResponse(
+        content=stream_task_events(request_context.user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+@router.get(
+    path="/queue",
+    responses={
+        status.HTTP_403_FORBIDDEN: {
+            "description": "The authenticated user is not an admin."
+        },
+    },
+    summary="Inspect the task queue",
+    operation_id="getTaskQueueStats",
+    name="tasks:queue_stats",
+)
+async def queue_stats(
+    request_context: Annotated[RequestContext, Depends(get_request_context)],
+    service: Annotated[TaskService, Depends(get_task_service)],
+) -> TaskQueueStats:
+    """
+    Returns how many tasks are waiting in the queue, how many are being processed by workers,
+    and how many were given up on after their workers stopped responding too many times.
+
+    Only admins can access this endpoint.
+    """
+
+    return await service.compile_queue_stats_for_admin_use(
+        caller_user=request_context.user
+    )
+
 @router.delete(
     path="/{task_id}/cancel",
     responses={
@@ -1,5 +1,6 @@
-from typing import Union
-from tunesynctool.drivers import AsyncWrappedServiceDriver
+from typing import Optional, Union
+from tunesynctool.drivers import AsyncWrappedServiceDriver, FakeDriverBehavior
+from tunesynctool.drivers.common.fake.catalog import FakeCatalog
 from tunesynctool.models import Configuration
 from google.oauth2.credentials import Credentials as GoogleCredentials
 from fastapi import HTTPException
@@ -15,6 +16,9 @@ from api.models.user import User
 from api.exceptions.auth import OAuthTokenRefreshError
 from api.drivers.cached.async_cached_driver import AsyncCachedDriver
 
+# Generated once and shared by every fake driver of the process, so playlists created by one task can be read by the next.
+_fake_catalog: Optional[FakeCatalog] = None
+
 class ServiceDriverFactory:
     """
     Includes methods to initialize service drivers.
@@ -32,6 +36,8 @@ class ServiceDriverFactory:
                 return config.DISABLE_GOOGLE_PROVIDER
             case "subsonic":
                 return config.DISABLE_SUBSONIC_PROVIDER
+            case "fake":
+                return not config.ENABLE_FAKE_PROVIDER
             case _:
                 return False
 
@@ -45,6 +51,9 @@ class ServiceDriverFactory:
             logger.warning(error_message)
             raise ValueError(f"User error: {error_message}")
 
+        if self.provider_name == "fake":
+            return self._create_fake_driver()
+
         credentials = await self.credentials_service.get_service_credentials(
             user=user,
             service_name=self.provider_name
@@ -67,7 +76,8 @@ class ServiceDriverFactory:
         match self.provider_name:
             case "youtube":
                 return AsyncCachedDriver(driver(
-                    google_credentials=config
+                    google_credentials=config,
+                    user_id=user.id
                 ))
             case "spotify":
                 return AsyncCachedDriver(driver(
@@ -79,6 +89,22 @@ class ServiceDriverFactory:
                     config=config
                 ))
 
+    def _create_fake_driver(self) -> AsyncWrappedServiceDriver:
+        """
+        Returns a fake driver that behaves roughly like Spotify. It needs no credentials.
+        """
+
+        global _fake_catalog
+
+        behavior = FakeDriverBehavior.spotify_like(service_name=self.provider_name)
+        if _fake_catalog is None:
+            _fake_catalog = FakeCatalog(behavior)
+
+        return AsyncCachedDriver(get_driver_by_name(self.provider_name)(
+            behavior=behavior,
+            catalog=_fake_catalog
+        ))
+
     async def _get_config(self, user: User, credentials: ServiceCredentials) -> Configuration:
         match self.provider_name:
             case "deezer":
@@ -0,0 +1,30 @@
+from typing import Annotated
+from fastapi import Depends
+
+from api.services.providers.base_provider import BaseProvider
+from api.services.credentials_service import CredentialsService, get_credentials_service
+from api.models.entity import EntityAssetsBase
+
+class FakeProvider(BaseProvider):
+    """
+    Provider for load testing, only usable when ENABLE_FAKE_PROVIDER is set.
+    """
+
+    def __init__(self, credentials_service):
+        super().__init__(
+            credentials_service=credentials_service,
+            provider_name="fake"
+        )
+
+    async def get_track_assets(self, track, user):
+        # Generated tracks have no cover art
+        return EntityAssetsBase(
+            cover_image=None
+        )
+
+def get_fake_provider(
+    credentials_service: Annotated[CredentialsService, Depends(get_credentials_service)]
+) -> FakeProvider:
+    return FakeProvider(
+        credentials_service=credentials_service
+    )
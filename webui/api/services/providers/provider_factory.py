@@ -6,6 +6,7 @@ from api.services.providers.spotify_provider import get_spotify_provider
 from api.services.providers.youtube_provider import get_youtube_provider
 from api.services.providers.deezer_provider import get_deezer_provider
 from api.services.providers.subsonic_provider import get_subsonic_provider
+from api.services.providers.fake_provider import get_fake_provider
 from api.services.credentials_service import CredentialsService, get_credentials_service
 
 class ProviderFactory:
@@ -13,7 +14,8 @@ class ProviderFactory:
         "youtube": get_youtube_provider,
         "spotify": get_spotify_provider,
         "deezer": get_deezer_provider,
-        "subsonic": get_subsonic_provider
+        "subsonic": get_subsonic_provider,
+        "fake": get_fake_provider # refuses to create drivers unless ENABLE_FAKE_PROVIDER is set
     }
 
     @staticmethod
@@ -1,16 +1,21 @@
-from typing import AsyncGenerator, List, Optional
+from typing import AsyncGenerator, List, Optional, Tuple
 import uuid
 from fastapi import HTTPException, status
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import WatchError
 import time
 
-from api.models.task import PlaylistTaskProgress, PlaylistTaskStatus, PlaylistTaskCreate, TaskStatus, TaskKind
+from api.models.task import PlaylistTaskProgress, PlaylistTaskStatus, PlaylistTaskCreate, TaskQueueStats, TaskStatus, TaskKind
 from api.models.user import User
 from api.core.redis import get_redis_instance
 from api.models.collection import Collection
 from api.core.logging import logger
-from api.workers.utils.keys import make_task_key, make_user_tasks_pattern, make_task_queue_name, make_kind_agnostic_user_task_pattern
-from api.workers.utils.constants import TTL_QUEUED, TTL_FINISHED, SCAN_COUNT
+from api.workers.utils.keys import make_task_key, make_task_progress_key, make_task_index_keys, make_user_tasks_index_key, make_active_tasks_index_key
+from api.workers.utils.serialization import serialize_task, deserialize_task, load_task, load_tasks, delete_task_keys, add_task_event
+from api.workers.utils.queue import enqueue_task, get_queue_stats
+from api.workers.utils.cancellation import publish_task_cancellation
+from api.workers.utils.constants import TTL_QUEUED, TTL_FINISHED, TASK_INDEX_RETENTION
 from api.models.system import Initiator
 
 _ACTIVE_STATUSES = [TaskStatus.RUNNING, TaskStatus.QUEUED, TaskStatus.ON_HOLD]
@@ -39,13 +44,24 @@ class TaskService:
             queued_at=timestamp
         )
 
-        await self.redis.set(
-            name=redis_key,
-            value=job.model_dump_json(),
-            ex=TTL_QUEUED
-        )
+        task_fields, progress_fields = serialize_task(job)
+        progress_key = make_task_progress_key(redis_key)
+        active_index_key, user_index_key, kind_index_key = make_task_index_keys(redis_key)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(redis_key, mapping=task_fields)
+            pipe.expire(redis_key, TTL_QUEUED)
+            pipe.hset(progress_key, mapping=progress_fields)
+            pipe.expire(progress_key, TTL_QUEUED)
+
+            for index_key in (user_index_key, kind_index_key):
+                pipe.zadd(index_key, {redis_key: timestamp})
+                pipe.zremrangebyscore(index_key, "-inf", timestamp - TASK_INDEX_RETENTION)
 
-        await self.redis.rpush(make_task_queue_name(), redis_key)
+            pipe.sadd(active_index_key, redis_key)
+            add_task_event(pipe, redis_key, "created", task_fields, progress_fields)
+            enqueue_task(pipe, redis_key)
+            await pipe.execute()
         
         logger.info(f"[task:{task_id}] Created new playlist transfer task for user {user.id}")
 
@@ -61,29 +77,24 @@ class TaskService:
         :return: PlaylistTaskStatus or None if not found
         """
         redis_key = make_task_key(TaskKind.USER_INITIATED_PLAYLIST_TRANSFER, user.id, task_id)
-        task = await self.redis.get(redis_key)
-        
-        if task is None:
-            return None
 
-        return PlaylistTaskStatus.model_validate_json(task)
+        return await load_task(self.redis, redis_key)
 
     async def get_all_tasks_for_user(self, user: User) -> List[PlaylistTaskStatus]:
         """
         Retrieves all tasks that belong to the given user, ignoring their kind, age or status.
+        Newest tasks come first.
         """
 
-        tasks = []
-        pattern = make_user_tasks_pattern(user.id)
+        index_key = make_user_tasks_index_key(user.id)
+        keys = await self.redis.zrevrange(index_key, 0, -1)
+        loaded = await load_tasks(self.redis, keys)
 
-        async for key in self.redis.scan_iter(pattern, count=SCAN_COUNT):
-            raw = await self.redis.get(key)
-        
-            if raw:
-                task = PlaylistTaskStatus.model_validate_json(raw)
-                tasks.append(task)
+        expired_keys = [key for key, task in zip(keys, loaded) if task is None]
+        if len(expired_keys) > 0:
+            await self.redis.zrem(index_key, *expired_keys)
 
-        return tasks
+        return [task for task in loaded if task is not None]
     
     async def handle_compiling_tasks_for_user(self, user: User) -> Collection[PlaylistTaskStatus]:
         """
@@ -96,7 +107,7 @@ class TaskService:
 
     async def dispatch_task_cancellation(self, task_id: uuid.UUID, user: User) -> None:
         """
-        Marks a task as cancelled. The worker will detect this and stop processing.
+        Marks a task as cancelled. The worker running it is notified and stops processing.
 
         Only active tasks are affected; terminal tasks are left untouched so they
         remain in the user's history. A non-existent task raises 404.
@@ -120,15 +131,15 @@ class TaskService:
         keys = await self._resolve_task_keys(user.id, task_id, verb="cancel")
 
         for key in keys:
-            task = await self._get_task(key)
-            if task is None or task.status not in _ACTIVE_STATUSES:
+            if not await self.redis.exists(key):
                 continue
 
             await self.update_task_status(
                 key=key,
                 new_status=TaskStatus.CANCELED,
                 initiator=initiator,
-                reason=reason
+                reason=reason,
+                expected_statuses=_ACTIVE_STATUSES
             )
 
     async def delete_task(self, task_id: uuid.UUID, user: User, initiator: Initiator, reason: Optional[str] = None) -> None:
@@ -146,44 +157,27 @@ class TaskService:
             logger.warning(f"[task:{task_id}] Multiple Redis keys matched for this task. All will be deleted.")
 
         for key in keys:
-            task = await self._get_task(key)
-            if task is None:
+            if not await self.redis.exists(key):
                 continue
 
-            if task.status in _ACTIVE_STATUSES:
-                await self.update_task_status(
-                    key=key,
-                    new_status=TaskStatus.MARKED_FOR_DELETION,
-                    initiator=initiator,
-                    reason=reason,
-                )
-            else:
-                await self.redis.delete(key)
-                logger.info(f"Deleted terminal task ({task_id}) for user {user.id}. {initiator.value} initiated. Reason: {reason or '(unspecified)'}")
+            await self._delete_or_mark_task(key, initiator, reason)
 
-    async def _get_all_keys_for_pattern(self, pattern: str) -> List[str]:
+    async def _delete_or_mark_task(self, key: str, initiator: Initiator, reason: Optional[str] = None) -> None:
         """
-        Returns all Redis keys that match the pattern supplied.
+        Marks an active task for deletion, or deletes it right away if it is terminal.
         """
 
-        keys = []
-
-        async for key in self.redis.scan_iter(match=pattern, count=SCAN_COUNT):
-            keys.append(key)
-
-        return keys
-
-    async def _get_task(self, key: str) -> Optional[PlaylistTaskStatus]:
-        """
-        Returns the task if it exists, or None if it doesn't.
-        """
-
-        raw = await self.redis.get(key)
-
-        if raw:
-            return PlaylistTaskStatus.model_validate_json(raw)
+        marked = await self.update_task_status(
+            key=key,
+            new_status=TaskStatus.MARKED_FOR_DELETION,
+            initiator=initiator,
+            reason=reason,
+            expected_statuses=_ACTIVE_STATUSES
+        )
 
-        return None
+        if marked is None:
+            await delete_task_keys(self.redis, key)
+            logger.info(f"Deleted terminal task behind Redis key \"{key}\". {initiator.value} initiated. Reason: {reason or '(unspecified)'}")
 
     async def _resolve_task_keys(self, user_id: int, task_id: uuid.UUID, verb: str) -> List[str]:
         """
@@ -196,45 +190,121 @@ class TaskService:
         :param verb: Infinitive used in the 404 log (e.g. "cancel", "delete").
         """
 
-        pattern = make_kind_agnostic_user_task_pattern(user_id, str(task_id))
-        keys = await self._get_all_keys_for_pattern(pattern)
+        candidates = [make_task_key(kind, user_id, str(task_id)) for kind in TaskKind]
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in candidates:
+                pipe.exists(key)
+
+            exists = await pipe.execute()
+
+        keys = [key for key, found in zip(candidates, exists) if found]
 
         if len(keys) == 0:
             self._raise_404_task_not_found(f"Attempted to {verb} a non-existent task with ID {task_id}.")
 
         return keys
 
-    async def update_task_status(self, key: str, new_status: TaskStatus, initiator: Initiator, reason: Optional[str] = None) -> PlaylistTaskStatus:
+    async def update_task_status(
+        self,
+        key: str,
+        new_status: TaskStatus,
+        initiator: Initiator,
+        reason: Optional[str] = None,
+        expected_statuses: Optional[List[TaskStatus]] = None
+    ) -> Optional[PlaylistTaskStatus]:
         """
         Updates a task's status.
 
         - If the new status signals that the execution of the task ended (regardless of the actual ending type) then the task's done_at field is set to the current time.
         - Likewise, if the new status signals that the execution of the task hasn't ended (regardless of the actual status), the done_at field is cleared to avoid confusion.
         - If the reason is `None`, the task's status_reason field will be left as is, instead of being cleared.
+        - If `expected_statuses` is given, the task is only updated while its current status is one of them.
+
+        The update is a compare-and-set (WATCH/MULTI), so it is retried instead of overwriting a concurrent write by a worker.
 
-        Returns the updated task after commiting the changes.
+        Returns the updated task after commiting the changes, or None if the task wasn't in one of the expected statuses.
         """
 
-        task = await self._get_task(key)
+        progress_key = make_task_progress_key(key)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    task, is_legacy = await self._load_watched_task(pipe, key, progress_key)
+
+                    if task is None:
+                        self._raise_404_task_not_found(f"Cannot update the status for task. No match for Redis key \"{key}\".")
+
+                    if expected_statuses is not None and task.status not in expected_statuses:
+                        await pipe.unwatch()
+                        return None
 
-        if task is None:
-            self._raise_404_task_not_found(f"Cannot update the status for task. No match for Redis key \"{key}\".")
+                    task.status = new_status
 
-        task.status = new_status
+                    if new_status in [TaskStatus.CANCELED, TaskStatus.FAILED, TaskStatus.FINISHED, TaskStatus.MARKED_FOR_DELETION]:
+                        task.done_at = int(time.time())
+                    else:
+                        task.done_at = None
 
-        if new_status in [TaskStatus.CANCELED, TaskStatus.FAILED, TaskStatus.FINISHED, TaskStatus.MARKED_FOR_DELETION]:
-            task.done_at = int(time.time())
-        else:
-            task.done_at = None
+                    if reason:
+                        task.status_reason = reason
 
-        if reason:
-            task.status_reason = reason
+                    pipe.multi()
+
+                    if is_legacy:
+                        # Convert tasks stored as a JSON string by older versions.
+                        task_fields, progress_fields = serialize_task(task)
+                        pipe.delete(key)
+                        pipe.hset(progress_key, mapping=progress_fields)
+                    else:
+                        task_fields, _ = serialize_task(task)
+                        task_fields = {name: task_fields[name] for name in ("status", "status_reason", "done_at")}
+                        progress_fields = None
+
+                    pipe.hset(key, mapping=task_fields)
+                    pipe.expire(key, TTL_FINISHED)
+                    pipe.expire(progress_key, TTL_FINISHED)
+
+                    # Tasks marked for deletion stay active until a worker (or recovery) removes them.
+                    if new_status in [TaskStatus.CANCELED, TaskStatus.FAILED, TaskStatus.FINISHED]:
+                        pipe.srem(make_active_tasks_index_key(), key)
+                    else:
+                        pipe.sadd(make_active_tasks_index_key(), key)
+
+                    add_task_event(pipe, key, "updated", task_fields, progress_fields)
+
+                    if new_status in [TaskStatus.CANCELED, TaskStatus.MARKED_FOR_DELETION]:
+                        publish_task_cancellation(pipe, key)
+
+                    await pipe.execute()
+                    break
+                except WatchError:
+                    logger.debug(f"Task behind Redis key \"{key}\" changed while updating its status, retrying.")
+                    continue
 
-        await self.redis.set(key, task.model_dump_json(), ex=TTL_FINISHED)
         logger.info(f"Updated task ({task.task_id}). This was a {initiator.value} initiated action. Reasoning: {reason or "(unspecified)"}")
 
         return task
             
+    async def _load_watched_task(self, pipe: Pipeline, key: str, progress_key: str) -> Tuple[Optional[PlaylistTaskStatus], bool]:
+        """
+        Loads a task through a pipeline that is watching it.
+
+        Returns the task (or None if it doesn't exist) and whether it is still stored as a legacy JSON string.
+        """
+
+        match await pipe.type(key):
+            case "hash":
+                fields = await pipe.hgetall(key)
+                progress_fields = await pipe.hgetall(progress_key)
+                return deserialize_task(fields, progress_fields), False
+            case "string":
+                return PlaylistTaskStatus.model_validate_json(await pipe.get(key)), True
+            case _:
+                return None, False
+
     def _raise_404_task_not_found(self, log_message: Optional[str]) -> None:
         if log_message:
             logger.info(log_message)
@@ -252,15 +322,20 @@ class TaskService:
         MARKED_FOR_DELETION for the worker to clean up.
         """
 
-        tasks = await self.get_all_tasks_for_user(user)
+        keys = await self.redis.zrange(make_user_tasks_index_key(user.id), 0, -1)
+        tasks = await load_tasks(self.redis, keys)
 
-        for task in tasks:
-            await self.delete_task(
-                task_id=task.task_id,
-                user=user,
-                initiator=initiator,
-                reason=reason,
-            )
+        terminal_keys = []
+
+        for key, task in zip(keys, tasks):
+            if task is not None and task.status in _ACTIVE_STATUSES:
+                await self._delete_or_mark_task(key, initiator, reason)
+            else:
+                terminal_keys.append(key)
+
+        if len(terminal_keys) > 0:
+            await delete_task_keys(self.redis, *terminal_keys)
+            logger.info(f"Deleted {len(terminal_keys)} terminal task(s) for user {user.id}. {initiator.value} initiated. Reason: {reason or '(unspecified)'}")
 
     async def dispatch_task_deletion(self, task_id: uuid.UUID, user: User) -> None:
         """
@@ -277,6 +352,19 @@ class TaskService:
             reason="User requested deletion."
         )
 
+    async def compile_queue_stats_for_admin_use(self, caller_user: User) -> TaskQueueStats:
+        """
+        Returns the current state of the task queue. Only available to admins.
+        """
+
+        if not caller_user.is_admin:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You lack the required permissions to inspect the task queue"
+            )
+
+        return await get_queue_stats(self.redis)
+
 async def get_task_service() -> AsyncGenerator[TaskService, None]:
     redis = get_redis_instance()
     try:
@@ -0,0 +1,72 @@
+"""
+Standalone worker process.
+
+Consumes the same Redis queue as the workers embedded in the API, so any number of
+these can run next to the API (or on other machines) to add capacity.
+
+Usage: python -m api.workers --concurrency 3
+"""
+
+from argparse import ArgumentParser
+import asyncio
+import signal
+
+from api.core.database import engine
+from api.core.logging import logger
+from api.workers.dispatcher import worker_dispatcher
+from api.workers.recovery import run_startup_recovery
+
+async def run_workers(concurrency: int) -> None:
+    """
+    Run the given number of workers until the process receives SIGINT or SIGTERM.
+
+    :param concurrency: Number of tasks processed in parallel by this process
+    """
+
+    logger.info("Starting worker process...")
+
+    await run_startup_recovery()
+
+    stop_event = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    logger.info(f"Starting {concurrency} background workers...")
+    worker_tasks = [asyncio.create_task(worker_dispatcher(i)) for i in range(concurrency)]
+
+    await stop_event.wait()
+
+    logger.info("Shutting down worker process...")
+
+    for task in worker_tasks:
+        task.cancel()
+
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+    await engine.dispose()
+
+    logger.info("Worker process shutdown complete")
+
+def main() -> None:
+    parser = ArgumentParser(
+        prog="python -m api.workers",
+        description="Process queued tunesynctool tasks outside of the API process."
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=3,
+        help="Number of tasks processed in parallel by this process (default: 3)"
+    )
+
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    asyncio.run(run_workers(args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
+from datetime import datetime, timezone
+from enum import StrEnum
 from redis.exceptions import TimeoutError as RedisTimeoutError
+from tunesynctool.exceptions import RateLimitException
 import asyncio
+import math
+import os
+import socket
 import time
 from typing import Optional, Tuple
 
@@ -8,76 +14,119 @@ from api.core.redis import get_redis_instance
 from api.models.task import PlaylistTaskStatus, TaskStatus, TaskKind
 from api.models.user import User
 from api.workers.handlers.playlist_transfer_handler import handle_playlist_transfer
-from api.workers.utils.task_status import report_task_on_hold, report_task_failure, save_task
+from api.workers.utils.task_status import report_task_failure, save_task, check_if_task_is_dormant
 from api.services.user_service import UserService
 from api.services.task_service import get_task_service
 from api.core.database import get_session_instance
-from api.workers.utils.keys import (
-    parse_task_key,
-    make_task_queue_name
+from api.workers.utils.keys import parse_task_key
+from api.workers.utils.constants import QUEUE_MAX_RETRIES, THROTTLE_DEFAULT_DELAY, THROTTLE_SHORT_DELAY, THROTTLE_MAX_DELAY, TTL_QUEUED
+from api.workers.utils.queue import (
+    QueueEntry,
+    ensure_consumer_group,
+    claim_stalled_entry,
+    dequeue_next_entry,
+    wait_for_doorbell,
+    acknowledge_entry,
+    requeue_entry,
+    dead_letter_entry,
+    get_task_providers,
+    claim_task_slots,
+    release_task_slots
 )
 from api.workers.utils.context import WorkerContext
+from api.workers.utils.checkpoint import extend_checkpoint
+from api.workers.utils.cancellation import cancellation_listener
+from api.workers.utils.serialization import load_task, delete_task_keys
 from api.workers.utils.heartbeat import start_heartbeat_loop, stop_heartbeat
 
-async def fetch_next_task(ctx: WorkerContext) -> Optional[Tuple[str, str, int, str]]:
+async def fetch_next_task(ctx: WorkerContext) -> Optional[Tuple[QueueEntry, str, int, str]]:
     """
-    Wait for and fetch the next task from the queue.
+    Fetch the next task from the queue, or wait for one to be queued if there is nothing to do.
+    Tasks whose worker stopped responding are taken over before new ones are scheduled.
     
-    :return: Tuple of (redis_key, task_kind, user_id, task_uuid) or None if no task available
+    :return: Tuple of (queue entry, task_kind, user_id, task_uuid) or None if no task available
     """
 
     try:
-        next_in_queue = await ctx.redis.blpop(
-            make_task_queue_name(),
-            timeout=5
-        )
+        entry = await claim_stalled_entry(ctx.redis, ctx.worker_name)
+        if not entry:
+            entry = await dequeue_next_entry(ctx.redis, ctx.worker_name)
+        if not entry:
+            await wait_for_doorbell(ctx.redis)
+            return None
     except RedisTimeoutError:
         logger.error(f"[{ctx.worker_name}] Redis queue poll timed out. Make sure Redis is running and reachable by the tunesynctool API. Without it, core features won't work.")
         return None
 
-    if not next_in_queue:
+    if not entry:
         return None
 
-    redis_key = next_in_queue[1]
-
     try:
-        task_kind, user_id, task_uuid = parse_task_key(redis_key)
+        task_kind, user_id, task_uuid = parse_task_key(entry.redis_key)
     except ValueError as e:
-        logger.error(f"[{ctx.worker_name}] Invalid task key format: {redis_key}. Error: {e}")
+        logger.error(f"[{ctx.worker_name}] Invalid task key format: {entry.redis_key}. Error: {e}")
+        await acknowledge_entry(ctx.redis, entry.entry_id)
         return None
 
-    return redis_key, task_kind, user_id, task_uuid
+    return entry, task_kind, user_id, task_uuid
 
-async def load_and_validate_task(ctx: WorkerContext, redis_key: str, task_uuid: str) -> Optional[PlaylistTaskStatus]:
+async def load_and_validate_task(ctx: WorkerContext, entry: QueueEntry, task_uuid: str) -> Optional[PlaylistTaskStatus]:
     """
     Load task from Redis and validate its status.
     
     :return: The task if valid, None otherwise
     """
 
-    unparsed_task = await ctx.redis.get(redis_key)
-    if not unparsed_task:
+    redis_key = entry.redis_key
+
+    task = await load_task(ctx.redis, redis_key)
+    if not task:
         logger.warning(f"[{ctx.worker_name}][task:{task_uuid}] Task data not found in Redis (may have expired or been cancelled)")
         return None
 
-    task = PlaylistTaskStatus.model_validate_json(unparsed_task)
-
     if task.status == TaskStatus.CANCELED:
         logger.info(f"[{ctx.worker_name}][task:{task_uuid}] Task was cancelled before pickup, skipping")
         return None
 
     if task.status == TaskStatus.MARKED_FOR_DELETION:
         logger.info(f"[{ctx.worker_name}][task:{task_uuid}] Task was marked for deletion before pickup, removing")
-        await ctx.redis.delete(redis_key)
+        await delete_task_keys(ctx.redis, redis_key)
         return None
 
+    if entry.redelivered:
+        return await prepare_task_retry(ctx, task, entry, task_uuid)
+
     if task.status != TaskStatus.QUEUED:
         logger.warning(f"[{ctx.worker_name}][task:{task_uuid}] Task status is {task.status}, expected QUEUED. Skipping.")
         return None
 
     return task
 
-async def mark_task_running(ctx: WorkerContext, task: PlaylistTaskStatus, redis_key: str, task_uuid: str) -> bool:
+async def prepare_task_retry(ctx: WorkerContext, task: PlaylistTaskStatus, entry: QueueEntry, task_uuid: str) -> Optional[PlaylistTaskStatus]:
+    """
+    Count a redelivery of a task whose previous worker stopped responding,
+    or give up on it once it was retried too many times.
+
+    :return: The task if it should be retried, None otherwise
+    """
+
+    if task.status not in (TaskStatus.QUEUED, TaskStatus.RUNNING, TaskStatus.ON_HOLD):
+        logger.info(f"[{ctx.worker_name}][task:{task_uuid}] Reclaimed task is already {task.status}. Skipping.")
+        return None
+
+    if task.retry_count >= QUEUE_MAX_RETRIES:
+        reason = f"Gave up after {task.retry_count} retries. The worker processing this task stopped responding every time."
+
+        await report_task_failure(ctx.redis, task, entry.redis_key, reason)
+        await dead_letter_entry(ctx.redis, entry, task.retry_count, reason)
+        return None
+
+    task.retry_count += 1
+    logger.warning(f"[{ctx.worker_name}][task:{task_uuid}] Worker {task.worker_id} stopped responding, retrying task ({task.retry_count}/{QUEUE_MAX_RETRIES})")
+
+    return task
+
+async def mark_task_running(ctx: WorkerContext, task: PlaylistTaskStatus, entry: QueueEntry, task_uuid: str) -> bool:
     """
     Mark a task as running and set initial heartbeat.
 
@@ -88,8 +137,10 @@ async def mark_task_running(ctx: WorkerContext, task: PlaylistTaskStatus, redis_
     task.started_at = int(time.time())
     task.worker_id = ctx.worker_name
     task.last_heartbeat = int(time.time())
+    task.queue_entry_id = entry.entry_id
+    task.not_before = None
 
-    if await save_task(ctx.redis, task, redis_key, status=TaskStatus.RUNNING, use_finished_ttl=False):
+    if await save_task(ctx.redis, task, entry.redis_key, status=TaskStatus.RUNNING, use_finished_ttl=False):
         logger.info(f"[{ctx.worker_name}][task:{task_uuid}] Status: QUEUED -> RUNNING")
         return True
 
@@ -125,72 +176,192 @@ async def dispatch_task(ctx: WorkerContext, task_kind: str, task: PlaylistTaskSt
                 task=task, 
                 user=user, 
                 redis=ctx.redis,
-                redis_key=redis_key
+                redis_key=redis_key,
+                dormant=ctx.dormant
             )
         case _:
             logger.error(f"[{ctx.worker_name}][task:{task.task_id}] Unrecognized task type: {task_kind}")
             await report_task_failure(ctx.redis, task, redis_key, f"Unknown task type: {task_kind}")
 
-async def process_single_task(ctx: WorkerContext) -> bool:
-    """ 
-    Process a single task from the queue.
-    
-    :return: True if a task was processed, False if queue was empty
+class TaskOutcome(StrEnum):
+    """
+    Describes what happened to the queue entry a worker read.
     """
 
-    result = await fetch_next_task(ctx)
-    if not result:
-        return False
-
-    redis_key, task_kind, user_id, task_uuid = result
-    ctx.current_redis_key = redis_key
-
-    logger.info(f"[{ctx.worker_name}][task:{task_uuid}] Picked up task from queue")
+    EMPTY = "empty"
+    SKIPPED = "skipped"
+    COMPLETED = "completed"
+    THROTTLED = "throttled"
+    ABANDONED = "abandoned"
+    """Another worker took over the entry while the task ran."""
 
-    task = await load_and_validate_task(ctx, redis_key, task_uuid)
-    if not task:
-        ctx.current_redis_key = None
-        return True
+async def run_task(ctx: WorkerContext, task_kind: str, task: PlaylistTaskStatus, user_id: int, task_uuid: str) -> TaskOutcome:
+    """
+    Run a task that was marked running, keeping its heartbeat up until it is done.
 
-    ctx.current_task = task
-    if not await mark_task_running(ctx, task, redis_key, task_uuid):
-        ctx.current_task = None
-        ctx.current_redis_key = None
-        return True
+    If a provider rate limits the task, it is put back in the queue right away, and the scheduler holds it back
+    for as long as the provider asked. The worker and the task's running slots are free for other tasks meanwhile.
+    Progress is kept by the task's checkpoint.
+    """
 
     ctx.heartbeat_task = asyncio.create_task(start_heartbeat_loop(ctx))
 
     try:
         user = await get_task_user(ctx, user_id, task_uuid)
         if not user:
-            await report_task_failure(ctx.redis, task, redis_key, "User not found.")
-            return True
+            await report_task_failure(ctx.redis, task, ctx.current_redis_key, "User not found.")
+            return TaskOutcome.COMPLETED
 
-        await dispatch_task(ctx, task_kind, task, user, redis_key)
+        # Runs as a task of its own, so that the heartbeat can stop it if another worker takes the task over
+        ctx.handler_task = asyncio.create_task(dispatch_task(ctx, task_kind, task, user, ctx.current_redis_key))
+
+        try:
+            await ctx.handler_task
+        except asyncio.CancelledError:
+            # Unless the worker itself is shutting down, the heartbeat stopped the handler
+            if not ctx.claim_lost or asyncio.current_task().cancelling() > 0:
+                raise
+
+        if ctx.claim_lost:
+            logger.warning(f"[{ctx.worker_name}][task:{task_uuid}] Stopped the task, another worker runs it now")
+            return TaskOutcome.ABANDONED
+
+        # Removes the task if it was marked for deletion while it ran.
+        await check_if_task_is_dormant(ctx.redis, ctx.current_redis_key)
+        return TaskOutcome.COMPLETED
+    except RateLimitException as e:
+        if ctx.claim_lost:
+            return TaskOutcome.ABANDONED
+
+        delay = min(e.retry_after or THROTTLE_DEFAULT_DELAY, THROTTLE_MAX_DELAY)
+        logger.warning(f"[{ctx.worker_name}][task:{task_uuid}] Rate limited by a provider, putting it back in the queue for {delay}s")
+
+        task.not_before = int(time.time()) + math.ceil(delay)
+
+        # Waiting for an exhausted quota to reset can take hours, so the user is told until when
+        if delay > THROTTLE_SHORT_DELAY:
+            resumes_at = datetime.fromtimestamp(task.not_before, tz=timezone.utc)
+            status_reason = f"{e} Will resume at {resumes_at:%H:%M} UTC."
+        else:
+            status_reason = f"{e} Will resume shortly."
+
+        # The task and its checkpoint have to outlive the wait
+        ttl = TTL_QUEUED + math.ceil(delay)
+
+        requeued = await save_task(
+            redis=ctx.redis,
+            task=task,
+            redis_key=ctx.current_redis_key,
+            status=TaskStatus.QUEUED,
+            status_reason=status_reason,
+            ttl=ttl
+        )
+
+        # Cancelled or deleted meanwhile, the entry is just acknowledged
+        if not requeued:
+            return TaskOutcome.COMPLETED
+
+        await extend_checkpoint(ctx.redis, ctx.current_redis_key, ttl)
     finally:
+        ctx.handler_task = None
         await stop_heartbeat(ctx)
-        ctx.current_task = None
-        ctx.current_redis_key = None
 
-    return True
+    # Only once the heartbeat stopped, it would take the acknowledged entry for a lost claim
+    await requeue_entry(ctx.redis, ctx.current_entry, front=False)
+
+    return TaskOutcome.THROTTLED
+
+async def start_task(ctx: WorkerContext, task_kind: str, task: PlaylistTaskStatus, entry: QueueEntry, user_id: int, task_uuid: str) -> TaskOutcome:
+    """
+    Run a validated task, watching it for cancellation until it is done.
+    """
+
+    # The scheduler took the running slots of new tasks. The ones of a taken over task may have expired meanwhile.
+    if entry.redelivered:
+        await claim_task_slots(ctx.redis, entry.redis_key, get_task_providers(task))
+
+    # Watched before the task is marked running, so a cancellation can't slip in between.
+    ctx.dormant = cancellation_listener.watch(entry.redis_key)
+
+    try:
+        if not await mark_task_running(ctx, task, entry, task_uuid):
+            return TaskOutcome.SKIPPED
+
+        return await run_task(ctx, task_kind, task, user_id, task_uuid)
+    finally:
+        cancellation_listener.unwatch(entry.redis_key, ctx.dormant)
+        ctx.dormant = None
+
+async def process_single_task(ctx: WorkerContext) -> TaskOutcome:
+    """ 
+    Process a single task from the queue.
+
+    The queue entry is only acknowledged once the task was handled. If the worker
+    shuts down or dies before that, the task is delivered to another worker.
+    
+    :return: What happened to the entry that was read, if any
+    """
+
+    result = await fetch_next_task(ctx)
+    if not result:
+        return TaskOutcome.EMPTY
+
+    entry, task_kind, user_id, task_uuid = result
+    ctx.current_entry = entry
+    ctx.current_redis_key = entry.redis_key
+    ctx.claim_lost = False
+
+    if entry.redelivered:
+        logger.info(f"[{ctx.worker_name}][task:{task_uuid}] Took over task from a worker that stopped responding")
+    else:
+        logger.info(f"[{ctx.worker_name}][task:{task_uuid}] Picked up task from queue")
+
+    outcome = TaskOutcome.SKIPPED
+
+    try:
+        task = await load_and_validate_task(ctx, entry, task_uuid)
+        if task:
+            ctx.current_task = task
+            outcome = await start_task(ctx, task_kind, task, entry, user_id, task_uuid)
+    finally:
+        # The slots and the entry of a task that was taken over belong to its new worker
+        if not ctx.claim_lost:
+            await release_task_slots(ctx.redis, entry.redis_key)
+
+    # Throttled entries were already put back in the queue.
+    if outcome not in (TaskOutcome.THROTTLED, TaskOutcome.ABANDONED):
+        await acknowledge_entry(ctx.redis, entry.entry_id)
+
+    ctx.current_entry = None
+    ctx.current_task = None
+    ctx.current_redis_key = None
+
+    return outcome
 
 async def handle_shutdown(ctx: WorkerContext) -> None:
     """
     Handle graceful shutdown of the worker.
+
+    The current task is put back in the queue right away, so another worker can pick it up.
     """
 
     logger.info(f"[{ctx.worker_name}] Received shutdown signal")
     
     await stop_heartbeat(ctx)
     
-    if ctx.current_task and ctx.current_redis_key:
-        logger.info(f"[{ctx.worker_name}][task:{ctx.current_task.task_id}] Marking task as ON_HOLD due to shutdown")
-        await report_task_on_hold(
-            redis=ctx.redis,
-            task=ctx.current_task,
-            redis_key=ctx.current_redis_key,
-            reason="Worker shutdown. Task will be retried."
-        )
+    if ctx.current_entry and not ctx.claim_lost:
+        if ctx.current_task and ctx.current_redis_key:
+            logger.info(f"[{ctx.worker_name}][task:{ctx.current_task.task_id}] Putting task back in the queue due to shutdown")
+            await save_task(
+                redis=ctx.redis,
+                task=ctx.current_task,
+                redis_key=ctx.current_redis_key,
+                status=TaskStatus.QUEUED,
+                status_reason="Worker shutdown. Task will be retried.",
+                use_finished_ttl=False
+            )
+
+        await requeue_entry(ctx.redis, ctx.current_entry)
     
     await ctx.redis.aclose()
     logger.info(f"[{ctx.worker_name}] Shutdown complete")
@@ -202,38 +373,59 @@ async def handle_error(ctx: WorkerContext, error: Exception) -> None:
 
     logger.error(f"[{ctx.worker_name}] Unexpected error: {error}", exc_info=True)
     
-    if ctx.current_task and ctx.current_redis_key:
+    if ctx.current_task and ctx.current_redis_key and not ctx.claim_lost:
         try:
             await report_task_failure(ctx.redis, ctx.current_task, ctx.current_redis_key, f"Worker error: {error}")
         except Exception:
             pass
+
+    if ctx.current_entry and not ctx.claim_lost:
+        try:
+            await acknowledge_entry(ctx.redis, ctx.current_entry.entry_id)
+        except Exception:
+            pass
     
     await ctx.redis.aclose()
 
+def make_worker_name(worker_id: int) -> str:
+    """
+    Build a worker name that is unique across every process consuming the queue.
+
+    :param worker_id: Index of the worker within its process
+    """
+
+    return f"{socket.gethostname()}-{os.getpid()}-worker-{worker_id}"
+
 async def worker_dispatcher(worker_id: int) -> None:
     """
     Main worker loop that processes tasks from the Redis queue.
     
-    :param worker_id: Unique identifier for this worker instance
+    :param worker_id: Index of this worker within its process
     """
 
     ctx = WorkerContext(
         worker_id=worker_id,
-        worker_name=f"worker-{worker_id}",
+        worker_name=make_worker_name(worker_id),
         redis=get_redis_instance()
     )
 
     logger.info(f"[{ctx.worker_name}] Starting up...")
 
+    cancellation_listener.attach()
+
     try:
+        await ensure_consumer_group(ctx.redis)
+
+        # Tasks are picked up back to back. Empty reads already waited for new tasks,
+        # and throttled tasks wait in the queue instead of holding up the worker.
         while True:
-            task_processed = await process_single_task(ctx)
-            if task_processed:
-                await asyncio.sleep(1)
-            
+            await process_single_task(ctx)
+
     except asyncio.CancelledError:
         await handle_shutdown(ctx)
         raise
     except Exception as e:
         await handle_error(ctx, e)
         raise
+    finally:
+        await cancellation_listener.detach()
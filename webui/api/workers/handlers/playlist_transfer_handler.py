@@ -1,14 +1,15 @@
-from typing import List, Optional
+from typing import Awaitable, Callable, List, Optional
 from redis.asyncio import Redis
-from tunesynctool.exceptions import PlaylistNotFoundException
-from tunesynctool.features import AsyncTrackMatcher
+from tunesynctool.exceptions import PlaylistNotFoundException, RateLimitException
+from tunesynctool.features import AsyncTrackMatcher, TransferPhase
 from tunesynctool.models.track import Track
 from tunesynctool.utilities.collections import batch
 from tunesynctool.drivers.async_service_driver import AsyncWrappedServiceDriver
 import asyncio
+import time
 from contextlib import AsyncExitStack
 
-from api.models.task import PlaylistTaskStatus
+from api.models.task import PlaylistTaskStatus, TaskStatus
 from api.core.logging import logger
 from api.helpers.mapping import map_track_between_domain_model_and_response_model
 from api.services.providers.provider_factory import ProviderFactory
@@ -16,36 +17,220 @@ from api.services.credentials_service import get_credentials_service
 from api.models.user import User
 from api.core.database import get_session_instance
 from api.models.entity import EntityAssetsBase
+from api.models.track import TrackRead
 from api.services.providers.base_provider import BaseProvider
+from api.workers.utils.constants import MATCH_CONCURRENCY, DEFAULT_MATCH_CONCURRENCY, MATCH_TIMEOUT, PREFETCH_CHUNK_SIZE, PREFETCH_TIMEOUT, PLAYLIST_INSERT_RATE
+from api.workers.utils.progress import ProgressReporter
+from api.workers.utils.checkpoint import TransferCheckpoint, fingerprint_tracks
+from api.workers.utils.rate_limit import get_shared_bucket
+from api.workers.utils.catalog import catalog_registry
 from api.workers.utils.task_status import (
+    save_task,
     report_task_failure,
     report_task_cancellation,
     report_task_on_hold,
     report_task_finished,
     report_task_as_running,
-    check_if_task_is_dormant,
-    save_task,
     sleep_unless_dormant
 )
 
-async def do_current_iteration(
+async def match_track(
+    strategy: Callable[[Track], Awaitable[Optional[Track]]],
+    source_track: Track,
+    semaphore: asyncio.Semaphore,
+    target_provider: BaseProvider
+) -> Optional[Track]:
+    async with semaphore:
+        try:
+            return await asyncio.wait_for(
+                strategy(source_track),
+                timeout=MATCH_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Finding a match for track {source_track.service_id} from {source_track.service_name} at provider {target_provider.provider_name} timed out. Skipping track.")
+            return None
+
+async def prefetch_tracks(
+    task: PlaylistTaskStatus,
+    redis: Redis,
     redis_key: str,
+    tracks: List[Track],
+    matcher: AsyncTrackMatcher,
+    target_provider: BaseProvider,
+    dormant: asyncio.Event
+) -> bool:
+    """
+    Resolves the tracks that already live at the target or carry an ISRC in bulk, before any text search.
+
+    Tracks are looked up PREFETCH_CHUNK_SIZE at a time, so every chunk is cached as soon as it arrives and a
+    cancellation is noticed between chunks. Each chunk reports how far the lookup got through the task's status reason.
+    A chunk that fails or times out is skipped, its tracks are looked up one by one while matching.
+
+    :return: False if the task went dormant meanwhile, True otherwise.
+    """
+
+    for start in range(0, len(tracks), PREFETCH_CHUNK_SIZE):
+        if dormant.is_set():
+            return False
+
+        chunk = tracks[start:start + PREFETCH_CHUNK_SIZE]
+
+        try:
+            await asyncio.wait_for(matcher.prefetch(chunk), timeout=PREFETCH_TIMEOUT)
+        except RateLimitException:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Task {task.task_id} timed out prefetching {len(chunk)} tracks from {target_provider.provider_name}, they will be fetched one by one.")
+        except Exception as e:
+            logger.warning(f"Task {task.task_id} couldn't prefetch {len(chunk)} tracks from {target_provider.provider_name}, they will be fetched one by one. Reason: {e}")
+
+        if not await save_task(
+            redis=redis,
+            task=task,
+            redis_key=redis_key,
+            status=TaskStatus.RUNNING,
+            status_reason=f"Looking up tracks ({min(start + PREFETCH_CHUNK_SIZE, len(tracks))} of {len(tracks)}).",
+            use_finished_ttl=False
+        ):
+            return False
+
+    return True
+
+async def match_tracks(
     task: PlaylistTaskStatus,
     redis: Redis,
+    redis_key: str,
     source_tracks: List[Track],
     matcher: AsyncTrackMatcher,
-    source_track: Track
-) -> Optional[Track]:
+    source_provider: BaseProvider,
+    target_provider: BaseProvider,
+    user: User,
+    checkpoint: TransferCheckpoint,
+    dormant: asyncio.Event
+) -> Optional[List[str]]:
+    """
+    Matches every source track that the checkpoint hasn't handled yet at the target provider.
+
+    Matching runs in two phases, like AsyncTransferPlanner does. The identifier phase prefetches the tracks in bulk
+    and resolves every track it can through strong identifiers (IDs, ISRCs, cached mappings), without searching.
+    Only the tracks it couldn't match are searched for afterwards, so cheap lookups are never stuck behind searches.
+    Up to MATCH_CONCURRENCY matches run at the same time per phase, while results are consumed
+    in playlist order so that progress, the checkpoint and the resulting playlist keep the original order.
+    Track assets are only needed for displaying progress, so they are fetched in the background
+    for the most recently handled track instead of blocking the pipeline.
+    Progress is written through a ProgressReporter, which saves the checkpoint along with the progress.
+    Matching stops as soon as `dormant` is set, or a progress write finds the task dormant.
+
+    :return: IDs of every match in playlist order (including the ones restored from the checkpoint), or None if the task went dormant meanwhile.
+    """
+
+    concurrency = MATCH_CONCURRENCY.get(target_provider.provider_name, DEFAULT_MATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    remaining_tracks = source_tracks[checkpoint.cursor:]
+
+    logger.debug(f"[task:{task.task_id}] Matching {len(remaining_tracks)} tracks with up to {concurrency} concurrent matches.")
+
+    identifiers = TransferPhase(name="identifiers", tracks=len(remaining_tracks))
+    search = TransferPhase(name="search")
+    started_at = time.perf_counter()
+
+    if not await prefetch_tracks(task, redis, redis_key, remaining_tracks, matcher, target_provider, dormant):
+        logger.info(f"Task {task.task_id} was cancelled by user.")
+        return None
+
     await report_task_as_running(
         redis=redis,
         task=task,
         redis_key=redis_key
     )
 
-    task.progress.handled += 1
-    task.progress.in_queue = len(source_tracks) - task.progress.handled
+    task.progress.handled = checkpoint.cursor
+    task.progress.in_queue = len(remaining_tracks)
+
+    identifier_tasks = [
+        asyncio.create_task(match_track(matcher.find_match_by_identifiers, source_track, semaphore, target_provider))
+        for source_track in remaining_tracks
+    ]
+    search_tasks: List[Optional[asyncio.Task]] = [None] * len(remaining_tracks)
+    search_scheduled = asyncio.Event()
+
+    async def run_search_phase() -> None:
+        nonlocal started_at
+
+        await asyncio.gather(*identifier_tasks, return_exceptions=True)
+        identifiers.seconds = time.perf_counter() - started_at
+        started_at = time.perf_counter()
+
+        for i, (source_track, identifier_task) in enumerate(zip(remaining_tracks, identifier_tasks)):
+            # Failed lookups aren't searched for, the failure surfaces when the track's result is consumed
+            if identifier_task.exception() is not None:
+                continue
+
+            if identifier_task.result() is not None:
+                identifiers.matched += 1
+                continue
+
+            search.tracks += 1
+            search_tasks[i] = asyncio.create_task(match_track(matcher.find_match_by_search, source_track, semaphore, target_provider))
+
+        search_scheduled.set()
+
+        results = await asyncio.gather(*[search_task for search_task in search_tasks if search_task is not None], return_exceptions=True)
+        search.matched = sum(1 for result in results if isinstance(result, Track))
+        search.seconds = time.perf_counter() - started_at
+
+    search_phase_task = asyncio.create_task(run_search_phase())
+    assets_task: Optional[asyncio.Task] = None
+    progress = ProgressReporter(redis, task, redis_key, total=len(source_tracks), checkpoint=checkpoint)
+
+    def show_track(future: asyncio.Task) -> None:
+        if not future.cancelled() and future.exception() is None:
+            task.progress.track = future.result()
+
+    try:
+        for i, source_track in enumerate(remaining_tracks):
+            result = await identifier_tasks[i]
+
+            if result is None:
+                await search_scheduled.wait()
+                result = await search_tasks[i]
+
+            checkpoint.record_match(result.service_id if result else None)
+
+            if assets_task is None or assets_task.done():
+                assets_task = asyncio.create_task(map_track_for_progress(source_provider, source_track, user))
+                assets_task.add_done_callback(show_track)
+
+            if dormant.is_set() or not await progress.advance():
+                logger.info(f"Task {task.task_id} was cancelled by user.")
+                return None
+
+        if not await progress.flush():
+            logger.info(f"Task {task.task_id} was cancelled by user.")
+            return None
 
-    return await matcher.find_match(source_track)
+        await search_phase_task
+
+        for phase in (identifiers, search):
+            logger.info(f"[task:{task.task_id}] Phase \"{phase.name}\" matched {phase.matched} of {phase.tracks} tracks in {phase.seconds:.2f}s.")
+    except RateLimitException:
+        # Keep the matches made so far, the task is retried after backing off.
+        await checkpoint.save()
+        raise
+    finally:
+        search_phase_task.cancel()
+
+        for match_task in identifier_tasks + [search_task for search_task in search_tasks if search_task is not None]:
+            match_task.cancel()
+
+        if assets_task is not None and not assets_task.done():
+            assets_task.cancel()
+
+    return checkpoint.matched_ids
+
+async def map_track_for_progress(source_provider: BaseProvider, track: Track, user: User) -> TrackRead:
+    assets = await get_track_assets(source_provider, track, user)
+    return map_track_between_domain_model_and_response_model(track, source_provider.provider_name, assets)
 
 async def get_track_assets(source_provider: BaseProvider, track: Track, user: User) -> EntityAssetsBase:
     try:
@@ -60,7 +245,21 @@ async def get_track_assets(source_provider: BaseProvider, track: Track, user: Us
             cover_image=None
         )
 
-async def handle_playlist_transfer(task: PlaylistTaskStatus, user: User, redis: Redis, redis_key: str) -> None:
+async def handle_playlist_transfer(task: PlaylistTaskStatus, user: User, redis: Redis, redis_key: str, dormant: asyncio.Event) -> None:
+    checkpoint = TransferCheckpoint(redis, redis_key)
+
+    try:
+        await transfer_playlist(task, user, redis, redis_key, checkpoint, dormant)
+    except (asyncio.CancelledError, RateLimitException):
+        # The worker is shutting down or backing off, whoever picks the task up next continues from the checkpoint.
+        raise
+    except Exception:
+        await checkpoint.clear()
+        raise
+
+    await checkpoint.clear()
+
+async def transfer_playlist(task: PlaylistTaskStatus, user: User, redis: Redis, redis_key: str, checkpoint: TransferCheckpoint, dormant: asyncio.Event) -> None:
     logger.info(f"Transfering playlist {task.arguments.from_playlist} from {task.arguments.from_provider} to {task.arguments.to_provider}.")
 
     async with await get_session_instance() as session, AsyncExitStack() as driver_stack:
@@ -101,6 +300,8 @@ async def handle_playlist_transfer(task: PlaylistTaskStatus, user: User, redis:
             )
 
             return
+        except RateLimitException:
+            raise
         except Exception as e:
             logger.error(f"Task {task.task_id} can't be started because an error occured while fetching the source playlist. Reason: {e}")
             await report_task_failure(
@@ -137,46 +338,34 @@ async def handle_playlist_transfer(task: PlaylistTaskStatus, user: User, redis:
 
             return
 
-        matcher = AsyncTrackMatcher(target_driver)
-        matches = []
-
-        for source_track in source_tracks:
-            if await check_if_task_is_dormant(redis, redis_key):
-                logger.info(f"Task {task.task_id} was cancelled by user.")
-                return
+        if await checkpoint.restore(fingerprint_tracks(source_tracks)):
+            logger.info(f"Task {task.task_id} continues from its checkpoint. {checkpoint.cursor} of {len(source_tracks)} tracks were already handled.")
 
-            if task.progress.handled % 10 == 0 and task.progress.handled != 0:
-                await report_task_on_hold(
-                    redis=redis,
-                    task=task,
-                    redis_key=redis_key,
-                    reason="Pausing to avoid a rate limit."
-                )
+        await report_task_as_running(
+            redis=redis,
+            task=task,
+            redis_key=redis_key
+        )
 
-                if await sleep_unless_dormant(redis, redis_key, 5):
-                    logger.info(f"Task {task.task_id} was cancelled by user.")
-                    return
-            try:
-                result = await asyncio.wait_for(
-                    do_current_iteration(
-                        redis_key=redis_key,
-                        task=task,
-                        redis=redis,
-                        source_tracks=source_tracks,
-                        matcher=matcher,
-                        source_track=source_track
-                    ),
-                    timeout=300
-                )
+        # Subsonic libraries are indexed locally, so most tracks are matched without sending any requests
+        catalog = await catalog_registry.get_index(user.id, target_driver)
+        matcher = AsyncTrackMatcher(target_driver, catalog=catalog)
 
-                if result:
-                    matches.append(result)
-            except asyncio.TimeoutError:
-                logger.warning(f"Finding a match for track {source_track.service_id} from {source_track.service_name} at provider {target_provider.provider_name} timed out. Skipping track.")
+        matches = await match_tracks(
+            task=task,
+            redis=redis,
+            redis_key=redis_key,
+            source_tracks=source_tracks,
+            matcher=matcher,
+            source_provider=source_provider,
+            target_provider=target_provider,
+            user=user,
+            checkpoint=checkpoint,
+            dormant=dormant
+        )
 
-            assets = await get_track_assets(source_provider, source_track, user)
-            task.progress.track = map_track_between_domain_model_and_response_model(source_track, source_provider.provider_name, assets)
-            await save_task(redis, task, redis_key, use_finished_ttl=False)
+        if matches is None:
+            return
 
         if len(matches) == 0:
             logger.info("Canceled playlist transfer. Reason: Couldn't find any matches.")
@@ -198,7 +387,9 @@ async def handle_playlist_transfer(task: PlaylistTaskStatus, user: User, redis:
             )
         else:
             try:
-                target_playlist = await target_driver.create_playlist(source_playlist.name)
+                target_playlist_id = await get_or_create_target_playlist(target_driver, source_playlist.name, checkpoint)
+            except RateLimitException:
+                raise
             except Exception as e:
                 logger.error(f"Failure while creating new playlist. Reason: {e}")
                 await report_task_failure(
@@ -212,15 +403,17 @@ async def handle_playlist_transfer(task: PlaylistTaskStatus, user: User, redis:
 
             try:
                 await insert_tracks_into_playlist(
-                    playlist_id=target_playlist.service_id,
-                    tracks=matches,
+                    playlist_id=target_playlist_id,
+                    track_ids=matches,
                     driver=target_driver,
                     task=task,
                     redis=redis,
-                    redis_key=redis_key
+                    redis_key=redis_key,
+                    checkpoint=checkpoint,
+                    dormant=dormant
                 )
 
-                if await check_if_task_is_dormant(redis, redis_key):
+                if dormant.is_set():
                     return
 
                 logger.info(f"Successfuly finished transfer of playlist from {source_provider.provider_name} to {target_provider.provider_name}.")
@@ -229,6 +422,8 @@ async def handle_playlist_transfer(task: PlaylistTaskStatus, user: User, redis:
                     task=task,
                     redis_key=redis_key
                 )
+            except RateLimitException:
+                raise
             except Exception as e:
                 logger.error(f"Failure while inserting tracks into playlist. Reason: {e}")
                 await report_task_failure(
@@ -237,21 +432,66 @@ async def handle_playlist_transfer(task: PlaylistTaskStatus, user: User, redis:
                     redis_key=redis_key
                 )
 
-async def insert_tracks_into_playlist(playlist_id: str, tracks: list[Track], driver: AsyncWrappedServiceDriver, task: PlaylistTaskStatus, redis: Redis, redis_key: str) -> None:
-    for chunked_ids in batch([track.service_id for track in tracks], 25):
-        if await check_if_task_is_dormant(redis, redis_key):
+async def get_or_create_target_playlist(driver: AsyncWrappedServiceDriver, name: str, checkpoint: TransferCheckpoint) -> str:
+    """
+    Returns the target playlist created by an earlier attempt of the task, or creates a new one.
+    """
+
+    if checkpoint.target_playlist_id:
+        try:
+            await driver.get_playlist(playlist_id=checkpoint.target_playlist_id)
+            return checkpoint.target_playlist_id
+        except PlaylistNotFoundException:
+            logger.warning(f"Playlist {checkpoint.target_playlist_id} created by an earlier attempt no longer exists, creating a new one.")
+
+    target_playlist = await driver.create_playlist(name)
+
+    checkpoint.target_playlist_id = target_playlist.service_id
+    checkpoint.inserted = 0
+    await checkpoint.save()
+
+    return target_playlist.service_id
+
+async def insert_tracks_into_playlist(playlist_id: str, track_ids: list[str], driver: AsyncWrappedServiceDriver, task: PlaylistTaskStatus, redis: Redis, redis_key: str, checkpoint: TransferCheckpoint, dormant: asyncio.Event) -> None:
+    """
+    Adds the matched tracks that the checkpoint hasn't inserted yet, in batches as large as the driver takes.
+
+    Batches are paced by a token bucket per target provider (see PLAYLIST_INSERT_RATE), shared by every task of the process.
+    The task is only put on hold when the bucket actually runs dry, instead of pausing after every batch.
+    """
+
+    remaining_ids = track_ids[checkpoint.inserted:]
+    batch_size = driver.max_playlist_insert_batch_size or len(remaining_ids)
+
+    insert_rate = PLAYLIST_INSERT_RATE.get(driver.service_name)
+    limiter = get_shared_bucket(f"playlist_insert:{driver.service_name}", *insert_rate) if insert_rate else None
+
+    for chunked_ids in batch(remaining_ids, max(1, batch_size)):
+        if dormant.is_set():
             return
 
+        delay = limiter.reserve(len(chunked_ids)) if limiter else 0
+        if delay > 0:
+            await report_task_on_hold(
+                redis=redis,
+                task=task,
+                redis_key=redis_key,
+                reason="Pausing to avoid a rate limit."
+            )
+
+            if await sleep_unless_dormant(dormant, delay):
+                return
+
+            await report_task_as_running(
+                redis=redis,
+                task=task,
+                redis_key=redis_key
+            )
+
         await driver.add_tracks_to_playlist(
             playlist_id=playlist_id,
-            track_ids=chunked_ids
+            track_ids=list(chunked_ids)
         )
 
-        await report_task_on_hold(
-            redis=redis,
-            task=task,
-            redis_key=redis_key,
-            reason="Pausing to avoid a rate limit."
-        )
-        if await sleep_unless_dormant(redis, redis_key, 3):
-            return
+        checkpoint.inserted += len(chunked_ids)
+        await checkpoint.save()
@@ -1,15 +1,90 @@
+from typing import AsyncGenerator, Tuple
+from redis.asyncio import Redis
 import time
 
 from api.core.redis import get_redis_instance
 from api.core.logging import logger
 from api.models.task import PlaylistTaskStatus, TaskStatus
-from api.workers.utils.keys import make_running_tasks_pattern
-from api.workers.utils.constants import HEARTBEAT_STALE_THRESHOLD, TTL_FINISHED, SCAN_COUNT
+from api.workers.utils.keys import make_all_tasks_pattern, make_active_tasks_index_key, make_task_index_keys
+from api.workers.utils.constants import HEARTBEAT_STALE_THRESHOLD, QUEUE_MAX_RETRIES, SCAN_COUNT
+from api.workers.utils.queue import ensure_consumer_group, enqueue_task, is_entry_pending, migrate_legacy_queue, remove_idle_consumers
+from api.workers.utils.serialization import load_tasks, delete_task_keys
+from api.workers.utils.task_status import save_task
+
+# Bump the version whenever a new index has to be backfilled.
+_INDEX_VERSION_KEY = "user_tasks_index_version"
+_INDEX_VERSION = "1"
+
+_ACTIVE_STATUSES = [TaskStatus.RUNNING, TaskStatus.QUEUED, TaskStatus.ON_HOLD, TaskStatus.MARKED_FOR_DELETION]
+
+async def _iter_active_tasks(redis: Redis) -> AsyncGenerator[Tuple[str, PlaylistTaskStatus], None]:
+    """
+    Yield every task in the active set, dropping the ones that no longer exist from the set.
+    """
+
+    active_index_key = make_active_tasks_index_key()
+    keys = [key async for key in redis.sscan_iter(active_index_key, count=SCAN_COUNT)]
+
+    tasks = await load_tasks(redis, keys)
+
+    missing_keys = [key for key, task in zip(keys, tasks) if task is None]
+    if len(missing_keys) > 0:
+        await redis.srem(active_index_key, *missing_keys)
+
+    for key, task in zip(keys, tasks):
+        if task is not None:
+            yield key, task
+
+async def index_unindexed_tasks() -> int:
+    """
+    Add tasks created before the task indexes existed to the indexes.
+
+    Walks the keyspace once, then records that it did so, so later startups skip it.
+
+    :return: Number of tasks indexed
+    """
+
+    redis = get_redis_instance()
+
+    indexed_count = 0
+
+    try:
+        if await redis.get(_INDEX_VERSION_KEY) == _INDEX_VERSION:
+            return 0
+
+        keys = [key async for key in redis.scan_iter(make_all_tasks_pattern(), count=SCAN_COUNT)]
+        tasks = await load_tasks(redis, keys)
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for key, task in zip(keys, tasks):
+                if task is None:
+                    continue
+
+                active_index_key, user_index_key, kind_index_key = make_task_index_keys(key)
+
+                pipe.zadd(user_index_key, {key: task.queued_at}, nx=True)
+                pipe.zadd(kind_index_key, {key: task.queued_at}, nx=True)
+
+                if task.status in _ACTIVE_STATUSES:
+                    pipe.sadd(active_index_key, key)
+
+                indexed_count += 1
+
+            await pipe.execute()
+
+        await redis.set(_INDEX_VERSION_KEY, _INDEX_VERSION)
+    finally:
+        await redis.aclose()
+
+    return indexed_count
 
 async def recover_stale_tasks() -> int:
     """
-    Scan for tasks stuck in RUNNING state with stale heartbeats.
-    Mark them as FAILED so they don't appear stuck forever.
+    Look for active tasks whose worker stopped sending heartbeats.
+
+    Tasks still pending in the queue are taken over by the workers themselves once their visibility timeout runs out.
+    The rest (like ones picked up by an older version) are put back in the queue,
+    or marked as FAILED if they were already retried too many times.
     
     :return: Number of stale tasks recovered
     """
@@ -20,49 +95,47 @@ async def recover_stale_tasks() -> int:
     current_time = int(time.time())
     
     try:
-        async for key in redis.scan_iter(make_running_tasks_pattern(), count=SCAN_COUNT):
-            raw = await redis.get(key)
-            if not raw:
+        async for key, task in _iter_active_tasks(redis):
+            if task.status not in (TaskStatus.RUNNING, TaskStatus.ON_HOLD):
                 continue
 
-            try:
-                task = PlaylistTaskStatus.model_validate_json(raw)
-            except Exception:
+            last_seen = task.last_heartbeat or task.started_at
+            if not last_seen or (current_time - last_seen) <= HEARTBEAT_STALE_THRESHOLD:
                 continue
-            
-            if task.status != TaskStatus.RUNNING:
+
+            if task.queue_entry_id and await is_entry_pending(redis, task.queue_entry_id):
                 continue
-            
-            if task.last_heartbeat:
-                age = current_time - task.last_heartbeat
-                if age > HEARTBEAT_STALE_THRESHOLD:
-                    logger.warning(
-                        f"[task:{task.task_id}] Found stale task "
-                        f"(last heartbeat {age}s ago, threshold {HEARTBEAT_STALE_THRESHOLD}s). "
-                        f"Marking as FAILED."
-                    )
-
-                    task.status = TaskStatus.FAILED
-                    task.status_reason = "Worker died unexpectedly. Task was not completed."
-                    task.done_at = current_time
-
-                    await redis.set(key, task.model_dump_json(), ex=TTL_FINISHED)
-
-                    recovered_count += 1
+
+            if task.retry_count >= QUEUE_MAX_RETRIES:
+                logger.warning(f"[task:{task.task_id}] Found stale task (last seen {current_time - last_seen}s ago) that was retried too many times. Marking as FAILED.")
+
+                await save_task(
+                    redis=redis,
+                    task=task,
+                    redis_key=key,
+                    status=TaskStatus.FAILED,
+                    status_reason=f"Gave up after {task.retry_count} retries. The worker processing this task stopped responding every time."
+                )
             else:
-                if task.started_at and (current_time - task.started_at) > HEARTBEAT_STALE_THRESHOLD:
-                    logger.warning(
-                        f"[task:{task.task_id}] Found stale task without heartbeat. "
-                        f"Marking as FAILED."
-                    )
+                logger.warning(f"[task:{task.task_id}] Found stale task (last seen {current_time - last_seen}s ago). Putting it back in the queue.")
 
-                    task.status = TaskStatus.FAILED
-                    task.status_reason = "Worker died unexpectedly. Task was not completed."
-                    task.done_at = current_time
+                task.retry_count += 1
 
-                    await redis.set(key, task.model_dump_json(), ex=TTL_FINISHED)
+                requeued = await save_task(
+                    redis=redis,
+                    task=task,
+                    redis_key=key,
+                    status=TaskStatus.QUEUED,
+                    status_reason="Worker died unexpectedly. Task will be retried.",
+                    use_finished_ttl=False
+                )
 
-                    recovered_count += 1
+                if requeued:
+                    async with redis.pipeline(transaction=False) as pipe:
+                        enqueue_task(pipe, key, front=True)
+                        await pipe.execute()
+
+            recovered_count += 1
     finally:
         await redis.aclose()
     
@@ -80,22 +153,58 @@ async def recover_marked_for_deletion_tasks() -> int:
     deleted_count = 0
 
     try:
-        async for key in redis.scan_iter(make_running_tasks_pattern(), count=SCAN_COUNT):
-            raw = await redis.get(key)
-            if not raw:
-                continue
-
-            try:
-                task = PlaylistTaskStatus.model_validate_json(raw)
-            except Exception:
-                continue
-
+        async for key, task in _iter_active_tasks(redis):
             if task.status != TaskStatus.MARKED_FOR_DELETION:
                 continue
 
-            await redis.delete(key)
+            await delete_task_keys(redis, key)
             deleted_count += 1
     finally:
         await redis.aclose()
 
     return deleted_count
+
+async def prepare_task_queue() -> int:
+    """
+    Create the task stream, move tasks left in the list queue of older versions to it,
+    and forget workers of processes that are gone.
+
+    :return: Number of tasks moved from the old queue
+    """
+
+    redis = get_redis_instance()
+
+    try:
+        await ensure_consumer_group(redis)
+
+        removed = await remove_idle_consumers(redis)
+        if removed > 0:
+            logger.info(f"Removed {removed} worker(s) of previous runs from the task queue")
+
+        return await migrate_legacy_queue(redis)
+    finally:
+        await redis.aclose()
+
+async def run_startup_recovery() -> None:
+    """
+    Backfill the task indexes and clean up after workers that died during a previous run.
+
+    Safe to run from several processes at once, every step only touches tasks
+    that no live worker could still be working on.
+    """
+
+    indexed = await index_unindexed_tasks()
+    if indexed > 0:
+        logger.info(f"Indexed {indexed} task(s) created by an older version")
+
+    migrated = await prepare_task_queue()
+    if migrated > 0:
+        logger.info(f"Moved {migrated} queued task(s) created by an older version to the task stream")
+
+    recovered = await recover_stale_tasks()
+    if recovered > 0:
+        logger.info(f"Recovered {recovered} stale task(s) from previous run")
+
+    deleted = await recover_marked_for_deletion_tasks()
+    if deleted > 0:
+        logger.info(f"Deleted {deleted} task(s) marked for deletion from previous run")
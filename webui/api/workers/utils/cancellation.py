@@ -0,0 +1,130 @@
+from typing import Dict, Optional, Set
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+import asyncio
+
+from api.core.logging import logger
+from api.core.redis import get_redis_instance
+from api.workers.utils.constants import CONTROL_RECONNECT_DELAY
+from api.workers.utils.keys import make_task_control_channel
+from api.workers.utils.task_status import check_if_task_is_dormant
+
+def publish_task_cancellation(pipe: Pipeline, redis_key: str) -> None:
+    """
+    Queue telling the worker running a task that it was cancelled or marked for deletion, on a pipeline.
+
+    :param pipe: Pipeline to queue the command on
+    :param redis_key: Full Redis key of the task
+    """
+
+    pipe.publish(make_task_control_channel(), redis_key)
+
+class CancellationListener:
+    """
+    Delivers the cancellation of running tasks to the workers of this process.
+
+    A single subscription to the control channel is shared by every worker of the process.
+    Workers watch the task they run and get an asyncio.Event, which is set as soon as the task
+    is cancelled or marked for deletion, so they don't have to read the task's status while it runs.
+    Every worker gets an event of its own, since a worker that lost a task to another worker of the
+    same process sets its event to stop, without stopping the new owner.
+
+    Pub/sub messages published while the listener is disconnected are lost, so every watched task
+    is checked once after reconnecting. The heartbeat and progress writes notice dormant tasks as well.
+    """
+
+    def __init__(self) -> None:
+        self._events: Dict[str, Set[asyncio.Event]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._attached = 0
+
+    def attach(self) -> None:
+        """
+        Start listening, if no worker of this process did yet. Every call has to be paired with detach().
+        """
+
+        self._attached += 1
+
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def detach(self) -> None:
+        """
+        Stop listening once the last worker of this process is done.
+        """
+
+        self._attached -= 1
+
+        if self._attached > 0 or self._listener is None:
+            return
+
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
+        self._listener = None
+
+    def watch(self, redis_key: str) -> asyncio.Event:
+        """
+        Start watching a task for cancellation.
+
+        :param redis_key: Full Redis key of the task
+        :return: Event set once the task is cancelled or marked for deletion
+        """
+
+        event = asyncio.Event()
+        self._events.setdefault(redis_key, set()).add(event)
+
+        return event
+
+    def unwatch(self, redis_key: str, event: asyncio.Event) -> None:
+        """
+        Stop watching a task, once its worker is done with it.
+
+        :param redis_key: Full Redis key of the task
+        :param event: The event watch() returned
+        """
+
+        events = self._events.get(redis_key)
+        if events is None:
+            return
+
+        events.discard(event)
+        if len(events) == 0:
+            del self._events[redis_key]
+
+    async def _listen(self) -> None:
+        redis = get_redis_instance()
+
+        try:
+            while True:
+                try:
+                    await self._consume(redis)
+                except (RedisConnectionError, RedisTimeoutError) as e:
+                    logger.warning(f"Lost the task control channel, reconnecting in {CONTROL_RECONNECT_DELAY}s. Reason: {e}")
+                    await asyncio.sleep(CONTROL_RECONNECT_DELAY)
+        finally:
+            await redis.aclose()
+
+    async def _consume(self, redis: Redis) -> None:
+        async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+            await pubsub.subscribe(make_task_control_channel())
+            await self._check_watched_tasks(redis)
+
+            async for message in pubsub.listen():
+                for event in self._events.get(message["data"], set()):
+                    event.set()
+
+    async def _check_watched_tasks(self, redis: Redis) -> None:
+        """
+        Catch up on cancellations published before the subscription was (re)established.
+        """
+
+        for redis_key, events in list(self._events.items()):
+            if any(not event.is_set() for event in events) and await check_if_task_is_dormant(redis, redis_key):
+                for event in list(events):
+                    event.set()
+
+cancellation_listener = CancellationListener()
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from tunesynctool.drivers import AsyncWrappedServiceDriver, SubsonicDriver
+from tunesynctool.exceptions import RateLimitException
+from tunesynctool.features import CatalogIndex, SubsonicCatalog
+import asyncio
+
+from api.core.logging import logger
+from api.workers.utils.constants import CATALOG_CACHE_SIZE
+
+class CatalogRegistry:
+    """
+    Keeps the library catalogs of Subsonic targets in memory, one per user and provider, across the tasks of this process.
+
+    Every transfer to a Subsonic library refreshes the user's catalog first. After the first one, that is usually a single
+    request, since SubsonicCatalog only fetches the albums that changed. The matcher then looks tracks up in the catalog
+    before sending any requests. The least recently used catalogs are dropped once more than CATALOG_CACHE_SIZE are kept.
+    """
+
+    def __init__(self) -> None:
+        self._catalogs: OrderedDict[Tuple[int, str], SubsonicCatalog] = OrderedDict()
+        self._locks: Dict[Tuple[int, str], asyncio.Lock] = {}
+
+    async def get_index(self, user_id: int, driver: AsyncWrappedServiceDriver) -> Optional[CatalogIndex]:
+        """
+        Get the up to date catalog of a user's library at the driver's provider.
+
+        :param user_id: User's database ID
+        :param driver: Driver of the target provider
+        :return: The catalog, or None if the provider's library can't be indexed or refreshing it failed
+        """
+
+        sync_driver = getattr(driver, "sync_driver", None)
+        if not isinstance(sync_driver, SubsonicDriver):
+            return None
+
+        key = (user_id, driver.service_name)
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            catalog = self._catalogs.get(key) or SubsonicCatalog(sync_driver)
+
+            try:
+                # Fetching a large library takes a while, and the driver is synchronous
+                await asyncio.to_thread(catalog.refresh, sync_driver)
+            except RateLimitException:
+                raise
+            except Exception as e:
+                logger.warning(f"Couldn't refresh the {driver.service_name} catalog of user {user_id}, tracks are matched without it. Reason: {e}")
+                return None
+
+            self._catalogs[key] = catalog
+            self._catalogs.move_to_end(key)
+
+            while len(self._catalogs) > CATALOG_CACHE_SIZE:
+                dropped_key, _ = self._catalogs.popitem(last=False)
+                self._locks.pop(dropped_key, None)
+
+            return catalog.index
+
+catalog_registry = CatalogRegistry()
@@ -0,0 +1,141 @@
+from typing import List, Optional
+from redis.asyncio import Redis
+from tunesynctool.models.track import Track
+import hashlib
+
+from api.workers.utils.constants import TTL_RUNNING
+from api.workers.utils.keys import make_task_checkpoint_key, make_task_checkpoint_matches_key
+
+def fingerprint_tracks(tracks: List[Track]) -> str:
+    """
+    Hash the IDs of the tracks in a playlist, in order.
+    A checkpoint is only resumed while the source playlist still has the same fingerprint.
+
+    :param tracks: Tracks of the source playlist
+    :return: Hex digest
+    """
+
+    digest = hashlib.sha1()
+
+    for track in tracks:
+        digest.update(str(track.service_id).encode())
+        digest.update(b"\n")
+
+    return digest.hexdigest()
+
+async def extend_checkpoint(redis: Redis, redis_key: str, ttl: int) -> None:
+    """
+    Keep the checkpoint of a task for as long as the task waits in the queue, which may be longer than a running task is kept.
+
+    :param redis: Redis client
+    :param redis_key: Full Redis key of the task
+    :param ttl: TTL in seconds
+    """
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.expire(make_task_checkpoint_key(redis_key), ttl)
+        pipe.expire(make_task_checkpoint_matches_key(redis_key), ttl)
+        await pipe.execute()
+
+class TransferCheckpoint:
+    """
+    Remembers how far a playlist transfer got, so a task that is picked up again
+    (after a shutdown or after its worker died) continues where it left off.
+
+    The cursor, source fingerprint, target playlist and insertion count live in a hash.
+    Matched track IDs live in a separate list that is only ever appended to, so saving stays
+    cheap no matter how many tracks were matched already. Both are written in one transaction.
+    """
+
+    def __init__(self, redis: Redis, redis_key: str) -> None:
+        self.redis = redis
+        self.key = make_task_checkpoint_key(redis_key)
+        self.matches_key = make_task_checkpoint_matches_key(redis_key)
+
+        self.cursor = 0
+        """How many source tracks were handled."""
+
+        self.matched_ids: List[str] = []
+        """IDs of the matched tracks at the target provider, in playlist order."""
+
+        self.target_playlist_id: Optional[str] = None
+        """ID of the playlist created at the target provider."""
+
+        self.inserted = 0
+        """How many of the matched tracks were added to the target playlist."""
+
+        self._unsaved_ids: List[str] = []
+
+    async def restore(self, source_fingerprint: str) -> bool:
+        """
+        Load the checkpoint of the task. A checkpoint taken of a different version of the source playlist is discarded.
+
+        :param source_fingerprint: Fingerprint of the source playlist, see fingerprint_tracks()
+        :return: True if there was a checkpoint to continue from
+        """
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hgetall(self.key)
+            pipe.lrange(self.matches_key, 0, -1)
+            fields, matched_ids = await pipe.execute()
+
+        if not fields or fields.get("source_fingerprint") != source_fingerprint:
+            await self.clear()
+
+            await self.redis.hset(self.key, "source_fingerprint", source_fingerprint)
+            await self.redis.expire(self.key, TTL_RUNNING)
+
+            return False
+
+        self.cursor = int(fields.get("cursor") or 0)
+        self.matched_ids = matched_ids
+        self.target_playlist_id = fields.get("target_playlist_id") or None
+        self.inserted = int(fields.get("inserted") or 0)
+
+        return self.cursor > 0
+
+    def record_match(self, track_id: Optional[str]) -> None:
+        """
+        Record that the next source track was handled.
+
+        :param track_id: ID of the matched track, or None if there was no match
+        """
+
+        self.cursor += 1
+
+        if track_id:
+            self.matched_ids.append(track_id)
+            self._unsaved_ids.append(track_id)
+
+    async def save(self) -> None:
+        """
+        Persist the checkpoint. Also refreshes its expiry, which follows the running task's.
+        """
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if len(self._unsaved_ids) > 0:
+                pipe.rpush(self.matches_key, *self._unsaved_ids)
+
+            pipe.hset(self.key, mapping={
+                "cursor": str(self.cursor),
+                "target_playlist_id": self.target_playlist_id or "",
+                "inserted": str(self.inserted),
+            })
+            pipe.expire(self.key, TTL_RUNNING)
+            pipe.expire(self.matches_key, TTL_RUNNING)
+            await pipe.execute()
+
+        self._unsaved_ids = []
+
+    async def clear(self) -> None:
+        """
+        Remove the checkpoint, once the task no longer needs to be resumed.
+        """
+
+        await self.redis.delete(self.key, self.matches_key)
+
+        self.cursor = 0
+        self.matched_ids = []
+        self.target_playlist_id = None
+        self.inserted = 0
+        self._unsaved_ids = []
@@ -7,7 +7,78 @@ TTL_FINISHED = 86400 # 24 hours
 HEARTBEAT_INTERVAL = 30 # seconds between heartbeat updates
 HEARTBEAT_STALE_THRESHOLD = 120 # seconds before considering a task stale
 
-# SCAN batch size. Redis defaults to 10, which means one round-trip per 10 keys
-# scanned. Listing tasks walks the whole keyspace, so a larger batch keeps it
-# to a couple of round-trips instead of hundreds.
-SCAN_COUNT = 1000
\ No newline at end of file
+# Queue settings
+# A delivered task that hasn't been acknowledged or heartbeat for this long is redelivered to another worker.
+QUEUE_VISIBILITY_TIMEOUT = HEARTBEAT_STALE_THRESHOLD
+QUEUE_BLOCK_TIMEOUT = 5 # seconds a worker waits for new tasks per read
+QUEUE_MAX_RETRIES = 3 # redeliveries before a task is moved to the dead-letter stream
+DEAD_LETTER_MAXLEN = 1000 # approximate number of entries kept in the dead-letter stream
+LEGACY_QUEUE_MIGRATION_BATCH = 100 # entries moved from the old list queue per round trip
+
+# Scheduling
+# Every user has their own queue of waiting tasks. Users are served round-robin, and a task is only
+# scheduled while its owner and the providers it uses are below the limits below.
+# Workers process tasks back to back, and only wait on an empty queue or when a provider throttles them.
+USER_MAX_RUNNING_TASKS = 2 # tasks of a single user that may run at the same time
+PROVIDER_MAX_RUNNING_TASKS_PER_USER = { # tasks of a single user that may use a provider at the same time, one entry per supported provider
+    "spotify": 1,
+    "deezer": 1,
+    "subsonic": 2,
+    "youtube": 1,
+}
+DEFAULT_PROVIDER_MAX_RUNNING_TASKS_PER_USER = 1
+SCHEDULER_LOOKAHEAD = 10 # waiting tasks of a user considered when the first ones are held back by provider limits
+SCHEDULER_MAX_USERS_SCANNED = 100 # users looked at per scheduling attempt, in round-robin order
+QUEUE_DOORBELL_MAX_LENGTH = 100 # wake-up signals kept for idle workers
+QUEUE_STATS_TTL = 604800 # 7 days, per-user wait time statistics expire this long after the user's last scheduled task
+THROTTLE_DEFAULT_DELAY = 5 # seconds to back off when a provider rate limits without saying for how long
+THROTTLE_SHORT_DELAY = 60 # back-offs up to this long are shown to users as resuming shortly
+THROTTLE_MAX_DELAY = 86400 # a day, upper bound for how long a rate limited task waits in the queue (daily quotas reset within a day)
+
+# Cancellation
+CONTROL_RECONNECT_DELAY = 5 # seconds before the cancellation listener reconnects after losing Redis
+
+# SCAN/SSCAN batch size. Redis defaults to 10, which means one round-trip per 10 keys
+# scanned. Walking the active tasks set during recovery, and the one-time backfill of the
+# task indexes over the whole keyspace, take a couple of round-trips instead of hundreds with it.
+SCAN_COUNT = 1000
+
+# How many tracks of a single transfer are matched concurrently, per target provider.
+# Keep these under the provider's rate limits, since every match may fan out into several requests.
+MATCH_CONCURRENCY = {
+    "spotify": 8,
+    "deezer": 8, # requests are bounded by the shared client of the ARL, see tunesynctool.drivers.common.deezer.client_pool
+    "subsonic": 8,
+    "youtube": 2,
+}
+DEFAULT_MATCH_CONCURRENCY = 4
+MATCH_TIMEOUT = 300 # seconds before a single track's match is given up on
+PREFETCH_CHUNK_SIZE = 100 # source tracks resolved by ID or ISRC per bulk lookup, before matching starts
+PREFETCH_TIMEOUT = 60 # seconds before a chunk's bulk lookup is given up on, its tracks are then looked up one by one
+CATALOG_CACHE_SIZE = 20 # Subsonic library catalogs kept in memory per worker process, see api.workers.utils.catalog
+
+# How fast matched tracks are added to the target playlist, per target provider, as (tracks per second, burst).
+# The size of each insert comes from the driver, see max_playlist_insert_batch_size. Providers missing here aren't paced.
+PLAYLIST_INSERT_RATE = {
+    "spotify": (100.0, 500.0),
+    "youtube": (2.0, 50.0), # every track is a separate request on YouTube
+    "deezer": (10.0, 50.0),
+}
+
+# Progress updates are coalesced and written at most this often (seconds)
+# or once this many tracks have been handled, whichever comes first.
+PROGRESS_FLUSH_INTERVAL = 1.0
+PROGRESS_FLUSH_TRACKS = 25
+
+# Index entries of tasks queued longer ago than this (seconds) are trimmed whenever a new task is queued.
+# Must comfortably exceed the lifetime of a task, including TTL_FINISHED after it is done.
+TASK_INDEX_RETENTION = 604800 # 7 days
+
+# How many tasks are loaded per pipelined round trip when listing or recovering tasks.
+TASK_LOAD_CHUNK_SIZE = 500
+
+# Task events are published to a stream per user, capped at roughly this many entries.
+# The stream expires along with the user's last finished task.
+TASK_EVENTS_MAXLEN = 1000
+TASK_EVENTS_TTL = TTL_FINISHED
+TASK_EVENTS_KEEPALIVE = 15 # seconds between keep-alive comments on idle event streams
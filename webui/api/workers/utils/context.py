@@ -4,6 +4,7 @@ from redis.asyncio import Redis
 import asyncio
 
 from api.models.task import PlaylistTaskStatus
+from api.workers.utils.queue import QueueEntry
 
 @dataclass
 class WorkerContext:
@@ -14,6 +15,13 @@ class WorkerContext:
     worker_id: int
     worker_name: str
     redis: Redis
+    current_entry: Optional[QueueEntry] = None
     current_task: Optional[PlaylistTaskStatus] = None
     current_redis_key: Optional[str] = None
-    heartbeat_task: Optional[asyncio.Task] = None
\ No newline at end of file
+    dormant: Optional[asyncio.Event] = None
+    """Set once the current task is cancelled or marked for deletion, or was taken over by another worker."""
+    heartbeat_task: Optional[asyncio.Task] = None
+    handler_task: Optional[asyncio.Task] = None
+    """The handler running the current task."""
+    claim_lost: bool = False
+    """Set once another worker took over the queue entry of the current task. The task is theirs to finish from then on."""
\ No newline at end of file
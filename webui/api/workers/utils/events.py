@@ -0,0 +1,99 @@
+from typing import AsyncGenerator, Dict, Optional, Tuple
+from redis.asyncio import Redis
+import json
+
+from api.core.redis import get_redis_instance
+from api.workers.utils.constants import TASK_EVENTS_KEEPALIVE
+from api.workers.utils.keys import make_task_events_key, parse_task_key
+from api.workers.utils.serialization import decode_task_delta
+
+def _parse_event_id(event_id: str) -> Tuple[int, int]:
+    milliseconds, _, sequence = event_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+def format_task_event(event_id: str, fields: Dict[str, str]) -> str:
+    """
+    Format a stream entry as a Server-Sent Event.
+
+    :param event_id: ID of the stream entry, sent as the event ID so clients can resume from it
+    :param fields: Fields of the stream entry
+    :return: The event, ready to be written to the response
+    """
+
+    _, _, task_id = parse_task_key(fields["task_key"])
+
+    payload = {
+        "type": fields["type"],
+        "task_id": task_id,
+        "changes": decode_task_delta(
+            task_fields=json.loads(fields.get("task") or "{}"),
+            progress_fields=json.loads(fields.get("progress") or "{}")
+        )
+    }
+
+    return f"id: {event_id}\nevent: task\ndata: {json.dumps(payload)}\n\n"
+
+async def stream_task_events(user_id: int, last_event_id: Optional[str] = None) -> AsyncGenerator[str, None]:
+    """
+    Stream the task changes of a user as Server-Sent Events.
+
+    Opens its own Redis connection, because the stream outlives the request's dependencies.
+    Sends a keep-alive comment whenever nothing happened for TASK_EVENTS_KEEPALIVE seconds.
+
+    If `last_event_id` is given, every event after it is replayed first. When those events were
+    already trimmed from the stream, a "reset" event is sent instead, telling the client to reload every task.
+
+    :param user_id: User's database ID
+    :param last_event_id: ID of the last event the client has seen, if it is resuming
+    """
+
+    redis = get_redis_instance()
+    events_key = make_task_events_key(user_id)
+
+    try:
+        cursor = await _resolve_cursor(redis, events_key, last_event_id)
+
+        if cursor is None:
+            yield "event: reset\ndata: {}\n\n"
+            cursor = await _resolve_cursor(redis, events_key, None)
+
+        while True:
+            response = await redis.xread(
+                streams={events_key: cursor},
+                count=100,
+                block=TASK_EVENTS_KEEPALIVE * 1000
+            )
+
+            if not response:
+                yield ": keep-alive\n\n"
+                continue
+
+            for _, entries in response:
+                for event_id, fields in entries:
+                    cursor = event_id
+                    yield format_task_event(event_id, fields)
+    finally:
+        await redis.aclose()
+
+async def _resolve_cursor(redis: Redis, events_key: str, last_event_id: Optional[str]) -> Optional[str]:
+    """
+    Work out where to start reading the stream from.
+
+    :return: The ID to read after, or None if events after `last_event_id` may have been lost
+    """
+
+    if not last_event_id:
+        latest = await redis.xrevrange(events_key, count=1)
+        return latest[0][0] if latest else "0-0"
+
+    try:
+        requested = _parse_event_id(last_event_id)
+    except ValueError:
+        return None
+
+    # Either the whole stream expired or the events right after the requested one may have been trimmed.
+    oldest = await redis.xrange(events_key, count=1)
+    if not oldest or _parse_event_id(oldest[0][0]) > requested:
+        return None
+
+    return last_event_id
@@ -3,27 +3,53 @@ import asyncio
 
 from api.workers.utils.context import WorkerContext
 from api.workers.utils.constants import HEARTBEAT_INTERVAL
-from api.workers.utils.task_status import save_task
+from api.workers.utils.task_status import save_task_heartbeat
+from api.workers.utils.queue import extend_entry, get_task_providers, claim_task_slots
 from api.core.logging import logger
 
+def abandon_task(ctx: WorkerContext) -> None:
+    """
+    Stop running the current task, because another worker took over its queue entry.
+    The handler is stopped right away, and the task's entry and running slots are left to the new owner.
+    """
+
+    ctx.claim_lost = True
+
+    if ctx.dormant:
+        ctx.dormant.set()
+
+    if ctx.handler_task and not ctx.handler_task.done():
+        ctx.handler_task.cancel()
+
 async def update_heartbeat(ctx: WorkerContext) -> None:
     """
-    Update task heartbeat timestamp.
+    Update task heartbeat timestamp, and keep the task's queue entry and its running slots from expiring.
+    Also notices if the task went dormant, or was taken over by another worker.
     """
 
     if not ctx.current_task or not ctx.current_redis_key:
         return
-    
+
+    # Checked first, so that nothing is written on behalf of a task that belongs to another worker now
+    if ctx.current_entry and not await extend_entry(ctx.redis, ctx.worker_name, ctx.current_entry.entry_id):
+        logger.warning(f"[{ctx.worker_name}][task:{ctx.current_task.task_id}] Queue entry was taken over by another worker, stopping the task")
+        abandon_task(ctx)
+        return
+
     ctx.current_task.last_heartbeat = int(time.time())
     ctx.current_task.worker_id = ctx.worker_name
-    await save_task(ctx.redis, ctx.current_task, ctx.current_redis_key, use_finished_ttl=False)
+    if not await save_task_heartbeat(ctx.redis, ctx.current_task, ctx.current_redis_key) and ctx.dormant:
+        # The cancellation was missed by the cancellation listener, e.g. while it was reconnecting.
+        ctx.dormant.set()
+
+    await claim_task_slots(ctx.redis, ctx.current_redis_key, get_task_providers(ctx.current_task), renew_only=True)
 
 async def start_heartbeat_loop(ctx: WorkerContext) -> None:
     """
     Background task to update heartbeat while processing.
     """
     
-    while True:
+    while not ctx.claim_lost:
         await asyncio.sleep(HEARTBEAT_INTERVAL)
         await update_heartbeat(ctx)
         logger.debug(f"[{ctx.worker_name}] Heartbeat updated for task {ctx.current_task.task_id}")
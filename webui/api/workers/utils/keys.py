@@ -1,6 +1,11 @@
-from typing import Tuple
+from typing import List, Tuple
 from api.models.task import TaskKind
 
+# The scheduler script builds the per-user keys from user IDs itself, see make_user_key_prefixes().
+_USER_WAITING_TASKS_PREFIX = "user_tasks_waiting:"
+_USER_RUNNING_TASKS_PREFIX = "user_tasks_running:"
+_USER_QUEUE_STATS_PREFIX = "user_tasks_queue_stats:"
+
 def make_task_key(kind: str | TaskKind, user_id: int, task_id: str) -> str:
     """
     Generate a Redis key for a task.
@@ -15,6 +20,47 @@ def make_task_key(kind: str | TaskKind, user_id: int, task_id: str) -> str:
 
     return f"user_tasks:{kind}:{user_id}:{task_id}"
 
+def make_task_progress_key(task_key: str) -> str:
+    """
+    Generate the Redis key holding the progress of a task.
+
+    Format: user_task_progress:{kind}:{user_id}:{task_id}
+
+    The prefix differs from the task's own, so SCAN patterns for tasks never match progress keys.
+
+    :param task_key: Redis key of the task itself
+    :return: Redis key string
+    """
+
+    kind, user_id, task_id = parse_task_key(task_key)
+    return f"user_task_progress:{kind}:{user_id}:{task_id}"
+
+def make_task_checkpoint_key(task_key: str) -> str:
+    """
+    Generate the Redis key holding the checkpoint of a task, see api.workers.utils.checkpoint.
+
+    Format: user_task_checkpoint:{kind}:{user_id}:{task_id}
+
+    :param task_key: Redis key of the task itself
+    :return: Redis key string
+    """
+
+    kind, user_id, task_id = parse_task_key(task_key)
+    return f"user_task_checkpoint:{kind}:{user_id}:{task_id}"
+
+def make_task_checkpoint_matches_key(task_key: str) -> str:
+    """
+    Generate the Redis key of the list holding the IDs of the tracks a task matched so far.
+
+    Format: user_task_checkpoint_matches:{kind}:{user_id}:{task_id}
+
+    :param task_key: Redis key of the task itself
+    :return: Redis key string
+    """
+
+    kind, user_id, task_id = parse_task_key(task_key)
+    return f"user_task_checkpoint_matches:{kind}:{user_id}:{task_id}"
+
 def parse_task_key(key: str) -> Tuple[str, int, str]:
     """
     Parse a Redis task key into its components.
@@ -33,32 +79,187 @@ def parse_task_key(key: str) -> Tuple[str, int, str]:
     return kind, int(user_id), task_id
 
 def make_task_queue_name() -> str:
-    """Get the name of the task queue in Redis."""
+    """
+    Get the name of the list older versions used as the task queue.
+
+    Only read at startup, to move leftover entries to the task stream.
+    """
 
     return "user_tasks_queue"
 
-def make_user_tasks_pattern(user_id: int) -> str:
+def make_task_stream_key() -> str:
+    """Get the name of the stream that queued tasks are added to."""
+
+    return "user_tasks_stream"
+
+def make_task_consumer_group_name() -> str:
+    """Get the name of the consumer group the workers read the task stream with."""
+
+    return "user_tasks_workers"
+
+def make_dead_letter_stream_key() -> str:
+    """Get the name of the stream holding tasks that were given up on after too many retries."""
+
+    return "user_tasks_dead_letter"
+
+def make_user_tasks_index_key(user_id: int) -> str:
     """
-    Generate a Redis SCAN pattern for all tasks belonging to a user.
-    
+    Get the name of the sorted set indexing a user's tasks.
+
+    Members are task keys, scored by their queued_at timestamp.
+
     :param user_id: User's database ID
-    :return: Pattern string for SCAN operation
+    :return: Redis key string
+    """
+
+    return f"user_tasks_index:{user_id}"
+
+def make_user_waiting_tasks_key(user_id: int) -> str:
+    """
+    Get the name of the list holding the keys of a user's tasks that wait to be scheduled, in order.
+
+    :param user_id: User's database ID
+    :return: Redis key string
+    """
+
+    return f"{_USER_WAITING_TASKS_PREFIX}{user_id}"
+
+def make_ready_users_key() -> str:
+    """
+    Get the name of the sorted set of users with waiting tasks.
+
+    Members are user IDs, scored by the Unix timestamp they were last served at (or started waiting at),
+    so the scheduler serves them round-robin.
+    """
+
+    return "user_tasks_ready"
+
+def make_user_running_tasks_key(user_id: int) -> str:
+    """
+    Get the name of the sorted set holding the tasks of a user that currently run.
+
+    Members are task keys, scored by the Unix timestamp their slot expires at unless the worker's heartbeat renews it.
+
+    :param user_id: User's database ID
+    :return: Redis key string
     """
 
-    return f"user_tasks:*:{user_id}:*"
+    return f"{_USER_RUNNING_TASKS_PREFIX}{user_id}"
 
-def make_running_tasks_pattern() -> str:
+def make_user_provider_running_tasks_key(user_id: int, provider: str) -> str:
     """
-    Generate a Redis SCAN pattern for finding potentially stale running tasks.
+    Get the name of the sorted set holding the running tasks of a user that use a provider.
+
+    Scored the same way as the set returned by make_user_running_tasks_key().
+
+    :param user_id: User's database ID
+    :param provider: Provider name (e.g. "spotify")
+    :return: Redis key string
+    """
+
+    return f"{make_user_running_tasks_key(user_id)}:{provider}"
+
+def make_user_queue_stats_key(user_id: int) -> str:
+    """
+    Get the name of the hash holding how many of a user's tasks were scheduled and how long they waited in total.
+
+    :param user_id: User's database ID
+    :return: Redis key string
+    """
+
+    return f"{_USER_QUEUE_STATS_PREFIX}{user_id}"
+
+def make_user_key_prefixes() -> List[str]:
+    """
+    Get the prefixes of the per-user scheduling keys, for the scheduler script that appends user IDs to them.
+
+    :return: List of (waiting tasks prefix, running tasks prefix, queue statistics prefix)
+    """
+
+    return [_USER_WAITING_TASKS_PREFIX, _USER_RUNNING_TASKS_PREFIX, _USER_QUEUE_STATS_PREFIX]
+
+def make_queue_doorbell_key() -> str:
+    """Get the name of the list idle workers wait on to hear about newly queued tasks."""
+
+    return "user_tasks_doorbell"
+
+def make_kind_tasks_index_key(kind: str | TaskKind) -> str:
+    """
+    Get the name of the sorted set indexing all tasks of a kind.
+
+    Members are task keys, scored by their queued_at timestamp.
+
+    :param kind: Task type
+    :return: Redis key string
+    """
+
+    return f"user_tasks_kind:{kind}"
+
+def make_active_tasks_index_key() -> str:
+    """Get the name of the set holding the keys of all tasks that are queued, running, on hold or awaiting deletion."""
+
+    return "user_tasks_active"
+
+def make_task_index_keys(task_key: str) -> List[str]:
+    """
+    Get every index a task is listed in.
+
+    :param task_key: Redis key of the task
+    :return: List of (active set, user index, kind index)
+    """
+
+    kind, user_id, _ = parse_task_key(task_key)
+
+    return [
+        make_active_tasks_index_key(),
+        make_user_tasks_index_key(user_id),
+        make_kind_tasks_index_key(kind)
+    ]
+
+def make_task_events_key(user_id: int) -> str:
+    """
+    Get the name of the stream that task changes of a user are published to.
+
+    :param user_id: User's database ID
+    :return: Redis key string
+    """
+
+    return f"user_tasks_events:{user_id}"
+
+def make_task_control_channel() -> str:
+    """
+    Get the name of the pub/sub channel the keys of tasks that were cancelled or marked for deletion are published to,
+    so the workers running them can stop right away.
+    """
+
+    return "user_tasks_control"
+
+def make_task_script_keys(task_key: str) -> List[str]:
+    """
+    Get the keys passed to the task Lua scripts, see api.workers.utils.scripts.
+
+    :param task_key: Redis key of the task
+    :return: List of keys in the order the scripts expect them
+    """
+
+    _, user_id, _ = parse_task_key(task_key)
+
+    return [
+        task_key,
+        make_task_progress_key(task_key),
+        *make_task_index_keys(task_key),
+        make_task_events_key(user_id),
+        make_task_checkpoint_key(task_key),
+        make_task_checkpoint_matches_key(task_key)
+    ]
+
+def make_all_tasks_pattern() -> str:
+    """
+    Generate a Redis SCAN pattern matching every task.
+
+    Only used to index tasks created before the task indexes existed.
     
     :return: Pattern string for SCAN operation
     """
 
-    return "user_tasks:*:*:*"
-
-def make_kind_agnostic_user_task_pattern(user_id: int, task_id: str) -> str:
-    return make_task_key(
-        kind="*",
-        user_id=user_id,
-        task_id=task_id
-    )
\ No newline at end of file
+    return "user_tasks:*:*:*"
\ No newline at end of file
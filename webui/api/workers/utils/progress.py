@@ -0,0 +1,74 @@
+from typing import Optional
+from redis.asyncio import Redis
+import time
+
+from api.models.task import PlaylistTaskStatus
+from api.workers.utils.constants import PROGRESS_FLUSH_INTERVAL, PROGRESS_FLUSH_TRACKS
+from api.workers.utils.task_status import save_task_progress
+from api.workers.utils.checkpoint import TransferCheckpoint
+
+class ProgressReporter:
+    """
+    Coalesces the progress updates of a task.
+
+    Progress is written at most every `interval` seconds or every `every_tracks` handled tracks,
+    instead of once per track. Status transitions (failures, cancellations, etc.) are not affected
+    and are still written immediately by the report_task_* helpers, which persist any pending progress as well.
+
+    If a checkpoint is given, it is saved along with every flush, so it is never behind the reported progress.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        task: PlaylistTaskStatus,
+        redis_key: str,
+        total: int,
+        interval: float = PROGRESS_FLUSH_INTERVAL,
+        every_tracks: int = PROGRESS_FLUSH_TRACKS,
+        checkpoint: Optional[TransferCheckpoint] = None
+    ) -> None:
+        self.redis = redis
+        self.task = task
+        self.redis_key = redis_key
+        self.total = total
+        self.interval = interval
+        self.every_tracks = every_tracks
+        self.checkpoint = checkpoint
+
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    async def advance(self, count: int = 1) -> bool:
+        """
+        Record handled tracks and flush if an update is due.
+
+        :param count: How many tracks were handled since the last call
+        :return: False if a flush found the task dormant, True otherwise
+        """
+
+        self.task.progress.handled += count
+        self.task.progress.in_queue = max(0, self.total - self.task.progress.handled)
+        self._pending += count
+
+        if self._pending >= self.every_tracks or time.monotonic() - self._last_flush >= self.interval:
+            return await self.flush()
+
+        return True
+
+    async def flush(self) -> bool:
+        """
+        Write pending progress to Redis.
+
+        Doubles as the dormancy check of the task, so no separate read is needed between flushes.
+
+        :return: False if the task is dormant or gone, True otherwise
+        """
+
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+        if self.checkpoint:
+            await self.checkpoint.save()
+
+        return await save_task_progress(self.redis, self.task, self.redis_key)
@@ -0,0 +1,479 @@
+from dataclasses import dataclass
+from typing import List, Optional
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ResponseError
+import json
+import time
+
+from api.core.logging import logger
+from api.models.task import PlaylistTaskStatus, TaskQueueStats, TaskStatus, UserQueueStats
+from api.workers.utils.keys import (
+    make_task_stream_key,
+    make_task_consumer_group_name,
+    make_dead_letter_stream_key,
+    make_task_queue_name,
+    make_user_waiting_tasks_key,
+    make_ready_users_key,
+    make_user_running_tasks_key,
+    make_user_provider_running_tasks_key,
+    make_user_queue_stats_key,
+    make_queue_doorbell_key,
+    make_active_tasks_index_key,
+    make_user_key_prefixes,
+    parse_task_key
+)
+from api.workers.utils.constants import (
+    QUEUE_VISIBILITY_TIMEOUT,
+    QUEUE_BLOCK_TIMEOUT,
+    DEAD_LETTER_MAXLEN,
+    LEGACY_QUEUE_MIGRATION_BATCH,
+    USER_MAX_RUNNING_TASKS,
+    PROVIDER_MAX_RUNNING_TASKS_PER_USER,
+    DEFAULT_PROVIDER_MAX_RUNNING_TASKS_PER_USER,
+    SCHEDULER_LOOKAHEAD,
+    SCHEDULER_MAX_USERS_SCANNED,
+    QUEUE_DOORBELL_MAX_LENGTH,
+    QUEUE_STATS_TTL
+)
+from api.workers.utils.scripts import EXTEND_QUEUE_ENTRY, MIGRATE_LEGACY_QUEUE, SCHEDULE_NEXT_TASK, get_script
+from api.workers.utils.serialization import delete_task_keys
+
+# Waiting tasks with these statuses are dropped by the scheduler instead of being handed to a worker.
+_DORMANT_TASK_STATUSES = [TaskStatus.CANCELED, TaskStatus.FAILED, TaskStatus.FINISHED, TaskStatus.MARKED_FOR_DELETION]
+
+@dataclass
+class QueueEntry:
+    """
+    A task delivered to a worker through the task stream.
+    """
+
+    entry_id: str
+    redis_key: str
+    redelivered: bool = False
+    """True if the entry was reclaimed from a worker that stopped responding."""
+
+async def ensure_consumer_group(redis: Redis) -> None:
+    """
+    Create the task stream and its consumer group, unless they already exist.
+
+    :param redis: Redis client
+    """
+
+    try:
+        await redis.xgroup_create(make_task_stream_key(), make_task_consumer_group_name(), id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def enqueue_task(pipe: Pipeline, redis_key: str, front: bool = False) -> None:
+    """
+    Queue adding a task to its owner's waiting tasks on a pipeline, so it can be part of the transaction writing the task.
+
+    The task reaches the task stream once the scheduler picks it, see dequeue_next_entry().
+
+    :param pipe: Pipeline to queue the commands on
+    :param redis_key: Full Redis key of the task
+    :param front: Put the task ahead of the owner's other waiting tasks, for tasks that already ran for a while
+    """
+
+    _, user_id, _ = parse_task_key(redis_key)
+    waiting_key = make_user_waiting_tasks_key(user_id)
+
+    if front:
+        pipe.lpush(waiting_key, redis_key)
+    else:
+        pipe.rpush(waiting_key, redis_key)
+
+    # A user who had nothing waiting joins at the back of the round, one who had keeps their place.
+    pipe.zadd(make_ready_users_key(), {str(user_id): time.time()}, nx=True)
+    ring_doorbell(pipe)
+
+def ring_doorbell(pipe: Pipeline) -> None:
+    """
+    Queue waking up an idle worker on a pipeline, see wait_for_doorbell().
+
+    :param pipe: Pipeline to queue the commands on
+    """
+
+    pipe.rpush(make_queue_doorbell_key(), "1")
+    pipe.ltrim(make_queue_doorbell_key(), -QUEUE_DOORBELL_MAX_LENGTH, -1)
+
+def get_task_providers(task: PlaylistTaskStatus) -> List[str]:
+    """
+    Get the providers a task uses, each of them once.
+
+    :param task: The task
+    """
+
+    return list(dict.fromkeys([task.arguments.from_provider, task.arguments.to_provider]))
+
+def _first_entry(messages: Optional[list], redelivered: bool) -> Optional[QueueEntry]:
+    if not messages:
+        return None
+
+    # Entries deleted while pending come back without fields, those are acknowledged as invalid by the worker.
+    entry_id, fields = messages[0]
+    return QueueEntry(entry_id=entry_id, redis_key=(fields or {}).get("task_key", ""), redelivered=redelivered)
+
+async def claim_stalled_entry(redis: Redis, consumer: str) -> Optional[QueueEntry]:
+    """
+    Take over an entry whose worker hasn't acknowledged or extended it within the visibility timeout.
+
+    :param redis: Redis client
+    :param consumer: Name of the worker claiming the entry
+    :return: The claimed entry, or None if nothing is stalled
+    """
+
+    result = await redis.xautoclaim(
+        make_task_stream_key(),
+        make_task_consumer_group_name(),
+        consumer,
+        min_idle_time=QUEUE_VISIBILITY_TIMEOUT * 1000,
+        start_id="0-0",
+        count=1
+    )
+
+    return _first_entry(result[1], redelivered=True)
+
+async def dequeue_next_entry(redis: Redis, consumer: str) -> Optional[QueueEntry]:
+    """
+    Schedule the next waiting task and deliver it to the worker through the task stream.
+
+    Users are served round-robin, and a task is only picked while its owner and the providers it uses are
+    below their running task limits. The running slots it takes expire after the visibility timeout,
+    unless renewed by the heartbeat. Waiting tasks that went dormant are dropped, and the ones marked for deletion are deleted.
+
+    :param redis: Redis client
+    :param consumer: Name of the worker reading the entry
+    :return: The entry, or None if there is nothing that may run right now
+    """
+
+    now = int(time.time())
+
+    script = get_script(redis, SCHEDULE_NEXT_TASK)
+
+    try:
+        result = await script(
+            keys=[make_task_stream_key(), make_ready_users_key()],
+            args=[
+                make_task_consumer_group_name(),
+                consumer,
+                now,
+                now + QUEUE_VISIBILITY_TIMEOUT,
+                USER_MAX_RUNNING_TASKS,
+                json.dumps(PROVIDER_MAX_RUNNING_TASKS_PER_USER),
+                DEFAULT_PROVIDER_MAX_RUNNING_TASKS_PER_USER,
+                SCHEDULER_LOOKAHEAD,
+                SCHEDULER_MAX_USERS_SCANNED,
+                QUEUE_STATS_TTL,
+                *make_user_key_prefixes(),
+                *_DORMANT_TASK_STATUSES
+            ],
+            client=redis
+        )
+    except ResponseError as e:
+        if "NOGROUP" not in str(e):
+            raise
+
+        # The stream was removed (e.g. Redis was flushed), recreate it for the next read.
+        logger.warning("Task stream or its consumer group is missing, recreating it")
+        await ensure_consumer_group(redis)
+        return None
+
+    entry_id, redis_key, *marked_for_deletion_keys = result
+
+    if len(marked_for_deletion_keys) > 0:
+        await delete_task_keys(redis, *marked_for_deletion_keys)
+
+    if not entry_id:
+        return None
+
+    return QueueEntry(entry_id=entry_id, redis_key=redis_key)
+
+async def wait_for_doorbell(redis: Redis) -> None:
+    """
+    Wait until a task is queued or a running slot is given back, or QUEUE_BLOCK_TIMEOUT passes.
+
+    :param redis: Redis client
+    """
+
+    await redis.blpop([make_queue_doorbell_key()], timeout=QUEUE_BLOCK_TIMEOUT)
+
+async def acknowledge_entry(redis: Redis, entry_id: str) -> None:
+    """
+    Remove a handled entry from the queue.
+
+    :param redis: Redis client
+    :param entry_id: ID of the stream entry
+    """
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.xack(make_task_stream_key(), make_task_consumer_group_name(), entry_id)
+        pipe.xdel(make_task_stream_key(), entry_id)
+        await pipe.execute()
+
+async def requeue_entry(redis: Redis, entry: QueueEntry, front: bool = True) -> None:
+    """
+    Put a task back among its owner's waiting tasks right away, instead of waiting for the visibility timeout.
+
+    A task backing off from a rate limit (see PlaylistTaskStatus.not_before) is put at the back,
+    so it doesn't hide the owner's other tasks from the scheduler while it waits.
+
+    :param redis: Redis client
+    :param entry: The entry to requeue
+    :param front: Put the task ahead of the owner's other waiting tasks
+    """
+
+    async with redis.pipeline(transaction=True) as pipe:
+        enqueue_task(pipe, entry.redis_key, front=front)
+        pipe.xack(make_task_stream_key(), make_task_consumer_group_name(), entry.entry_id)
+        pipe.xdel(make_task_stream_key(), entry.entry_id)
+        await pipe.execute()
+
+async def dead_letter_entry(redis: Redis, entry: QueueEntry, retry_count: int, reason: str) -> None:
+    """
+    Move an entry that keeps failing to the dead-letter stream.
+
+    :param redis: Redis client
+    :param entry: The entry to give up on
+    :param retry_count: How many times the entry was redelivered
+    :param reason: Why the entry was given up on
+    """
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.xadd(
+            make_dead_letter_stream_key(),
+            {
+                "task_key": entry.redis_key,
+                "entry_id": entry.entry_id,
+                "retry_count": str(retry_count),
+                "reason": reason,
+                "failed_at": str(int(time.time())),
+            },
+            maxlen=DEAD_LETTER_MAXLEN,
+            approximate=True
+        )
+        pipe.xack(make_task_stream_key(), make_task_consumer_group_name(), entry.entry_id)
+        pipe.xdel(make_task_stream_key(), entry.entry_id)
+        await pipe.execute()
+
+async def extend_entry(redis: Redis, consumer: str, entry_id: str) -> bool:
+    """
+    Reset the visibility timeout of an entry the worker is still processing.
+
+    :param redis: Redis client
+    :param consumer: Name of the worker processing the entry
+    :param entry_id: ID of the stream entry
+    :return: True if extended, False if the entry was reclaimed by another worker or is gone
+    """
+
+    script = get_script(redis, EXTEND_QUEUE_ENTRY)
+    extended = await script(
+        keys=[make_task_stream_key()],
+        args=[make_task_consumer_group_name(), consumer, entry_id],
+        client=redis
+    )
+
+    return extended == 1
+
+def _make_slot_keys(redis_key: str, providers: List[str]) -> List[str]:
+    _, user_id, _ = parse_task_key(redis_key)
+    return [make_user_running_tasks_key(user_id)] + [make_user_provider_running_tasks_key(user_id, provider) for provider in providers]
+
+async def claim_task_slots(redis: Redis, redis_key: str, providers: List[str], renew_only: bool = False) -> None:
+    """
+    Hold the running slots of a task's owner and the providers it uses.
+
+    dequeue_next_entry() takes them when it schedules a task. Tasks taken over from a worker that
+    stopped responding claim them again, since their slots may have expired meanwhile.
+
+    :param redis: Redis client
+    :param redis_key: Full Redis key of the task
+    :param providers: Providers the task uses, see get_task_providers()
+    :param renew_only: Only push back the expiry of slots the task still holds, used by the heartbeat
+    """
+
+    expires_at = int(time.time()) + QUEUE_VISIBILITY_TIMEOUT
+
+    async with redis.pipeline(transaction=True) as pipe:
+        for key in _make_slot_keys(redis_key, providers):
+            pipe.zadd(key, {redis_key: expires_at}, xx=renew_only)
+            pipe.expireat(key, expires_at)
+
+        await pipe.execute()
+
+async def release_task_slots(redis: Redis, redis_key: str) -> None:
+    """
+    Give back the running slots of a task, and wake up a worker in case a waiting task was held back by them.
+
+    The task may be gone by now, so the slots of every provider are given back.
+
+    :param redis: Redis client
+    :param redis_key: Full Redis key of the task
+    """
+
+    async with redis.pipeline(transaction=True) as pipe:
+        for key in _make_slot_keys(redis_key, list(PROVIDER_MAX_RUNNING_TASKS_PER_USER)):
+            pipe.zrem(key, redis_key)
+
+        ring_doorbell(pipe)
+        await pipe.execute()
+
+async def is_entry_pending(redis: Redis, entry_id: str) -> bool:
+    """
+    Check if an entry was delivered to a worker and not acknowledged yet.
+
+    :param redis: Redis client
+    :param entry_id: ID of the stream entry
+    """
+
+    try:
+        pending = await redis.xpending_range(
+            make_task_stream_key(),
+            make_task_consumer_group_name(),
+            min=entry_id,
+            max=entry_id,
+            count=1
+        )
+    except ResponseError:
+        return False
+
+    return len(pending) > 0
+
+async def migrate_legacy_queue(redis: Redis) -> int:
+    """
+    Move tasks left in the list older versions used as the queue to the task stream.
+
+    :param redis: Redis client
+    :return: Number of tasks moved
+    """
+
+    script = get_script(redis, MIGRATE_LEGACY_QUEUE)
+    migrated_count = 0
+
+    while True:
+        moved = await script(
+            keys=[make_task_queue_name(), make_task_stream_key()],
+            args=[LEGACY_QUEUE_MIGRATION_BATCH],
+            client=redis
+        )
+        migrated_count += moved
+
+        if moved < LEGACY_QUEUE_MIGRATION_BATCH:
+            return migrated_count
+
+async def remove_idle_consumers(redis: Redis) -> int:
+    """
+    Forget workers that hold no entries and haven't read from the queue within the visibility timeout.
+
+    Running workers read at least every QUEUE_BLOCK_TIMEOUT seconds (see dequeue_next_entry()), so these belong to processes that are gone.
+
+    :param redis: Redis client
+    :return: Number of consumers removed
+    """
+
+    stream_key = make_task_stream_key()
+    group_name = make_task_consumer_group_name()
+
+    removed_count = 0
+
+    for consumer in await redis.xinfo_consumers(stream_key, group_name):
+        if consumer["pending"] == 0 and consumer["idle"] > QUEUE_VISIBILITY_TIMEOUT * 1000:
+            await redis.xgroup_delconsumer(stream_key, group_name, consumer["name"])
+            removed_count += 1
+
+    return removed_count
+
+async def get_user_queue_stats(redis: Redis, user_ids: List[int]) -> List[UserQueueStats]:
+    """
+    Collect the queue depth, running tasks and wait times of users.
+
+    :param redis: Redis client
+    :param user_ids: Database IDs of the users
+    """
+
+    now = time.time()
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.llen(make_user_waiting_tasks_key(user_id))
+            pipe.zcount(make_user_running_tasks_key(user_id), int(now), "+inf")
+            pipe.lindex(make_user_waiting_tasks_key(user_id), 0)
+            pipe.hgetall(make_user_queue_stats_key(user_id))
+
+        results = await pipe.execute()
+
+    rows = [results[i:i + 4] for i in range(0, len(results), 4)]
+
+    # Tasks written before tasks were stored as hashes fail here, their wait time is just left out.
+    async with redis.pipeline(transaction=False) as pipe:
+        for _, _, head_key, _ in rows:
+            pipe.hget(head_key or "", "queued_at")
+
+        queued_ats = await pipe.execute(raise_on_error=False)
+
+    stats = []
+
+    for user_id, (depth, running, _, counters), queued_at in zip(user_ids, rows, queued_ats):
+        scheduled = int(counters.get("scheduled") or 0)
+
+        stats.append(UserQueueStats(
+            user_id=user_id,
+            depth=depth,
+            running=running,
+            oldest_wait=max(0, int(now) - int(queued_at)) if isinstance(queued_at, str) and queued_at else None,
+            average_wait=float(counters["total_wait"]) / scheduled if scheduled > 0 else None,
+            last_wait=float(counters["last_wait"]) if counters.get("last_wait") else None,
+            scheduled=scheduled
+        ))
+
+    return stats
+
+async def get_queue_stats(redis: Redis) -> TaskQueueStats:
+    """
+    Collect the length, lag and pending entries of the task queue, and the waiting and running tasks of every user.
+
+    :param redis: Redis client
+    """
+
+    group_name = make_task_consumer_group_name()
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.xlen(make_task_stream_key())
+        pipe.xinfo_groups(make_task_stream_key())
+        pipe.xlen(make_dead_letter_stream_key())
+        pipe.zrange(make_ready_users_key(), 0, -1)
+        pipe.smembers(make_active_tasks_index_key())
+        length, groups, dead_letter_length, ready_user_ids, active_task_keys = await pipe.execute(raise_on_error=False)
+
+    group = {}
+    if isinstance(groups, list):
+        group = next((group for group in groups if group.get("name") == group_name), {})
+
+    # Users with waiting tasks come first, in the order they are served next.
+    # Users whose tasks all run are only found through their active tasks.
+    user_ids = [int(user_id) for user_id in ready_user_ids] if isinstance(ready_user_ids, list) else []
+    other_user_ids = set()
+
+    for task_key in active_task_keys if isinstance(active_task_keys, set) else []:
+        try:
+            _, user_id, _ = parse_task_key(task_key)
+        except ValueError:
+            continue
+
+        if user_id not in user_ids:
+            other_user_ids.add(user_id)
+
+    users = await get_user_queue_stats(redis, user_ids + sorted(other_user_ids))
+    users = [user for user in users if user.depth > 0 or user.running > 0]
+
+    return TaskQueueStats(
+        length=length if isinstance(length, int) else 0,
+        pending=group.get("pending", 0),
+        lag=group.get("lag"),
+        consumers=group.get("consumers", 0),
+        dead_letter_length=dead_letter_length if isinstance(dead_letter_length, int) else 0,
+        waiting=sum(user.depth for user in users),
+        users=users
+    )
@@ -0,0 +1,57 @@
+from typing import Dict
+import time
+
+class TokenBucket:
+    """
+    Paces work to a sustained rate, while letting short bursts through right away.
+
+    The bucket holds up to `capacity` tokens and refills at `rate` tokens per second.
+    Callers reserve the tokens they need and wait as long as they are told to, so waiting
+    stays in the caller's hands (e.g. to wake up early when the task is cancelled).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        :param rate: Tokens added per second
+        :param capacity: Most tokens the bucket holds, the largest burst let through without waiting
+        """
+
+        self.rate = rate
+        self.capacity = capacity
+
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket, going into debt if there aren't enough.
+
+        :param tokens: Tokens to take
+        :return: Seconds to wait before using them, 0 if they are available right away
+        """
+
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+        self._tokens -= tokens
+
+        return max(0.0, -self._tokens / self.rate)
+
+_shared_buckets: Dict[str, TokenBucket] = {}
+
+def get_shared_bucket(name: str, rate: float, capacity: float) -> TokenBucket:
+    """
+    Get the bucket shared by every task of this process under a name, creating it on first use.
+
+    Rate limits apply to the whole application at a provider, so tasks running side by side have to draw from one bucket.
+
+    :param name: Name of the bucket, e.g. the provider it paces
+    :param rate: Tokens added per second, only used when the bucket is created
+    :param capacity: Most tokens the bucket holds, only used when the bucket is created
+    """
+
+    if name not in _shared_buckets:
+        _shared_buckets[name] = TokenBucket(rate, capacity)
+
+    return _shared_buckets[name]
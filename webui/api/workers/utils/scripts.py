@@ -0,0 +1,389 @@
+# Lua scripts executed atomically by Redis.
+#
+# Tasks are stored as a hash (user_tasks:...) plus a separate progress hash (user_task_progress:...).
+# Tasks written by older versions are plain JSON strings. Those are only ever decoded to read
+# their status, never re-encoded in Lua, because cjson turns empty arrays into empty objects.
+# They are replaced by a hash on their next write.
+#
+# Every task script takes the same keys:
+#
+# KEYS[1]: task key
+# KEYS[2]: progress key
+# KEYS[3]: active tasks set
+# KEYS[4]: user's task index
+# KEYS[5]: kind's task index
+# KEYS[6]: user's task event stream
+# KEYS[7]: checkpoint key
+# KEYS[8]: checkpoint matches key
+
+from typing import Dict
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+# Shared helpers, prepended to the scripts below.
+_PRELUDE = """
+local function task_status(key)
+    local kind = redis.call('TYPE', key)['ok']
+
+    if kind == 'hash' then
+        return redis.call('HGET', key, 'status'), false
+    elseif kind == 'string' then
+        return cjson.decode(redis.call('GET', key))['status'], true
+    end
+
+    return nil, false
+end
+
+local function hset_from_json(key, encoded)
+    local fields = {}
+    for name, value in pairs(cjson.decode(encoded)) do
+        table.insert(fields, name)
+        table.insert(fields, value)
+    end
+
+    if #fields > 0 then
+        redis.call('HSET', key, unpack(fields))
+    end
+end
+
+local function publish_event(maxlen, ttl, event_type, task_fields, progress_fields)
+    redis.call(
+        'XADD', KEYS[6], 'MAXLEN', '~', maxlen, '*',
+        'task_key', KEYS[1], 'type', event_type, 'task', task_fields, 'progress', progress_fields
+    )
+    redis.call('EXPIRE', KEYS[6], ttl)
+end
+
+local function delete_task(maxlen, ttl)
+    redis.call('DEL', KEYS[1], KEYS[2], KEYS[7], KEYS[8])
+    redis.call('SREM', KEYS[3], KEYS[1])
+    redis.call('ZREM', KEYS[4], KEYS[1])
+    redis.call('ZREM', KEYS[5], KEYS[1])
+    publish_event(maxlen, ttl, 'deleted', '{}', '{}')
+end
+"""
+
+# Writes task fields and/or progress fields unless the task has gone dormant in the meantime,
+# then publishes the written fields to the user's event stream.
+# Partial writes (like heartbeats) are refused for a legacy task, they would lose the other fields.
+# A task leaves the active set once a dormant status is written.
+#
+# ARGV[1]: TTL in seconds
+# ARGV[2]: task fields as a flat JSON object of strings
+# ARGV[3]: progress fields as a flat JSON object of strings
+# ARGV[4]: approximate maximum length of the event stream
+# ARGV[5]: TTL of the event stream in seconds
+# ARGV[6]: '1' if the task fields are complete, '0' for a partial write
+# ARGV[7...]: dormant statuses
+#
+# Returns 1 if written, 0 if the task no longer exists (or is a legacy task and the write is partial)
+# and -1 if it is dormant. Tasks marked for deletion are deleted instead.
+SAVE_TASK_UNLESS_DORMANT = _PRELUDE + """
+local status, legacy = task_status(KEYS[1])
+if not status then
+    redis.call('SREM', KEYS[3], KEYS[1])
+    return 0
+end
+
+if status == 'marked_for_deletion' then
+    delete_task(ARGV[4], ARGV[5])
+    return -1
+end
+
+for i = 7, #ARGV do
+    if status == ARGV[i] then
+        return -1
+    end
+end
+
+if legacy then
+    if ARGV[6] ~= '1' then
+        return 0
+    end
+
+    redis.call('DEL', KEYS[1])
+end
+
+hset_from_json(KEYS[1], ARGV[2])
+hset_from_json(KEYS[2], ARGV[3])
+
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+
+local new_status = redis.call('HGET', KEYS[1], 'status')
+for i = 7, #ARGV do
+    if new_status == ARGV[i] then
+        redis.call('SREM', KEYS[3], KEYS[1])
+        break
+    end
+end
+
+publish_event(ARGV[4], ARGV[5], 'updated', ARGV[2], ARGV[3])
+return 1
+"""
+
+# Reads the status of a task, deleting it if it was marked for deletion.
+#
+# ARGV[1]: approximate maximum length of the event stream
+# ARGV[2]: TTL of the event stream in seconds
+#
+# Returns the status, or nil if the task doesn't exist.
+GET_TASK_STATUS = _PRELUDE + """
+local status = task_status(KEYS[1])
+
+if status == 'marked_for_deletion' then
+    delete_task(ARGV[1], ARGV[2])
+end
+
+return status
+"""
+
+# The scripts below operate on the task queue and take their own keys.
+
+# Resets the idle time of a queue entry, but only while the given consumer still owns it.
+# Keeps long running tasks from being redelivered, without taking back an entry that was already reclaimed.
+#
+# KEYS[1]: task stream
+# ARGV[1]: consumer group
+# ARGV[2]: consumer
+# ARGV[3]: entry ID
+#
+# Returns 1 if the entry was extended, 0 if the consumer no longer owns it.
+EXTEND_QUEUE_ENTRY = """
+local pending = redis.call('XPENDING', KEYS[1], ARGV[1], ARGV[3], ARGV[3], 1, ARGV[2])
+if #pending == 0 then
+    return 0
+end
+
+redis.call('XCLAIM', KEYS[1], ARGV[1], ARGV[2], 0, ARGV[3], 'JUSTID')
+return 1
+"""
+
+# Moves entries from the list older versions used as the queue to the task stream.
+#
+# KEYS[1]: legacy queue list
+# KEYS[2]: task stream
+# ARGV[1]: maximum number of entries to move
+#
+# Returns the number of entries moved.
+MIGRATE_LEGACY_QUEUE = """
+local moved = 0
+
+for i = 1, tonumber(ARGV[1]) do
+    local task_key = redis.call('LPOP', KEYS[1])
+    if not task_key then
+        break
+    end
+
+    redis.call('XADD', KEYS[2], '*', 'task_key', task_key)
+    moved = moved + 1
+end
+
+return moved
+"""
+
+# Hands the next task to a worker, fairly across users.
+#
+# Entries already in the task stream that were never delivered (requeued by older versions) go first.
+# Otherwise users with waiting tasks are visited round-robin, least recently served first. The first of a
+# user's next few waiting tasks whose owner and providers are below their running task limits is moved to
+# the task stream and delivered to the worker right away. The user then moves to the back of the round.
+# Waiting tasks that were deleted meanwhile, whose arguments can't be read, or that went dormant (cancelled,
+# marked for deletion...) while waiting are dropped on the way, without taking any running slots.
+# Tasks backing off from a rate limit are skipped until their not-before time. A user held back only by those
+# moves to the back of the round, so users waiting for a quota reset don't crowd out everyone else.
+#
+# Only the task stream and the ready users set are known up front. The per-user keys (the prefixes from
+# api.workers.utils.keys.make_user_key_prefixes() followed by the user ID), the per-provider keys and the
+# task keys depend on what the script reads, so they can't be declared in KEYS. The script therefore
+# requires a single Redis instance, it can't run on Redis Cluster.
+#
+# KEYS[1]: task stream
+# KEYS[2]: ready users sorted set
+# ARGV[1]: consumer group
+# ARGV[2]: consumer
+# ARGV[3]: current Unix timestamp
+# ARGV[4]: Unix timestamp the running slots expire at
+# ARGV[5]: maximum running tasks per user
+# ARGV[6]: maximum running tasks per user and provider, as a JSON object
+# ARGV[7]: default maximum running tasks per user and provider
+# ARGV[8]: how many waiting tasks of a user to consider
+# ARGV[9]: how many users to consider
+# ARGV[10]: TTL of the per-user statistics in seconds
+# ARGV[11]: prefix of the users' waiting tasks lists
+# ARGV[12]: prefix of the users' running tasks sorted sets
+# ARGV[13]: prefix of the users' statistics hashes
+# ARGV[14...]: dormant statuses
+#
+# Returns {entry ID, task key, keys of dropped tasks marked for deletion...}.
+# The entry ID and task key are empty strings if there is nothing that may run right now.
+SCHEDULE_NEXT_TASK = """
+local function read_undelivered()
+    local result = redis.call('XREADGROUP', 'GROUP', ARGV[1], ARGV[2], 'COUNT', 1, 'STREAMS', KEYS[1], '>')
+    if not result or #result[1][2] == 0 then
+        return nil
+    end
+
+    local entry = result[1][2][1]
+    local fields = entry[2]
+    for i = 1, #fields, 2 do
+        if fields[i] == 'task_key' then
+            return {entry[1], fields[i + 1]}
+        end
+    end
+
+    return {entry[1], ''}
+end
+
+local function decode(encoded)
+    if type(encoded) ~= 'string' then
+        return nil
+    end
+
+    local ok, decoded = pcall(cjson.decode, encoded)
+    if ok and type(decoded) == 'table' then
+        return decoded
+    end
+
+    return nil
+end
+
+-- Returns nil arguments for tasks that are gone or can't be read, so a single broken task doesn't stop scheduling.
+local function load_task(key)
+    local kind = redis.call('TYPE', key)['ok']
+    local queued_at, arguments, status, not_before
+
+    if kind == 'hash' then
+        local values = redis.call('HMGET', key, 'queued_at', 'arguments', 'status', 'not_before')
+        queued_at, arguments, status, not_before = values[1], decode(values[2]), values[3], values[4]
+    elseif kind == 'string' then
+        local task = decode(redis.call('GET', key))
+        if task then
+            queued_at, arguments, status, not_before = task['queued_at'], task['arguments'], task['status'], task['not_before']
+        end
+    end
+
+    if type(arguments) ~= 'table' or type(arguments['from_provider']) ~= 'string' or type(arguments['to_provider']) ~= 'string' then
+        return nil, nil, status, nil
+    end
+
+    return tonumber(queued_at), arguments, status, tonumber(not_before)
+end
+
+local function running_count(key)
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', ARGV[3])
+    return redis.call('ZCARD', key)
+end
+
+local function take_slot(key, task_key)
+    redis.call('ZADD', key, ARGV[4], task_key)
+    redis.call('EXPIREAT', key, ARGV[4])
+end
+
+local marked_for_deletion = {}
+
+local function result(entry)
+    entry = entry or {'', ''}
+    return {entry[1], entry[2], unpack(marked_for_deletion)}
+end
+
+local undelivered = read_undelivered()
+if undelivered then
+    return result(undelivered)
+end
+
+local provider_limits = cjson.decode(ARGV[6])
+local user_limit = tonumber(ARGV[5])
+
+local dormant = {}
+for i = 14, #ARGV do
+    dormant[ARGV[i]] = true
+end
+
+for _, user_id in ipairs(redis.call('ZRANGE', KEYS[2], 0, tonumber(ARGV[9]) - 1)) do
+    local waiting_key = ARGV[11] .. user_id
+    local running_key = ARGV[12] .. user_id
+    local backing_off = false
+
+    if running_count(running_key) < user_limit then
+        for _, task_key in ipairs(redis.call('LRANGE', waiting_key, 0, tonumber(ARGV[8]) - 1)) do
+            local queued_at, arguments, status, not_before = load_task(task_key)
+
+            if arguments == nil or dormant[status] then
+                redis.call('LREM', waiting_key, 1, task_key)
+
+                -- Returned so the caller removes them along with their progress, checkpoint and indexes
+                if status == 'marked_for_deletion' then
+                    table.insert(marked_for_deletion, task_key)
+                end
+            elseif not_before and not_before > tonumber(ARGV[3]) then
+                backing_off = true
+            else
+                local providers = {arguments['from_provider']}
+                if arguments['to_provider'] ~= arguments['from_provider'] then
+                    table.insert(providers, arguments['to_provider'])
+                end
+
+                local fits = true
+                for _, provider in ipairs(providers) do
+                    local limit = tonumber(provider_limits[provider] or ARGV[7])
+                    if running_count(running_key .. ':' .. provider) >= limit then
+                        fits = false
+                    end
+                end
+
+                if fits then
+                    redis.call('LREM', waiting_key, 1, task_key)
+
+                    take_slot(running_key, task_key)
+                    for _, provider in ipairs(providers) do
+                        take_slot(running_key .. ':' .. provider, task_key)
+                    end
+
+                    if redis.call('LLEN', waiting_key) > 0 then
+                        redis.call('ZADD', KEYS[2], ARGV[3], user_id)
+                    else
+                        redis.call('ZREM', KEYS[2], user_id)
+                    end
+
+                    local stats_key = ARGV[13] .. user_id
+                    local waited = math.max(0, tonumber(ARGV[3]) - (queued_at or tonumber(ARGV[3])))
+                    redis.call('HINCRBY', stats_key, 'scheduled', 1)
+                    redis.call('HINCRBYFLOAT', stats_key, 'total_wait', waited)
+                    redis.call('HSET', stats_key, 'last_wait', waited)
+                    redis.call('EXPIRE', stats_key, ARGV[10])
+
+                    redis.call('XADD', KEYS[1], '*', 'task_key', task_key)
+                    return result(read_undelivered())
+                end
+            end
+        end
+
+        if redis.call('LLEN', waiting_key) == 0 then
+            redis.call('ZREM', KEYS[2], user_id)
+        elseif backing_off then
+            redis.call('ZADD', KEYS[2], ARGV[3], user_id)
+        end
+    end
+end
+
+return result(nil)
+"""
+
+_scripts: Dict[str, AsyncScript] = {}
+
+def get_script(redis: Redis, source: str) -> AsyncScript:
+    """
+    Get the script object of one of the scripts above, built once and shared by every client.
+
+    The script hash only depends on the source, so call it with `client=redis`.
+
+    :param redis: Redis client, only used to build the script the first time
+    :param source: Source of the script
+    """
+
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = redis.register_script(source)
+
+    return script
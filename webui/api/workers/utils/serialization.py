@@ -0,0 +1,269 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ResponseError
+from tunesynctool.utilities.collections import batch
+import json
+
+from api.models.task import PlaylistTaskProgress, PlaylistTaskStatus, TaskResponseBase
+from api.core.logging import logger
+from api.workers.utils.constants import TASK_LOAD_CHUNK_SIZE, TASK_EVENTS_MAXLEN, TASK_EVENTS_TTL
+from api.workers.utils.keys import make_task_progress_key, make_task_checkpoint_key, make_task_checkpoint_matches_key, make_task_index_keys, make_task_events_key, parse_task_key
+
+_TASK_LIST_ADAPTER = TypeAdapter(List[PlaylistTaskStatus])
+
+# Fields holding nested models, stored as JSON strings inside the hashes.
+_JSON_FIELDS = {"arguments", "track"}
+
+def _encode_fields(data: dict) -> Dict[str, str]:
+    fields = {}
+
+    for name, value in data.items():
+        if name in _JSON_FIELDS:
+            fields[name] = json.dumps(value) if value is not None else ""
+        else:
+            fields[name] = "" if value is None else str(value)
+
+    return fields
+
+def _decode_fields(fields: Dict[str, str]) -> dict:
+    data = {}
+
+    for name, value in fields.items():
+        if value == "":
+            data[name] = None
+        elif name in _JSON_FIELDS:
+            data[name] = json.loads(value)
+        else:
+            data[name] = value
+
+    return data
+
+def serialize_task(task: TaskResponseBase) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Split a task into the fields of its Redis hash and the fields of its separate progress hash.
+
+    Every value is a string. None is stored as an empty string, nested models as JSON.
+
+    :param task: Task to serialize
+    :return: Tuple of (task fields, progress fields)
+    """
+
+    data = task.model_dump(mode="json")
+    progress = data.pop("progress", None) or {}
+
+    return _encode_fields(data), _encode_fields(progress)
+
+def serialize_task_progress(task: PlaylistTaskStatus) -> Dict[str, str]:
+    """
+    Serialize only the progress of a task.
+
+    :param task: Task whose progress to serialize
+    :return: Progress fields
+    """
+
+    return _encode_fields(task.progress.model_dump(mode="json"))
+
+def deserialize_task(fields: Dict[str, str], progress_fields: Dict[str, str]) -> PlaylistTaskStatus:
+    """
+    Build a task from the fields of its Redis hash and its progress hash.
+
+    :param fields: Fields of the task hash
+    :param progress_fields: Fields of the progress hash, may be empty
+    :return: The task
+    """
+
+    return PlaylistTaskStatus.model_validate(_decode_task(fields, progress_fields))
+
+def _decode_task(fields: Dict[str, str], progress_fields: Dict[str, str]) -> dict:
+    data = _decode_fields(fields)
+    data["progress"] = _decode_fields(progress_fields)
+
+    return data
+
+def decode_task_delta(task_fields: Dict[str, str], progress_fields: Dict[str, str]) -> dict:
+    """
+    Turn a partial set of hash fields into JSON-compatible values with the same types the API returns.
+
+    Used for task events, which only carry the fields that were written.
+
+    :param task_fields: Some fields of the task hash
+    :param progress_fields: Some fields of the progress hash
+    :return: Dict shaped like a partial PlaylistTaskStatus
+    """
+
+    delta = _decode_delta(PlaylistTaskStatus, task_fields)
+
+    if progress_fields:
+        delta["progress"] = _decode_delta(PlaylistTaskProgress, progress_fields)
+
+    return delta
+
+def _decode_delta(model: type[BaseModel], fields: Dict[str, str]) -> dict:
+    delta = {}
+
+    for name, value in _decode_fields(fields).items():
+        if name not in model.model_fields:
+            continue
+
+        adapter = _field_adapter(model, name)
+        delta[name] = adapter.dump_python(adapter.validate_python(value), mode="json")
+
+    return delta
+
+@lru_cache
+def _field_adapter(model: type[BaseModel], name: str) -> TypeAdapter:
+    return TypeAdapter(model.model_fields[name].annotation)
+
+def add_task_event(
+    pipe: Pipeline,
+    redis_key: str,
+    event_type: str,
+    task_fields: Optional[Dict[str, str]] = None,
+    progress_fields: Optional[Dict[str, str]] = None
+) -> None:
+    """
+    Queue publishing a task event on a pipeline. The Lua scripts publish theirs the same way.
+
+    :param pipe: Pipeline to queue the commands on
+    :param redis_key: Full Redis key of the task
+    :param event_type: "created", "updated" or "deleted"
+    :param task_fields: Task fields that were written
+    :param progress_fields: Progress fields that were written
+    """
+
+    _, user_id, _ = parse_task_key(redis_key)
+    events_key = make_task_events_key(user_id)
+
+    pipe.xadd(
+        events_key,
+        {
+            "task_key": redis_key,
+            "type": event_type,
+            "task": json.dumps(task_fields or {}),
+            "progress": json.dumps(progress_fields or {}),
+        },
+        maxlen=TASK_EVENTS_MAXLEN,
+        approximate=True
+    )
+    pipe.expire(events_key, TASK_EVENTS_TTL)
+
+async def load_task(redis: Redis, redis_key: str) -> Optional[PlaylistTaskStatus]:
+    """
+    Load a task and its progress in a single round trip.
+
+    Tasks written before tasks were stored as hashes are still plain JSON strings.
+    Those are read as such and converted on their next write.
+
+    :param redis: Redis client
+    :param redis_key: Full Redis key of the task
+    :return: The task, or None if it doesn't exist
+    """
+
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(redis_key)
+            pipe.hgetall(make_task_progress_key(redis_key))
+            fields, progress_fields = await pipe.execute()
+    except ResponseError as e:
+        if "WRONGTYPE" not in str(e):
+            raise
+
+        raw = await redis.get(redis_key)
+        return PlaylistTaskStatus.model_validate_json(raw) if raw else None
+
+    if not fields:
+        return None
+
+    return deserialize_task(fields, progress_fields)
+
+async def load_tasks(redis: Redis, redis_keys: List[str], chunk_size: int = TASK_LOAD_CHUNK_SIZE) -> List[Optional[PlaylistTaskStatus]]:
+    """
+    Load several tasks and their progress.
+
+    Keys are fetched in pipelined chunks, so hundreds of tasks take a few round trips instead of hundreds.
+    All of them are then validated in a single pass.
+
+    :param redis: Redis client
+    :param redis_keys: Full Redis keys of the tasks
+    :param chunk_size: How many tasks to fetch per round trip
+    :return: The tasks in the same order as the keys, None for the ones that don't exist or are invalid
+    """
+
+    raw_tasks: List[Optional[dict]] = []
+    legacy_indexes: List[int] = []
+
+    for chunk in batch(redis_keys, chunk_size):
+        async with redis.pipeline(transaction=False) as pipe:
+            for redis_key in chunk:
+                pipe.hgetall(redis_key)
+                pipe.hgetall(make_task_progress_key(redis_key))
+
+            results = await pipe.execute(raise_on_error=False)
+
+        for index in range(len(chunk)):
+            fields, progress_fields = results[index * 2], results[index * 2 + 1]
+
+            if isinstance(fields, ResponseError):
+                # Tasks stored as a JSON string by older versions, there should be barely any of these.
+                legacy_indexes.append(len(raw_tasks))
+                raw_tasks.append(None)
+            elif fields:
+                raw_tasks.append(_decode_task(fields, progress_fields if isinstance(progress_fields, dict) else {}))
+            else:
+                raw_tasks.append(None)
+
+    if len(legacy_indexes) > 0:
+        legacy_values = await redis.mget([redis_keys[index] for index in legacy_indexes])
+
+        for index, raw in zip(legacy_indexes, legacy_values):
+            raw_tasks[index] = json.loads(raw) if raw else None
+
+    return _validate_tasks(raw_tasks)
+
+def _validate_tasks(raw_tasks: List[Optional[dict]]) -> List[Optional[PlaylistTaskStatus]]:
+    present = [raw for raw in raw_tasks if raw is not None]
+
+    try:
+        validated = iter(_TASK_LIST_ADAPTER.validate_python(present))
+        return [next(validated) if raw is not None else None for raw in raw_tasks]
+    except ValidationError:
+        pass
+
+    # At least one task is invalid, fall back to validating them one by one so the rest still load.
+    tasks = []
+    for raw in raw_tasks:
+        try:
+            tasks.append(PlaylistTaskStatus.model_validate(raw) if raw is not None else None)
+        except ValidationError as e:
+            logger.warning(f"Skipping task that failed validation: {e}")
+            tasks.append(None)
+
+    return tasks
+
+async def delete_task_keys(redis: Redis, *redis_keys: str) -> None:
+    """
+    Delete tasks along with their progress and checkpoint, and remove them from every index.
+
+    :param redis: Redis client
+    :param redis_keys: Full Redis keys of the tasks
+    """
+
+    async with redis.pipeline(transaction=True) as pipe:
+        for redis_key in redis_keys:
+            active_index_key, user_index_key, kind_index_key = make_task_index_keys(redis_key)
+
+            pipe.delete(
+                redis_key,
+                make_task_progress_key(redis_key),
+                make_task_checkpoint_key(redis_key),
+                make_task_checkpoint_matches_key(redis_key)
+            )
+            pipe.srem(active_index_key, redis_key)
+            pipe.zrem(user_index_key, redis_key)
+            pipe.zrem(kind_index_key, redis_key)
+            add_task_event(pipe, redis_key, "deleted")
+
+        await pipe.execute()
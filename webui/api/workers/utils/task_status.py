@@ -1,10 +1,14 @@
-from typing import Optional
+from typing import Dict, Optional
 from redis.asyncio import Redis
 import asyncio
+import json
 import time
 
 from api.models.task import TaskResponseBase, TaskStatus, PlaylistTaskStatus
-from api.workers.utils.constants import TTL_FINISHED, TTL_RUNNING
+from api.workers.utils.keys import make_task_script_keys
+from api.workers.utils.serialization import serialize_task, serialize_task_progress
+from api.workers.utils.constants import TTL_FINISHED, TTL_RUNNING, TASK_EVENTS_MAXLEN, TASK_EVENTS_TTL
+from api.workers.utils.scripts import SAVE_TASK_UNLESS_DORMANT, GET_TASK_STATUS, get_script
 from api.core.logging import logger
 
 _DORMANT_TASK_STATUSES = [TaskStatus.CANCELED, TaskStatus.FAILED, TaskStatus.FINISHED, TaskStatus.MARKED_FOR_DELETION]
@@ -15,17 +19,22 @@ async def save_task(
     redis_key: str,
     status: Optional[TaskStatus] = None,
     status_reason: Optional[str] = None,
-    use_finished_ttl: bool = True
+    use_finished_ttl: bool = True,
+    ttl: Optional[int] = None
 ) -> bool:
     """
     Update a task in Redis, optionally setting a new status, unless it has gone dormant.
 
+    The dormancy check and the write happen atomically in a single round trip, so a
+    cancellation or deletion requested meanwhile can't be overwritten.
+
     :param redis: Redis client
     :param task: Task object to update
     :param redis_key: Full Redis key (user_tasks:{kind}:{user_id}:{task_id})
     :param status: New status, or None to keep the current one
     :param status_reason: Optional reason message
     :param use_finished_ttl: If True, use TTL_FINISHED; otherwise TTL_RUNNING
+    :param ttl: TTL in seconds, overrides use_finished_ttl
     :return: True if written, False if the task was dormant or gone
     """
 
@@ -37,21 +46,83 @@ async def save_task(
         if status in (TaskStatus.FINISHED, TaskStatus.FAILED, TaskStatus.CANCELED):
             task.done_at = int(time.time())
 
-    current = await redis.get(redis_key)
-    if current is None:
-        return False
+    task_fields, progress_fields = serialize_task(task)
 
-    current_status = PlaylistTaskStatus.model_validate_json(current).status
-    if current_status in _DORMANT_TASK_STATUSES:
-        if current_status == TaskStatus.MARKED_FOR_DELETION:
-            await redis.delete(redis_key)
+    if not await _write_task_fields(
+        redis=redis,
+        redis_key=redis_key,
+        task_fields=task_fields,
+        progress_fields=progress_fields,
+        ttl=ttl or (TTL_FINISHED if use_finished_ttl else TTL_RUNNING),
+        is_complete=True
+    ):
         return False
 
-    ttl = TTL_FINISHED if use_finished_ttl else TTL_RUNNING
-    await redis.set(name=redis_key, value=task.model_dump_json(), ex=ttl)
     logger.debug(f"[task:{task.task_id}] Status: {old_status} -> {task.status}")
     return True
 
+async def save_task_progress(redis: Redis, task: PlaylistTaskStatus, redis_key: str) -> bool:
+    """
+    Update only the progress of a task, unless it has gone dormant.
+
+    Cheaper than save_task, as the task hash itself is left untouched.
+
+    :param redis: Redis client
+    :param task: Task whose progress to write
+    :param redis_key: Full Redis key of the task
+    :return: True if written, False if the task was dormant or gone
+    """
+
+    return await _write_task_fields(
+        redis=redis,
+        redis_key=redis_key,
+        task_fields={},
+        progress_fields=serialize_task_progress(task),
+        ttl=TTL_RUNNING
+    )
+
+async def save_task_heartbeat(redis: Redis, task: TaskResponseBase, redis_key: str) -> bool:
+    """
+    Update only the heartbeat fields of a task, unless it has gone dormant.
+
+    :param redis: Redis client
+    :param task: Task whose heartbeat to write
+    :param redis_key: Full Redis key of the task
+    :return: True if written, False if the task was dormant or gone
+    """
+
+    return await _write_task_fields(
+        redis=redis,
+        redis_key=redis_key,
+        task_fields={
+            "last_heartbeat": str(task.last_heartbeat or ""),
+            "worker_id": task.worker_id or "",
+        },
+        progress_fields={},
+        ttl=TTL_RUNNING
+    )
+
+async def _write_task_fields(
+    redis: Redis,
+    redis_key: str,
+    task_fields: Dict[str, str],
+    progress_fields: Dict[str, str],
+    ttl: int,
+    is_complete: bool = False
+) -> bool:
+    # Only a complete write may replace a task still stored as a legacy JSON string.
+    script = get_script(redis, SAVE_TASK_UNLESS_DORMANT)
+    written = await script(
+        keys=make_task_script_keys(redis_key),
+        args=[
+            ttl, json.dumps(task_fields), json.dumps(progress_fields), TASK_EVENTS_MAXLEN, TASK_EVENTS_TTL,
+            "1" if is_complete else "0", *_DORMANT_TASK_STATUSES
+        ],
+        client=redis
+    )
+
+    return written == 1
+
 async def report_task_failure(
     redis: Redis,
     task: TaskResponseBase,
@@ -188,36 +259,30 @@ async def check_if_task_is_dormant(redis: Redis, redis_key: str) -> bool:
     :return: True if task is dormant or no longer exists
     """
 
-    raw = await redis.get(redis_key)
+    script = get_script(redis, GET_TASK_STATUS)
+    status = await script(
+        keys=make_task_script_keys(redis_key),
+        args=[TASK_EVENTS_MAXLEN, TASK_EVENTS_TTL],
+        client=redis
+    )
 
-    if raw is None:
+    if status is None:
         logger.debug(f"Task key {redis_key} no longer exists")
         return True
 
-    task = PlaylistTaskStatus.model_validate_json(raw)
-
-    if task.status == TaskStatus.MARKED_FOR_DELETION:
-        await redis.delete(redis_key)
-        return True
+    return status in _DORMANT_TASK_STATUSES
 
-    return task.status in _DORMANT_TASK_STATUSES
-
-async def sleep_unless_dormant(redis: Redis, redis_key: str, seconds: int) -> bool:
+async def sleep_unless_dormant(dormant: asyncio.Event, seconds: float) -> bool:
     """
     Sleep for up to `seconds`, waking early if the task goes dormant.
 
-    :param redis: Redis client
-    :param redis_key: Full Redis key
+    :param dormant: Event set once the task goes dormant, see CancellationListener.watch()
     :param seconds: Maximum time to sleep
     :return: True if the task went dormant, False if the full duration elapsed
     """
 
     try:
-        await asyncio.wait_for(_wait_until_dormant(redis, redis_key), timeout=seconds)
+        await asyncio.wait_for(dormant.wait(), timeout=seconds)
         return True
     except asyncio.TimeoutError:
         return False
-
-async def _wait_until_dormant(redis: Redis, redis_key: str) -> None:
-    while not await check_if_task_is_dormant(redis, redis_key):
-        await asyncio.sleep(1)
\ No newline at end of file
@@ -77,6 +77,24 @@ export interface PlaylistTaskStatus {
      * @memberof PlaylistTaskStatus
      */
     'last_heartbeat'?: number | null;
+    /**
+     * How many times the task was handed to another worker after its previous one stopped responding.
+     * @type {number}
+     * @memberof PlaylistTaskStatus
+     */
+    'retry_count'?: number;
+    /**
+     * 
+     * @type {string}
+     * @memberof PlaylistTaskStatus
+     */
+    'queue_entry_id'?: string | null;
+    /**
+     * 
+     * @type {number}
+     * @memberof PlaylistTaskStatus
+     */
+    'not_before'?: number | null;
     /**
      * Original request parameters.
      * @type {PlaylistTaskCreate}
@@ -0,0 +1,148 @@
+import type { PlaylistTaskProgress, PlaylistTaskStatus } from '@/api';
+import { get_access_token } from '@/services/api';
+
+export type TaskChanges = Partial<Omit<PlaylistTaskStatus, 'progress'>> & {
+  progress?: Partial<PlaylistTaskProgress>;
+};
+
+export interface TaskEvent {
+  type: 'created' | 'updated' | 'deleted';
+  task_id: string;
+  changes: TaskChanges;
+}
+
+export interface TaskEventHandlers {
+  /** Called for every change to one of the user's tasks. */
+  onEvent: (event: TaskEvent) => void;
+  /** Called when events were missed, every task should be reloaded. */
+  onReset: () => void;
+}
+
+const RECONNECT_DELAY_MS = 3000;
+
+/**
+ * Subscribes to the task event stream of the authenticated user.
+ *
+ * Uses fetch instead of EventSource, because EventSource can't send the Authorization header.
+ * Reconnects automatically and resumes from the last received event.
+ */
+export const useTaskEvents = (handlers: TaskEventHandlers) => {
+  let controller: AbortController | undefined = undefined;
+  let reconnectId: ReturnType<typeof setTimeout> | undefined = undefined;
+  let lastEventId: string | undefined = undefined;
+
+  const dispatch = (event: string, data: string) => {
+    switch (event) {
+      case 'task':
+        handlers.onEvent(JSON.parse(data) as TaskEvent);
+        break;
+      case 'reset':
+        handlers.onReset();
+        break;
+    }
+  };
+
+  const read = async (response: Response) => {
+    const reader = response.body!.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) {
+        return;
+      }
+
+      buffer += value;
+
+      let separator: number;
+      while ((separator = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, separator);
+        buffer = buffer.slice(separator + 2);
+
+        let event = 'message';
+        let id: string | undefined = undefined;
+        const data: string[] = [];
+
+        for (const line of block.split('\n')) {
+          if (line.startsWith(':')) {
+            continue;
+          }
+
+          const [field, ...rest] = line.split(':');
+          const fieldValue = rest.join(':').replace(/^ /, '');
+
+          switch (field) {
+            case 'event':
+              event = fieldValue;
+              break;
+            case 'id':
+              id = fieldValue;
+              break;
+            case 'data':
+              data.push(fieldValue);
+              break;
+          }
+        }
+
+        if (data.length > 0) {
+          dispatch(event, data.join('\n'));
+        }
+
+        if (id) {
+          lastEventId = id;
+        }
+      }
+    }
+  };
+
+  const connect = async () => {
+    controller = new AbortController();
+
+    const headers: Record<string, string> = {
+      Accept: 'text/event-stream',
+      Authorization: `Bearer ${get_access_token()}`,
+    };
+
+    if (lastEventId) {
+      headers['Last-Event-ID'] = lastEventId;
+    }
+
+    try {
+      const response = await fetch(`${import.meta.env.VITE_API_BASE_URL ?? ''}/api/tasks/events`, {
+        headers,
+        signal: controller.signal,
+      });
+
+      if (response.status === 401 || response.status === 403) {
+        return;
+      }
+
+      if (response.ok && response.body) {
+        await read(response);
+      }
+    } catch (error) {
+      if (controller.signal.aborted) {
+        return;
+      }
+
+      console.error('Task event stream failed:', error);
+    }
+
+    if (!controller.signal.aborted) {
+      reconnectId = setTimeout(connect, RECONNECT_DELAY_MS);
+    }
+  };
+
+  const start = () => {
+    stop();
+    connect();
+  };
+
+  const stop = () => {
+    clearTimeout(reconnectId);
+    controller?.abort();
+    controller = undefined;
+  };
+
+  return { start, stop };
+};